@@ -0,0 +1,121 @@
+"""Occupancy analytics for revenue management.
+
+Load factors are read from the per-flight counters in ``flight_occupancy``
+(see models/occupancy.py), so the whole network is one indexed join rather
+than one COUNT per flight. Route / airline / day aggregates are materialized
+into ``occupancy_rollups`` and rebuilt at most once per
+OCCUPANCY_ROLLUP_MAX_AGE seconds, however often they are polled.
+"""
+import os
+from datetime import date, datetime, timedelta
+from typing import List
+
+from sqlalchemy import Float, String, cast, delete, func, insert, literal, select
+
+from models import Flight, FlightOccupancy, OccupancyRollup
+
+ROLLUP_DIMENSIONS = ("route", "airline", "day")
+ROLLUP_MAX_AGE = timedelta(seconds=float(os.getenv("OCCUPANCY_ROLLUP_MAX_AGE", "60")))
+
+
+def _booked_columns():
+    occupancy = FlightOccupancy.__table__
+    pending = func.coalesce(occupancy.c.pending, 0)
+    confirmed = func.coalesce(occupancy.c.confirmed, 0)
+    return pending, confirmed
+
+
+def flight_load_factors(session, departure_from: datetime = None, departure_to: datetime = None,
+                        min_load_factor: float = None, airline_id: int = None, limit: int = 5000) -> List[dict]:
+    """Load factor of every matching flight, fullest first, in a single query"""
+    flights = Flight.__table__
+    occupancy = FlightOccupancy.__table__
+    pending, confirmed = _booked_columns()
+    booked = pending + confirmed
+    load_factor = cast(booked, Float) / func.nullif(flights.c.total_seats, 0)
+
+    query = (
+        select(
+            flights.c.id.label("flight_id"),
+            flights.c.flight_number,
+            flights.c.airline_id,
+            flights.c.departure_code,
+            flights.c.destination_code,
+            flights.c.departure_time,
+            flights.c.total_seats,
+            flights.c.available_seats,
+            pending.label("pending"),
+            confirmed.label("confirmed"),
+            func.coalesce(load_factor, 0.0).label("load_factor"),
+        )
+        .select_from(flights.outerjoin(occupancy, occupancy.c.flight_id == flights.c.id))
+        .order_by(load_factor.desc(), flights.c.departure_time)
+        .limit(limit)
+    )
+    if departure_from:
+        query = query.where(flights.c.departure_time >= departure_from)
+    if departure_to:
+        query = query.where(flights.c.departure_time < departure_to)
+    if airline_id is not None:
+        query = query.where(flights.c.airline_id == airline_id)
+    if min_load_factor is not None:
+        query = query.where(booked >= min_load_factor * flights.c.total_seats)
+    return [dict(row) for row in session.execute(query).mappings()]
+
+
+def refresh_rollups(session, now: datetime = None):
+    """Rebuild every route / airline / day aggregate from the flight counters"""
+    now = now or datetime.now()
+    flights = Flight.__table__
+    occupancy = FlightOccupancy.__table__
+    rollups = OccupancyRollup.__table__
+    pending, confirmed = _booked_columns()
+    day = func.date(flights.c.departure_time)
+    keys = {
+        "route": flights.c.departure_code + "-" + flights.c.destination_code,
+        "airline": cast(flights.c.airline_id, String),
+        "day": literal("all"),
+    }
+
+    session.execute(delete(rollups))
+    for dimension, key in keys.items():
+        seats = func.coalesce(func.sum(flights.c.total_seats), 0)
+        booked = func.sum(pending) + func.sum(confirmed)
+        aggregate = (
+            select(
+                literal(dimension),
+                key,
+                day,
+                func.count(flights.c.id),
+                seats,
+                func.sum(pending),
+                func.sum(confirmed),
+                func.coalesce(cast(booked, Float) / func.nullif(seats, 0), 0.0),
+                literal(now),
+            )
+            .select_from(flights.outerjoin(occupancy, occupancy.c.flight_id == flights.c.id))
+            .where(flights.c.departure_time.is_not(None), key.is_not(None))
+            .group_by(key, day)
+        )
+        session.execute(insert(rollups).from_select(
+            ["dimension", "key", "day", "flights", "seats", "pending", "confirmed", "load_factor", "refreshed_at"],
+            aggregate
+        ))
+    session.commit()
+
+
+def occupancy_rollups(session, dimension: str, day_from: date = None, day_to: date = None,
+                      max_age: timedelta = ROLLUP_MAX_AGE) -> List[OccupancyRollup]:
+    """Aggregates for one dimension, refreshing them first if they are stale"""
+    if dimension not in ROLLUP_DIMENSIONS:
+        raise ValueError(f"Unknown dimension {dimension!r}; use one of {', '.join(ROLLUP_DIMENSIONS)}")
+    refreshed_at = session.execute(select(func.max(OccupancyRollup.refreshed_at))).scalar()
+    if refreshed_at is None or datetime.now() - refreshed_at > max_age:
+        refresh_rollups(session)
+
+    query = select(OccupancyRollup).where(OccupancyRollup.dimension == dimension)
+    if day_from:
+        query = query.where(OccupancyRollup.day >= day_from)
+    if day_to:
+        query = query.where(OccupancyRollup.day < day_to)
+    return session.execute(query.order_by(OccupancyRollup.day, OccupancyRollup.key)).scalars().all()
@@ -0,0 +1,422 @@
+"""HTTP load-testing and benchmark suite for the booking API.
+
+Drives scripted scenarios against the FastAPI app, either in-process (ASGI
+transport, no network, SQL queries counted through engine events) or against
+a running server given with --base-url. Each scenario reports latency
+percentiles, throughput, error rate, status codes and DB query counts, and
+the whole run is saved as JSON so two runs can be diffed with --compare.
+
+Scenarios:
+    search   search-heavy browsing: route searches skewed to popular routes,
+             airport and flight listings
+    booking  a burst of reservations on a single flight
+    login    a login storm against /token (10% wrong passwords)
+    tracking a firehose of click/scroll events to the tracking server
+
+Typical use, against a dataset built by data_generator.py:
+    python data_generator.py --database-url sqlite:///./loadtest.db
+    DATABASE_URL=sqlite:///./loadtest.db python benchmark.py -o before.json
+    ... change something ...
+    DATABASE_URL=sqlite:///./loadtest.db python benchmark.py -o after.json --compare before.json
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from contextlib import nullcontext
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+import httpx
+from sqlalchemy import event, func, select
+
+import database
+import models
+from data_generator import DEFAULT_PASSWORD
+
+SCENARIOS = ("search", "booking", "login", "tracking")
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = math.ceil(pct / 100 * len(sorted_values)) - 1
+    return sorted_values[max(0, min(rank, len(sorted_values) - 1))]
+
+
+class QueryCounter:
+    """Counts SQL statements executed through an engine"""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        with self._lock:
+            self.count += 1
+
+    def __enter__(self):
+        event.listen(self.engine, "before_cursor_execute", self._before_cursor_execute)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(self.engine, "before_cursor_execute", self._before_cursor_execute)
+
+
+@dataclass
+class Request:
+    method: str
+    path: str
+    kwargs: dict = field(default_factory=dict)
+    target: str = "api"  # "api" or "tracking"
+
+
+@dataclass
+class ScenarioResult:
+    name: str
+    requests: int
+    concurrency: int
+    duration_s: float
+    latencies_ms: List[float]
+    status_codes: Dict[str, int]
+    errors: int
+    db_queries: Optional[int]
+
+    def summary(self) -> dict:
+        latencies = sorted(self.latencies_ms)
+        return {
+            "requests": self.requests,
+            "concurrency": self.concurrency,
+            "duration_s": round(self.duration_s, 3),
+            "throughput_rps": round(self.requests / self.duration_s, 2) if self.duration_s else 0.0,
+            "errors": self.errors,
+            "error_rate": round(self.errors / self.requests, 4) if self.requests else 0.0,
+            "status_codes": self.status_codes,
+            "latency_ms": {
+                "p50": round(percentile(latencies, 50), 3),
+                "p95": round(percentile(latencies, 95), 3),
+                "p99": round(percentile(latencies, 99), 3),
+                "mean": round(sum(latencies) / len(latencies), 3) if latencies else 0.0,
+                "max": round(latencies[-1], 3) if latencies else 0.0,
+            },
+            "db_queries": self.db_queries,
+            "db_queries_per_request": round(self.db_queries / self.requests, 2)
+            if self.db_queries is not None and self.requests else None,
+        }
+
+
+class Fixtures:
+    """Ids, routes and credentials the scenarios draw from, read straight from the database"""
+
+    def __init__(self, session, seed: int = 0):
+        self.rng = random.Random(seed)
+        route_counts = session.execute(
+            select(models.Flight.departure_code, models.Flight.destination_code, func.count())
+            .group_by(models.Flight.departure_code, models.Flight.destination_code)
+        ).all()
+        self.routes = [(origin, destination) for origin, destination, _ in route_counts]
+        # Popular routes (more departures) are searched proportionally more often
+        self.route_weights = [count for _, _, count in route_counts]
+        self.departure_dates = [
+            row[0] for row in session.execute(
+                select(func.date(models.Flight.departure_time)).distinct().limit(60)
+            )
+        ]
+        self.airport_countries = list(session.execute(select(models.Airport.country_code).distinct()).scalars())
+        self.usernames = list(session.execute(
+            select(models.User.username).where(models.User.username.like("loaduser%")).limit(500)
+        ).scalars())
+        self.password = DEFAULT_PASSWORD
+        self.passenger_ids = list(session.execute(select(models.Passenger.id).limit(5000)).scalars())
+
+        # The booking burst hammers the flight with the most seats left
+        emptiest = session.execute(
+            select(models.Seat.flight_id, func.count())
+            .where(models.Seat.is_available == True)
+            .group_by(models.Seat.flight_id)
+            .order_by(func.count().desc())
+            .limit(1)
+        ).first()
+        self.booking_flight_id = emptiest[0] if emptiest else None
+        self.booking_seats = list(session.execute(
+            select(models.Seat.seat_number)
+            .where(models.Seat.flight_id == self.booking_flight_id, models.Seat.is_available == True)
+        ).scalars()) if emptiest else []
+
+    def auth(self):
+        if not self.usernames:
+            return None
+        return (self.rng.choice(self.usernames), self.password)
+
+
+def search_requests(fixtures: Fixtures, count: int) -> List[Request]:
+    rng, requests = fixtures.rng, []
+    for _ in range(count):
+        roll = rng.random()
+        if roll < 0.7 and fixtures.routes:
+            origin, destination = rng.choices(fixtures.routes, fixtures.route_weights)[0]
+            params = {"departure_code": origin, "destination_code": destination}
+            if fixtures.departure_dates and rng.random() < 0.5:
+                params["departure_date"] = str(rng.choice(fixtures.departure_dates))
+            requests.append(Request("GET", "/flights/", {"params": params}))
+        elif roll < 0.85:
+            params = {"limit": 100}
+            if fixtures.airport_countries and rng.random() < 0.5:
+                params["country_code"] = rng.choice(fixtures.airport_countries)
+            requests.append(Request("GET", "/airports/", {"params": params}))
+        else:
+            requests.append(Request("GET", "/flights/", {"params": {"skip": rng.randrange(0, 1000), "limit": 50}}))
+    return requests
+
+
+def booking_requests(fixtures: Fixtures, count: int) -> List[Request]:
+    requests = []
+    for i in range(count):
+        seat_number = fixtures.booking_seats[i % len(fixtures.booking_seats)] if fixtures.booking_seats else "1A"
+        body = {
+            "passenger_id": fixtures.rng.choice(fixtures.passenger_ids) if fixtures.passenger_ids else 1,
+            "flight_id": fixtures.booking_flight_id or 1,
+            "seat_number": seat_number,
+        }
+        requests.append(Request("POST", "/reservations/", {"json": body, "auth": fixtures.auth()}))
+    return requests
+
+
+def login_requests(fixtures: Fixtures, count: int) -> List[Request]:
+    requests = []
+    for _ in range(count):
+        username, password = fixtures.auth() or ("nobody", "wrong")
+        if fixtures.rng.random() < 0.1:
+            password += "-wrong"
+        requests.append(Request("POST", "/token", {"data": {"username": username, "password": password}}))
+    return requests
+
+
+def tracking_requests(fixtures: Fixtures, count: int) -> List[Request]:
+    rng, requests = fixtures.rng, []
+    for _ in range(count):
+        if rng.random() < 0.75:
+            body = {"event": "click", "x": rng.randrange(1920), "y": rng.randrange(1080)}
+        else:
+            body = {"event": "scroll", "scrollTop": rng.randrange(4000), "scrollHeight": 5200}
+        requests.append(Request("POST", "/api/track", {"json": body}, target="tracking"))
+    return requests
+
+
+BUILDERS: Dict[str, Callable[[Fixtures, int], List[Request]]] = {
+    "search": search_requests,
+    "booking": booking_requests,
+    "login": login_requests,
+    "tracking": tracking_requests,
+}
+
+
+class Runner:
+    """Sends requests with bounded concurrency and records latencies"""
+
+    def __init__(self, api_client: httpx.AsyncClient, tracking_send=None,
+                 query_counter: QueryCounter = None):
+        self.api_client = api_client
+        self.tracking_send = tracking_send
+        self.query_counter = query_counter
+
+    async def _send(self, request: Request) -> httpx.Response:
+        if request.target == "tracking":
+            if self.tracking_send is None:
+                raise RuntimeError("No tracking server configured")
+            return await self.tracking_send(request)
+        return await self.api_client.request(request.method, request.path, **request.kwargs)
+
+    async def run(self, name: str, requests: List[Request], concurrency: int) -> ScenarioResult:
+        queue = list(reversed(requests))
+        latencies: List[float] = []
+        status_codes: Dict[str, int] = {}
+        errors = 0
+
+        async def worker():
+            nonlocal errors
+            while queue:
+                request = queue.pop()
+                started = time.perf_counter()
+                try:
+                    response = await self._send(request)
+                    code = str(response.status_code)
+                    if response.status_code >= 400:
+                        errors += 1
+                except Exception as e:
+                    code = type(e).__name__
+                    errors += 1
+                latencies.append((time.perf_counter() - started) * 1000)
+                status_codes[code] = status_codes.get(code, 0) + 1
+
+        queries_before = self.query_counter.count if self.query_counter else None
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        duration = time.perf_counter() - started
+        db_queries = self.query_counter.count - queries_before if self.query_counter else None
+        return ScenarioResult(name, len(requests), concurrency, duration, latencies, status_codes, errors, db_queries)
+
+
+def _in_process_tracking_sender():
+    """Send tracking events to the Flask app through WSGI, on worker threads"""
+    server_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "server"))
+    os.environ.setdefault("TRACKING_DB_PATH", os.path.join(tempfile.mkdtemp(), "tracking.db"))
+    if server_dir not in sys.path:
+        sys.path.insert(0, server_dir)
+    from app import app as tracking_app
+
+    client = httpx.Client(transport=httpx.WSGITransport(app=tracking_app), base_url="http://tracking")
+
+    async def send(request: Request) -> httpx.Response:
+        return await asyncio.to_thread(client.request, request.method, request.path, **request.kwargs)
+    return send
+
+
+def _http_tracking_sender(tracking_url: str):
+    """Send tracking events to a running tracking server over HTTP"""
+    client = httpx.AsyncClient(base_url=tracking_url, timeout=30)
+
+    async def send(request: Request) -> httpx.Response:
+        return await client.request(request.method, request.path, **request.kwargs)
+    return send
+
+
+async def run_benchmark(scenarios=SCENARIOS, requests: int = 500, concurrency: int = 20,
+                        base_url: str = None, tracking_url: str = None, app=None,
+                        session_factory=None, engine=None, seed: int = 0) -> dict:
+    """Run the given scenarios and return a JSON-serialisable report.
+
+    Without ``base_url`` the FastAPI app runs in-process; ``app``,
+    ``session_factory`` and ``engine`` default to main.app and the engine in
+    database.py, and SQL statements are counted per scenario.
+    """
+    session_factory = session_factory or database.SessionLocal
+    engine = engine or database.engine
+    session = session_factory()
+    try:
+        fixtures = Fixtures(session, seed)
+    finally:
+        session.close()
+
+    tracking_send = _http_tracking_sender(tracking_url) if tracking_url else None
+
+    report = {
+        "meta": {
+            "started_at": datetime.now().isoformat(timespec="seconds"),
+            "mode": "http" if base_url else "in-process",
+            "base_url": base_url,
+            "database_url": str(engine.url) if not base_url else None,
+            "git_revision": _git_revision(),
+            "requests_per_scenario": requests,
+            "concurrency": concurrency,
+            "seed": seed,
+        },
+        "scenarios": {},
+    }
+
+    if base_url:
+        api_client = httpx.AsyncClient(base_url=base_url, timeout=30)
+        counter = None
+    else:
+        if app is None:
+            from db_init import init_db
+            from main import app
+            init_db()
+        api_client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://api", timeout=30)
+        counter = QueryCounter(engine)
+
+    async with api_client:
+        with counter or nullcontext():
+            for name in scenarios:
+                if name == "tracking" and tracking_send is None:
+                    if base_url:
+                        report["scenarios"][name] = {"skipped": "pass --tracking-url to run it over HTTP"}
+                        continue
+                    try:
+                        tracking_send = _in_process_tracking_sender()
+                    except ImportError as e:
+                        report["scenarios"][name] = {"skipped": f"tracking server unavailable: {e}"}
+                        continue
+                runner = Runner(api_client, tracking_send, counter)
+                result = await runner.run(name, BUILDERS[name](fixtures, requests), concurrency)
+                report["scenarios"][name] = result.summary()
+    return report
+
+
+def _git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)), timeout=5
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def format_report(report: dict, baseline: dict = None) -> str:
+    """Human readable table, with percentage changes against a baseline run"""
+    lines = [f"{'scenario':<10} {'req/s':>10} {'p50 ms':>10} {'p95 ms':>10} {'p99 ms':>10} {'errors':>8} {'q/req':>7}"]
+    for name, result in report["scenarios"].items():
+        if "skipped" in result:
+            lines.append(f"{name:<10} skipped: {result['skipped']}")
+            continue
+        latency = result["latency_ms"]
+        lines.append(
+            f"{name:<10} {result['throughput_rps']:>10} {latency['p50']:>10} {latency['p95']:>10} "
+            f"{latency['p99']:>10} {result['error_rate']:>8.1%} {result['db_queries_per_request'] or '-':>7}"
+        )
+        previous = (baseline or {}).get("scenarios", {}).get(name)
+        if previous and "skipped" not in previous:
+            def change(new, old):
+                return f"{(new - old) / old:+.1%}" if old else "n/a"
+            lines.append(
+                f"{'  vs base':<10} {change(result['throughput_rps'], previous['throughput_rps']):>10} "
+                f"{change(latency['p50'], previous['latency_ms']['p50']):>10} "
+                f"{change(latency['p95'], previous['latency_ms']['p95']):>10} "
+                f"{change(latency['p99'], previous['latency_ms']['p99']):>10}"
+            )
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the booking API")
+    parser.add_argument("scenarios", nargs="*", help=f"Any of {', '.join(SCENARIOS)} (default: all)")
+    parser.add_argument("-n", "--requests", type=int, default=500, help="Requests per scenario")
+    parser.add_argument("-c", "--concurrency", type=int, default=20)
+    parser.add_argument("--base-url", help="Benchmark a running server (e.g. http://127.0.0.1:8000)")
+    parser.add_argument("--tracking-url", help="Running tracking server (e.g. http://127.0.0.1:5000)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("-o", "--output", help="Write the JSON report here")
+    parser.add_argument("--compare", help="Earlier JSON report to diff against")
+    args = parser.parse_args(argv)
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+
+    report = asyncio.run(run_benchmark(
+        args.scenarios or SCENARIOS, args.requests, args.concurrency,
+        args.base_url, args.tracking_url, seed=args.seed
+    ))
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    print(format_report(report, baseline))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"✅ Results saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
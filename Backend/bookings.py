@@ -0,0 +1,103 @@
+"""Group bookings: many (passenger, flight, seat) reservations in one transaction.
+
+Every passenger, flight and seat referenced by the batch is checked with one
+``IN`` query per table, the seats are claimed with a single conditional
+UPDATE, and the reservations go in with one executemany INSERT. Either the
+whole group is booked or nothing is.
+"""
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, List, Sequence
+
+from sqlalchemy import insert, select, update
+
+from models import Flight, Passenger, Reservation, ReservationStatus, Seat
+from models.fares import refresh_fare_calendar
+from models.occupancy import apply_occupancy_delta, status_delta
+from models.outbox import record_reservation_events, reservation_event
+
+MAX_BATCH_SIZE = 500
+
+
+def _missing(requested, found) -> List:
+    return sorted(set(requested) - set(found))
+
+
+def book_batch(session, items: Sequence, status: str = ReservationStatus.pending.value,
+               booking_agent_id: str = None, now: datetime = None) -> List[Dict]:
+    """Reserve every item or none of them.
+
+    ``items`` are objects with passenger_id, flight_id and seat_number.
+    Raises LookupError for unknown passengers, flights or seats and ValueError
+    for duplicate or already taken seats; the session is rolled back then.
+    """
+    if not items:
+        raise ValueError("No reservations in batch")
+    if len(items) > MAX_BATCH_SIZE:
+        raise ValueError(f"At most {MAX_BATCH_SIZE} reservations per batch")
+    wanted = [(item.flight_id, item.seat_number) for item in items]
+    if len(set(wanted)) != len(wanted):
+        raise ValueError("The same seat appears more than once in the batch")
+    now = now or datetime.now()
+
+    try:
+        passenger_ids = {item.passenger_id for item in items}
+        found = session.execute(select(Passenger.id).where(Passenger.id.in_(passenger_ids))).scalars().all()
+        if missing := _missing(passenger_ids, found):
+            raise LookupError(f"Passengers not found: {missing}")
+
+        flight_ids = {item.flight_id for item in items}
+        found = session.execute(select(Flight.id).where(Flight.id.in_(flight_ids))).scalars().all()
+        if missing := _missing(flight_ids, found):
+            raise LookupError(f"Flights not found: {missing}")
+
+        seats = session.execute(
+            select(Seat.seat_id, Seat.flight_id, Seat.seat_number, Seat.is_available)
+            .where(Seat.flight_id.in_(flight_ids), Seat.seat_number.in_({seat for _, seat in wanted}))
+        ).all()
+        seats_by_key = {(seat.flight_id, seat.seat_number): seat for seat in seats}
+        if missing := [key for key in wanted if key not in seats_by_key]:
+            raise LookupError(f"Seats not found: {missing}")
+        if taken := [key for key in wanted if not seats_by_key[key].is_available]:
+            raise ValueError(f"Seats not available: {taken}")
+
+        # Claim every seat at once; a concurrent booking makes the count come up short
+        claimed = session.execute(
+            update(Seat)
+            .where(Seat.seat_id.in_([seats_by_key[key].seat_id for key in wanted]), Seat.is_available == True)
+            .values(is_available=False, reservation_time=now)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        if claimed != len(wanted):
+            raise ValueError("Some seats were taken by another booking, nothing was reserved")
+
+        rows = [
+            {"passenger_id": item.passenger_id, "flight_id": item.flight_id, "seat_number": item.seat_number,
+             "status": status, "final_price": 0.0, "booking_agent_id": booking_agent_id, "created_at": now}
+            for item in items
+        ]
+        ids = session.execute(
+            insert(Reservation.__table__).returning(Reservation.__table__.c.id, sort_by_parameter_order=True),
+            rows
+        ).scalars().all()
+
+        # Core inserts skip the mapper events: move the counters (one statement per flight) and write the outbox here
+        per_flight = defaultdict(int)
+        for item in items:
+            per_flight[item.flight_id] += 1
+        connection = session.connection()
+        for flight_id, count in per_flight.items():
+            delta = {column: change * count for column, change in status_delta(status).items()}
+            apply_occupancy_delta(connection, flight_id, **delta)
+        refresh_fare_calendar(connection, per_flight)
+        record_reservation_events(connection, (
+            reservation_event({"id": reservation_id, **row}, "reservation.created", now=now)
+            for reservation_id, row in zip(ids, rows)
+        ))
+
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+
+    return [{"id": reservation_id, **row} for reservation_id, row in zip(ids, rows)]
@@ -0,0 +1,553 @@
+"""Cache layer shared by the API workers.
+
+Two interchangeable backends:
+
+* ``LocalBackend``: in-process LRU with per-key TTL. The default; fine for a
+  single worker and for tests.
+* ``RedisBackend``: any server speaking the Redis protocol (RESP), through a
+  small built-in client, so all uvicorn workers share one copy and one set of
+  counters. ``cache_server.py`` is a stand-in server for local runs and tests.
+
+CACHE_URL picks the backend: unset or "local" for the in-process one,
+"redis://host:port[/db]" for a networked one.
+
+``Cache`` is what callers use. It namespaces keys and counts hits and misses.
+``get_or_compute`` recomputes a missing value once: callers in the same
+process wait for the one computation (single-flight), and across processes a
+short ``SET NX`` lock makes other workers wait for the value instead of
+recomputing it too. A Cache can keep a near copy of hot values in process;
+``invalidate`` then publishes the keys so every worker drops its near copy.
+Backend errors never fail a request: they count as misses and the value is
+computed.
+"""
+import json
+import os
+import queue
+import secrets
+import socket
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+from urllib.parse import urlparse
+
+CACHE_URL = os.getenv("CACHE_URL", "local")
+LOCAL_MAX_ENTRIES = int(os.getenv("CACHE_LOCAL_ENTRIES", "10000"))
+# Compare-and-delete, so a worker only releases a lock it still holds
+DELETE_IF_EQUAL_SCRIPT = (
+    'if redis.call("GET", KEYS[1]) == ARGV[1] then return redis.call("DEL", KEYS[1]) else return 0 end'
+)
+
+
+class CacheError(Exception):
+    """The cache backend failed or answered with an error"""
+
+
+class LocalBackend:
+    """In-process LRU + TTL store; publish delivers to subscribers in this process"""
+
+    def __init__(self, max_entries: int = LOCAL_MAX_ENTRIES, clock: Callable[[], float] = time.monotonic):
+        self.max_entries = max_entries
+        self.clock = clock
+        self._entries: "OrderedDict[str, Tuple[bytes, Optional[float]]]" = OrderedDict()
+        self._subscribers: Dict[str, List[Callable[[bytes], None]]] = {}
+        self._lock = threading.Lock()
+
+    def _live(self, key: str):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[1] is not None and entry[1] <= self.clock():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self._live(key)
+            return entry[0] if entry else None
+
+    def get_many(self, keys: List[str]) -> List[Optional[bytes]]:
+        with self._lock:
+            return [entry[0] if (entry := self._live(key)) else None for key in keys]
+
+    def _store(self, key: str, value: bytes, ttl: Optional[float]):
+        self._entries[key] = (value, self.clock() + ttl if ttl else None)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def set(self, key: str, value: bytes, ttl: Optional[float] = None):
+        with self._lock:
+            self._store(key, value, ttl)
+
+    def add(self, key: str, value: bytes, ttl: Optional[float] = None) -> bool:
+        """Set only if absent (a lock)"""
+        with self._lock:
+            if self._live(key):
+                return False
+            self._store(key, value, ttl)
+            return True
+
+    def delete(self, *keys: str) -> int:
+        with self._lock:
+            return sum(self._entries.pop(key, None) is not None for key in keys)
+
+    def delete_if_equal(self, key: str, value: bytes) -> bool:
+        with self._lock:
+            entry = self._live(key)
+            if entry is None or entry[0] != value:
+                return False
+            del self._entries[key]
+            return True
+
+    def incr(self, key: str) -> int:
+        with self._lock:
+            entry = self._live(key)
+            value = int(entry[0]) + 1 if entry else 1
+            self._entries[key] = (str(value).encode(), entry[1] if entry else None)
+            return value
+
+    def publish(self, channel: str, message: bytes) -> int:
+        with self._lock:
+            subscribers = list(self._subscribers.get(channel, ()))
+        for callback in subscribers:
+            callback(message)
+        return len(subscribers)
+
+    def subscribe(self, channel: str, callback: Callable[[bytes], None]):
+        with self._lock:
+            self._subscribers.setdefault(channel, []).append(callback)
+
+    def flush(self):
+        with self._lock:
+            self._entries.clear()
+
+    def close(self):
+        pass
+
+
+def _encode_command(args: Iterable) -> bytes:
+    parts = []
+    for arg in args:
+        data = arg if isinstance(arg, bytes) else str(arg).encode()
+        parts.append(b"$%d\r\n%s\r\n" % (len(data), data))
+    return b"*%d\r\n" % len(parts) + b"".join(parts)
+
+
+class RespConnection:
+    """One connection speaking RESP2"""
+
+    def __init__(self, host: str, port: int, db: int = 0, timeout: float = 2.0):
+        self.sock = socket.create_connection((host, port), timeout)
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.reader = self.sock.makefile("rb")
+        if db:
+            self.command("SELECT", db)
+
+    def send(self, *args):
+        self.sock.sendall(_encode_command(args))
+
+    def command(self, *args) -> Any:
+        self.send(*args)
+        return self.read_reply()
+
+    def read_reply(self) -> Any:
+        line = self.reader.readline()
+        if not line.endswith(b"\r\n"):
+            raise ConnectionError("Cache server closed the connection")
+        kind, rest = line[:1], line[1:-2]
+        if kind == b"+":
+            return rest.decode()
+        if kind == b"-":
+            raise CacheError(rest.decode())
+        if kind == b":":
+            return int(rest)
+        if kind == b"$":
+            length = int(rest)
+            if length < 0:
+                return None
+            data = self.reader.read(length + 2)
+            return data[:-2]
+        if kind == b"*":
+            length = int(rest)
+            return None if length < 0 else [self.read_reply() for _ in range(length)]
+        raise CacheError(f"Unexpected reply: {line!r}")
+
+    def close(self):
+        try:
+            self.reader.close()
+            self.sock.close()
+        except OSError:
+            pass
+
+
+class RedisBackend:
+    """Redis-protocol backend with a small connection pool and a pub/sub listener thread.
+
+    After a connection failure commands fail fast for a backoff period
+    (doubling per consecutive failure, up to ``max_backoff``) instead of
+    each paying the connect timeout; the first command after it tries again.
+    """
+
+    def __init__(self, url: str, pool_size: int = 16, timeout: float = 2.0, backoff: float = 0.5,
+                 max_backoff: float = 30.0):
+        parsed = urlparse(url)
+        self.host = parsed.hostname or "127.0.0.1"
+        self.port = parsed.port or 6379
+        self.db = int(parsed.path.strip("/") or 0)
+        self.timeout = timeout
+        self._pool: "queue.LifoQueue[RespConnection]" = queue.LifoQueue(pool_size)
+        self._subscribers: Dict[str, List[Callable[[bytes], None]]] = {}
+        self._listener: Optional[threading.Thread] = None
+        self._listener_connection: Optional[RespConnection] = None
+        self._lock = threading.Lock()
+        self._closed = threading.Event()
+        self._listening = threading.Event()
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self._failures = 0
+        self._retry_at = 0.0
+
+    def _connect(self) -> RespConnection:
+        return RespConnection(self.host, self.port, self.db, self.timeout)
+
+    def _command(self, *args) -> Any:
+        if self._failures and time.monotonic() < self._retry_at:
+            raise CacheError(f"{self.host}:{self.port} unreachable; retrying in {self._retry_at - time.monotonic():.1f}s")
+        try:
+            connection = self._pool.get_nowait()
+        except queue.Empty:
+            connection = None
+        try:
+            connection = connection or self._connect()
+            reply = connection.command(*args)
+        except (OSError, ConnectionError) as e:
+            if connection is not None:
+                connection.close()
+            self._failures += 1
+            self._retry_at = time.monotonic() + min(self.backoff * 2 ** (self._failures - 1), self.max_backoff)
+            raise CacheError(f"{type(e).__name__}: {e}") from e
+        finally:
+            if connection is not None and not connection.sock._closed:
+                try:
+                    self._pool.put_nowait(connection)
+                except queue.Full:
+                    connection.close()
+        self._failures = 0
+        return reply
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self._command("GET", key)
+
+    def get_many(self, keys: List[str]) -> List[Optional[bytes]]:
+        return self._command("MGET", *keys) if keys else []
+
+    def set(self, key: str, value: bytes, ttl: Optional[float] = None):
+        if ttl:
+            self._command("SET", key, value, "PX", max(1, int(ttl * 1000)))
+        else:
+            self._command("SET", key, value)
+
+    def add(self, key: str, value: bytes, ttl: Optional[float] = None) -> bool:
+        args = ["SET", key, value, "NX"] + (["PX", max(1, int(ttl * 1000))] if ttl else [])
+        return self._command(*args) == "OK"
+
+    def delete(self, *keys: str) -> int:
+        return self._command("DEL", *keys) if keys else 0
+
+    def delete_if_equal(self, key: str, value: bytes) -> bool:
+        return self._command("EVAL", DELETE_IF_EQUAL_SCRIPT, 1, key, value) == 1
+
+    def incr(self, key: str) -> int:
+        return self._command("INCR", key)
+
+    def publish(self, channel: str, message: bytes) -> int:
+        return self._command("PUBLISH", channel, message)
+
+    def subscribe(self, channel: str, callback: Callable[[bytes], None]):
+        with self._lock:
+            new_channel = channel not in self._subscribers
+            self._subscribers.setdefault(channel, []).append(callback)
+            if self._listener is None:
+                self._listener = threading.Thread(target=self._listen, name="cache-pubsub", daemon=True)
+                self._listener.start()
+            elif new_channel and self._listener_connection is not None:
+                try:
+                    self._listener_connection.send("SUBSCRIBE", channel)
+                except OSError:
+                    pass  # the listener reconnects and subscribes to every channel again
+        # Don't return before the server knows about us, or early invalidations would be missed
+        self._listening.wait(self.timeout)
+
+    def _listen(self):
+        backoff = 0.1
+        while not self._closed.is_set():
+            try:
+                connection = self._listener_connection = RespConnection(self.host, self.port, 0, None)
+                with self._lock:
+                    channels = list(self._subscribers)
+                connection.send("SUBSCRIBE", *channels)
+                backoff = 0.1
+                while not self._closed.is_set():
+                    reply = connection.read_reply()
+                    if isinstance(reply, list) and reply and reply[0] == b"subscribe":
+                        self._listening.set()
+                    elif isinstance(reply, list) and reply and reply[0] == b"message":
+                        with self._lock:
+                            callbacks = list(self._subscribers.get(reply[1].decode(), ()))
+                        for callback in callbacks:
+                            try:
+                                callback(reply[2])
+                            except Exception as e:
+                                print(f"Cache subscriber error: {e}")
+            except (OSError, ConnectionError, CacheError):
+                self._listening.clear()
+                if self._closed.wait(backoff):
+                    return
+                backoff = min(backoff * 2, 5.0)
+
+    def flush(self):
+        self._command("FLUSHDB")
+
+    def close(self):
+        self._closed.set()
+        if self._listener_connection is not None:
+            try:
+                self._listener_connection.sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            self._listener_connection.close()
+        while True:
+            try:
+                self._pool.get_nowait().close()
+            except queue.Empty:
+                break
+
+
+def create_backend(url: str = None):
+    url = url or CACHE_URL
+    if url in ("", "local"):
+        return LocalBackend()
+    if url.startswith("redis://"):
+        return RedisBackend(url)
+    raise ValueError(f"Unsupported CACHE_URL: {url}")
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def default_backend():
+    """The process-wide backend named by CACHE_URL, created on first use"""
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            _backend = create_backend()
+        return _backend
+
+
+class _Call:
+    __slots__ = ("done", "value", "error", "waiters")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error: Optional[BaseException] = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Runs one call per key at a time; concurrent callers for the key wait and share its result or error"""
+
+    def __init__(self):
+        self._calls: Dict[Any, _Call] = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, fn: Callable[[], Any], timeout: float = None) -> Tuple[Any, bool]:
+        """(result, shared); ``shared`` is True for callers that waited on another caller's run"""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                call.waiters += 1
+        if not leader:
+            if not call.done.wait(timeout):
+                raise TimeoutError(f"Timed out waiting for in-flight call {key!r}")
+            if call.error is not None:
+                raise call.error
+            return call.value, True
+        try:
+            call.value = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.value, False
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._calls)
+
+
+@dataclass
+class CacheMetrics:
+    hits: int = 0
+    near_hits: int = 0
+    misses: int = 0
+    computes: int = 0
+    coalesced: int = 0
+    lock_waits: int = 0
+    invalidations: int = 0
+    errors: int = 0
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def add(self, name: str, amount: int = 1):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + amount)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            values = {name: getattr(self, name) for name in
+                      ("hits", "near_hits", "misses", "computes", "coalesced", "lock_waits", "invalidations", "errors")}
+        lookups = values["hits"] + values["misses"]
+        values["hit_ratio"] = round(values["hits"] / lookups, 4) if lookups else None
+        return values
+
+
+registry: Dict[str, "Cache"] = {}
+
+
+class Cache:
+    """A namespace of cached values on a backend"""
+
+    def __init__(self, namespace: str, backend=None, default_ttl: Optional[float] = None,
+                 near_ttl: Optional[float] = None, near_entries: int = 1024, lock_ttl: float = 10.0):
+        self.namespace = namespace
+        self.backend = backend or default_backend()
+        self.default_ttl = default_ttl
+        self.lock_ttl = lock_ttl
+        self.metrics = CacheMetrics()
+        self._flights = SingleFlight()
+        # A near copy only makes sense in front of a shared backend
+        self.near = LocalBackend(near_entries) if near_ttl and not isinstance(self.backend, LocalBackend) else None
+        self.near_ttl = near_ttl
+        self.channel = f"cache-invalidate:{namespace}"
+        if self.near is not None:
+            self.backend.subscribe(self.channel, self._on_invalidate)
+        registry[namespace] = self
+
+    def key(self, key: str) -> str:
+        return f"{self.namespace}:{key}"
+
+    def get(self, key: str) -> Optional[bytes]:
+        if self.near is not None and (value := self.near.get(key)) is not None:
+            self.metrics.add("hits")
+            self.metrics.add("near_hits")
+            return value
+        try:
+            value = self.backend.get(self.key(key))
+        except CacheError:
+            self.metrics.add("errors")
+            value = None
+        if value is None:
+            self.metrics.add("misses")
+            return None
+        self.metrics.add("hits")
+        if self.near is not None:
+            self.near.set(key, value, self.near_ttl)
+        return value
+
+    def get_many(self, keys: List[str]) -> List[Optional[bytes]]:
+        """Raw multi-get (no metrics, no near copy); raises CacheError"""
+        return self.backend.get_many([self.key(key) for key in keys])
+
+    def set(self, key: str, value: bytes, ttl: Optional[float] = None):
+        try:
+            self.backend.set(self.key(key), value, ttl or self.default_ttl)
+        except CacheError:
+            self.metrics.add("errors")
+            return
+        if self.near is not None:
+            self.near.set(key, value, self.near_ttl)
+
+    def incr(self, key: str) -> int:
+        """Shared counter; raises CacheError"""
+        return self.backend.incr(self.key(key))
+
+    def invalidate(self, *keys: str):
+        """Drop keys here, in the backend and in every worker's near copy"""
+        if not keys:
+            return
+        self.metrics.add("invalidations", len(keys))
+        if self.near is not None:
+            self.near.delete(*keys)
+        try:
+            self.backend.delete(*(self.key(key) for key in keys))
+            if self.near is not None:
+                self.backend.publish(self.channel, json.dumps(keys).encode())
+        except CacheError:
+            self.metrics.add("errors")
+
+    def _on_invalidate(self, message: bytes):
+        self.near.delete(*json.loads(message))
+
+    def get_or_compute(self, key: str, compute: Callable[[], bytes], ttl: Optional[float] = None) -> bytes:
+        """Cached value, or ``compute()`` run once across concurrent callers and stored"""
+        value = self.get(key)
+        if value is not None:
+            return value
+        value, shared = self._flights.do(key, lambda: self._compute_once(key, compute, ttl))
+        if shared:
+            self.metrics.add("coalesced")
+        return value
+
+    def _compute_once(self, key: str, compute: Callable[[], bytes], ttl: Optional[float]) -> bytes:
+        lock_key = self.key(f"{key}:lock")
+        token = secrets.token_hex(8).encode()
+        try:
+            locked = self.backend.add(lock_key, token, self.lock_ttl)
+        except CacheError:
+            self.metrics.add("errors")
+            locked = True  # no backend: just compute
+        if not locked:
+            # Another worker is computing it: wait for its value rather than stampeding the database
+            self.metrics.add("lock_waits")
+            deadline = time.monotonic() + self.lock_ttl
+            delay = 0.005
+            while time.monotonic() < deadline:
+                time.sleep(delay)
+                delay = min(delay * 2, 0.1)
+                try:
+                    value = self.backend.get(self.key(key))
+                except CacheError:
+                    break
+                if value is not None:
+                    return value
+        self.metrics.add("computes")
+        try:
+            value = compute()
+            self.set(key, value, ttl)
+            return value
+        finally:
+            if locked:
+                try:
+                    # The lock may have expired during a slow compute and been taken by another worker
+                    self.backend.delete_if_equal(lock_key, token)
+                except CacheError:
+                    pass
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": type(self.backend).__name__, **self.metrics.snapshot()}
+
+
+def stats() -> Dict[str, Dict[str, Any]]:
+    """Metrics of every cache in this process"""
+    return {namespace: cache.stats() for namespace, cache in registry.items()}
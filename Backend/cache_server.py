@@ -0,0 +1,162 @@
+"""Stand-in Redis-protocol server for local runs and tests.
+
+Implements the handful of commands cache.RedisBackend uses (GET, MGET, SET
+with EX/PX/NX, DEL, INCR, EXISTS, PUBLISH, SUBSCRIBE, PING, SELECT, FLUSHDB,
+and EVAL of its compare-and-delete script only) on one asyncio loop, in memory. It is not a Redis replacement: there is no
+persistence or eviction, and SELECT is accepted but ignored.
+
+Usage:
+    python cache_server.py --port 6399
+    CACHE_URL=redis://127.0.0.1:6399 uvicorn main:app --workers 4
+"""
+import argparse
+import asyncio
+import time
+from typing import Dict, List, Optional, Set, Tuple
+
+from cache import DELETE_IF_EQUAL_SCRIPT
+
+
+class Store:
+    def __init__(self):
+        self.values: Dict[bytes, Tuple[bytes, Optional[float]]] = {}
+        self.channels: Dict[bytes, Set[asyncio.StreamWriter]] = {}
+
+    def get(self, key: bytes) -> Optional[bytes]:
+        entry = self.values.get(key)
+        if entry is None:
+            return None
+        if entry[1] is not None and entry[1] <= time.monotonic():
+            del self.values[key]
+            return None
+        return entry[0]
+
+
+def _bulk(value: Optional[bytes]) -> bytes:
+    return b"$-1\r\n" if value is None else b"$%d\r\n%s\r\n" % (len(value), value)
+
+
+def _array(items: List[bytes]) -> bytes:
+    return b"*%d\r\n" % len(items) + b"".join(items)
+
+
+def _integer(value: int) -> bytes:
+    return b":%d\r\n" % value
+
+
+OK = b"+OK\r\n"
+
+
+async def _read_command(reader: asyncio.StreamReader) -> Optional[List[bytes]]:
+    line = await reader.readline()
+    if not line:
+        return None
+    if not line.startswith(b"*"):
+        return line.strip().split()  # inline command (e.g. from telnet)
+    args = []
+    for _ in range(int(line[1:-2])):
+        length = int((await reader.readline())[1:-2])
+        args.append((await reader.readexactly(length + 2))[:-2])
+    return args
+
+
+def _set(store: Store, args: List[bytes]) -> bytes:
+    key, value, options = args[0], args[1], [arg.upper() for arg in args[2:]]
+    expires = None
+    if b"PX" in options:
+        expires = time.monotonic() + int(args[2 + options.index(b"PX") + 1]) / 1000
+    elif b"EX" in options:
+        expires = time.monotonic() + int(args[2 + options.index(b"EX") + 1])
+    if b"NX" in options and store.get(key) is not None:
+        return b"$-1\r\n"
+    store.values[key] = (value, expires)
+    return OK
+
+
+def execute(store: Store, args: List[bytes]) -> bytes:
+    name, args = args[0].upper(), args[1:]
+    if name == b"PING":
+        return b"+PONG\r\n"
+    if name in (b"SELECT", b"CLIENT"):
+        return OK
+    if name == b"GET":
+        return _bulk(store.get(args[0]))
+    if name == b"MGET":
+        return _array([_bulk(store.get(key)) for key in args])
+    if name == b"SET":
+        return _set(store, args)
+    if name == b"DEL":
+        return _integer(sum(store.values.pop(key, None) is not None for key in args))
+    if name == b"EVAL":
+        if args[0].decode() != DELETE_IF_EQUAL_SCRIPT or args[1] != b"1":
+            return b"-ERR only the compare-and-delete script is supported\r\n"
+        if store.get(args[2]) != args[3]:
+            return _integer(0)
+        del store.values[args[2]]
+        return _integer(1)
+    if name == b"EXISTS":
+        return _integer(sum(store.get(key) is not None for key in args))
+    if name == b"INCR":
+        current = store.get(args[0])
+        try:
+            value = int(current or 0) + 1
+        except ValueError:
+            return b"-ERR value is not an integer or out of range\r\n"
+        expires = store.values[args[0]][1] if current is not None else None
+        store.values[args[0]] = (str(value).encode(), expires)
+        return _integer(value)
+    if name == b"FLUSHDB" or name == b"FLUSHALL":
+        store.values.clear()
+        return OK
+    if name == b"PUBLISH":
+        message = _array([_bulk(b"message"), _bulk(args[0]), _bulk(args[1])])
+        subscribers = list(store.channels.get(args[0], ()))
+        for writer in subscribers:
+            writer.write(message)
+        return _integer(len(subscribers))
+    return b"-ERR unknown command '%s'\r\n" % name.lower()
+
+
+async def handle(store: Store, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+    subscribed: Set[bytes] = set()
+    try:
+        while (command := await _read_command(reader)) is not None:
+            if not command:
+                continue
+            if command[0].upper() == b"SUBSCRIBE":
+                for channel in command[1:]:
+                    store.channels.setdefault(channel, set()).add(writer)
+                    subscribed.add(channel)
+                    writer.write(_array([_bulk(b"subscribe"), _bulk(channel), _integer(len(subscribed))]))
+            else:
+                writer.write(execute(store, command))
+            await writer.drain()
+    except (ConnectionError, asyncio.IncompleteReadError):
+        pass
+    finally:
+        for channel in subscribed:
+            store.channels.get(channel, set()).discard(writer)
+        writer.close()
+
+
+async def serve(host: str, port: int):
+    store = Store()
+    server = await asyncio.start_server(lambda r, w: handle(store, r, w), host, port)
+    print(f"ready on {host}:{server.sockets[0].getsockname()[1]}", flush=True)
+    async with server:
+        await server.serve_forever()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="In-memory Redis-protocol stand-in")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=6399, help="0 picks a free port")
+    args = parser.parse_args(argv)
+    try:
+        asyncio.run(serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
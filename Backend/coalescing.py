@@ -0,0 +1,143 @@
+"""Request coalescing for hot read endpoints.
+
+When a popular route goes on sale, hundreds of identical searches arrive
+within milliseconds. ``@coalesce()`` on an endpoint makes concurrent identical
+requests (same method, path, normalized query string and validators) share
+one execution: the first caller runs the endpoint, the others wait for it
+and get the same result, or the same exception. Waiting is bounded: a
+follower that has waited ``max_wait`` seconds runs the endpoint itself.
+
+Works for both endpoint styles in main.py: sync endpoints (run by FastAPI in
+its threadpool) coalesce on threads, async ones on asyncio futures so waiting
+requests hold no thread at all. Coalescing is only for responses that do not
+depend on who asks; the endpoint must declare a ``request: Request``
+parameter.
+"""
+import asyncio
+import functools
+import inspect
+import os
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+
+from fastapi import Request, Response
+
+from cache import SingleFlight
+
+MAX_WAIT_SECONDS = float(os.getenv("COALESCE_MAX_WAIT_SECONDS", "5"))
+# Request headers that change the response and so belong in the key
+VARY_HEADERS = ("if-none-match", "accept")
+
+
+def request_key(request: Request, vary: Iterable[str] = VARY_HEADERS) -> Tuple:
+    params = sorted((name, value) for name, value in request.query_params.multi_items() if value != "")
+    return (request.method, request.url.path, tuple(params),
+            tuple(request.headers.get(name, "") for name in vary))
+
+
+def _private_copy(result: Any) -> Any:
+    """Followers get their own Response object; other results are shared as they are"""
+    if isinstance(result, Response):
+        copy = Response(content=result.body, status_code=result.status_code, media_type=result.media_type)
+        copy.raw_headers = list(result.raw_headers)
+        return copy
+    return result
+
+
+@dataclass
+class CoalescingMetrics:
+    leaders: int = 0
+    followers: int = 0
+    timeouts: int = 0
+    errors: int = 0
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def add(self, name: str):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def snapshot(self) -> Dict[str, int]:
+        with self._lock:
+            return {name: getattr(self, name) for name in ("leaders", "followers", "timeouts", "errors")}
+
+
+class Coalescer:
+    def __init__(self, max_wait: float = MAX_WAIT_SECONDS):
+        self.max_wait = max_wait
+        self.metrics = CoalescingMetrics()
+        self._threads = SingleFlight()
+        self._futures: Dict[Tuple, asyncio.Future] = {}
+
+    def run(self, key, fn: Callable[[], Any]) -> Any:
+        """Run ``fn`` once for all concurrent callers with the same key (threads)"""
+        try:
+            result, shared = self._threads.do(key, fn, timeout=self.max_wait)
+        except TimeoutError:
+            self.metrics.add("timeouts")
+            return fn()
+        except Exception:
+            self.metrics.add("errors")
+            raise
+        self.metrics.add("followers" if shared else "leaders")
+        return _private_copy(result) if shared else result
+
+    async def run_async(self, key, fn: Callable[[], Any]) -> Any:
+        """Await ``fn()`` once for all concurrent callers with the same key (one event loop)"""
+        key = (id(asyncio.get_running_loop()), key)
+        future = self._futures.get(key)
+        if future is not None:
+            try:
+                result = await asyncio.wait_for(asyncio.shield(future), self.max_wait)
+            except asyncio.TimeoutError:
+                self.metrics.add("timeouts")
+                return await fn()
+            except Exception:
+                self.metrics.add("errors")
+                raise
+            self.metrics.add("followers")
+            return _private_copy(result)
+
+        future = self._futures[key] = asyncio.get_running_loop().create_future()
+        self.metrics.add("leaders")
+        try:
+            result = await fn()
+        except BaseException as e:
+            future.set_exception(e)
+            future.exception()  # retrieved here, so no "never retrieved" warning when nobody waited
+            if isinstance(e, Exception):
+                self.metrics.add("errors")
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            del self._futures[key]
+
+    def in_flight(self) -> int:
+        return self._threads.in_flight() + len(self._futures)
+
+
+coalescer = Coalescer()
+
+
+def coalesce(key: Optional[Callable[[Request], Any]] = None, using: Coalescer = None):
+    """Decorator for sync or async endpoints taking a ``request: Request`` parameter"""
+    key = key or request_key
+
+    def decorate(endpoint):
+        if "request" not in inspect.signature(endpoint).parameters:
+            raise TypeError(f"{endpoint.__name__} needs a 'request: Request' parameter to be coalesced")
+
+        if asyncio.iscoroutinefunction(endpoint):
+            @functools.wraps(endpoint)
+            async def async_wrapper(*args, **kwargs):
+                return await (using or coalescer).run_async(key(kwargs["request"]), lambda: endpoint(*args, **kwargs))
+            return async_wrapper
+
+        @functools.wraps(endpoint)
+        def wrapper(*args, **kwargs):
+            return (using or coalescer).run(key(kwargs["request"]), lambda: endpoint(*args, **kwargs))
+        return wrapper
+
+    return decorate
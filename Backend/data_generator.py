@@ -0,0 +1,429 @@
+"""Deterministic synthetic dataset builder for load and performance testing.
+
+Generates countries, airports, airlines, users, passengers, currencies,
+flights, seats, reservations, tickets and payments (plus optional front-end
+interaction events for the tracking server) with realistic skew:
+
+* hub airports: airport traffic follows a Zipf-like distribution, so a few
+  hubs appear on most routes,
+* popular routes: load factors grow with the popularity of both endpoints,
+* peak days: Fridays and Sundays run every rotation and fill up, mid-week
+  rotations are thinned out, and summer/holiday weeks book fuller,
+* frequent flyers: a small share of passengers holds most reservations.
+
+The same seed and config always produce the same rows. Everything is written
+with chunked executemany inserts, one transaction per chunk, so memory stays
+flat even at tens of millions of rows.
+
+Usage:
+    python data_generator.py --scale 10 --seed 7 --database-url sqlite:///./loadtest.db
+"""
+import argparse
+import os
+import random
+import sqlite3
+from dataclasses import dataclass, fields, replace
+from datetime import date, datetime, time, timedelta
+from typing import Dict, Iterable, Iterator, List
+
+from sqlalchemy import create_engine, event, func, insert, select
+from sqlalchemy.orm import sessionmaker
+
+from database import Base
+from models import (
+    Airline, Airport, Country, Currency, Flight, Passenger, Payment,
+    Reservation, Seat, Ticket, User
+)
+from models.fares import rebuild_fare_calendar
+from models.occupancy import rebuild_occupancy
+from schedule_import import build_seat_map
+
+DEFAULT_PASSWORD = "LoadTest123"  # Password of every generated user
+LETTERS = "ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+ALPHANUMERIC = LETTERS + "0123456789"
+# Monday .. Sunday share of rotations that actually operate
+DAY_WEIGHTS = (0.85, 0.7, 0.75, 0.85, 1.0, 0.8, 1.0)
+CURRENCIES = (
+    ("USD", "$", 1.0, "United States"),
+    ("EUR", "€", 0.92, "European Union"),
+    ("GBP", "£", 0.79, "United Kingdom"),
+    ("EGP", "E£", 48.5, "Egypt"),
+    ("AED", "د.إ", 3.67, "United Arab Emirates"),
+)
+PAYMENT_METHODS = ("credit card", "credit card", "debit card", "bank transfer", "cash")
+# Tables the generator fills
+GENERATED_MODELS = (Country, Currency, Airport, Airline, User, Passenger, Flight, Seat, Reservation, Ticket, Payment)
+
+
+@dataclass(frozen=True)
+class DatasetConfig:
+    seed: int = 42
+    countries: int = 20
+    airports: int = 100
+    airlines: int = 20
+    routes: int = 300
+    days: int = 90
+    start_date: date = date(2026, 1, 1)
+    seats_per_flight: int = 180
+    business_seats: int = 12
+    passengers: int = 50_000
+    users: int = 1_000
+    mean_load_factor: float = 0.7
+    payment_rate: float = 0.9
+    interactions: int = 100_000
+    hub_skew: float = 1.1
+    chunk_size: int = 20_000
+
+    def scaled(self, factor: float) -> "DatasetConfig":
+        """Grow the volume parameters; reference data grows more slowly than traffic"""
+        return replace(
+            self,
+            airports=min(17_576, int(self.airports * factor ** 0.5)),
+            airlines=min(1_296, int(self.airlines * factor ** 0.5)),
+            routes=int(self.routes * factor),
+            passengers=int(self.passengers * factor),
+            users=int(self.users * factor),
+            interactions=int(self.interactions * factor),
+        )
+
+
+def _code(index: int, length: int, alphabet: str = LETTERS) -> str:
+    """Deterministic fixed-length code for an index ("AAA", "AAB", ...)"""
+    chars = []
+    for _ in range(length):
+        index, remainder = divmod(index, len(alphabet))
+        chars.append(alphabet[remainder])
+    return "".join(reversed(chars))
+
+
+def _zipf_weights(count: int, skew: float) -> List[float]:
+    return [1.0 / (rank + 1) ** skew for rank in range(count)]
+
+
+def _chunks(rows: Iterable[dict], size: int) -> Iterator[List[dict]]:
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _season_factor(day: date) -> float:
+    if day.month in (6, 7, 8):
+        return 1.2
+    if (day.month == 12 and day.day >= 15) or (day.month == 1 and day.day <= 5):
+        return 1.25
+    return 1.0
+
+
+def _next_id(session, column) -> int:
+    return (session.execute(select(func.max(column))).scalar() or 0) + 1
+
+
+class DatasetGenerator:
+    def __init__(self, session, config: DatasetConfig = DatasetConfig(), verbose: bool = True):
+        self.session = session
+        self.config = config
+        self.rng = random.Random(config.seed)
+        self.verbose = verbose
+        self.counts: Dict[str, int] = {}
+
+    def _insert(self, model, rows: Iterable[dict], report: bool = True):
+        table = model.__table__
+        for chunk in _chunks(rows, self.config.chunk_size):
+            self.session.execute(insert(table), chunk)
+            self.session.commit()
+            self.counts[table.name] = self.counts.get(table.name, 0) + len(chunk)
+        if self.verbose and report:
+            print(f"  {table.name}: {self.counts.get(table.name, 0)} rows", flush=True)
+
+    def generate(self) -> Dict[str, int]:
+        """Build the whole dataset and return row counts per table.
+
+        Raises ValueError on a database that already has data: codes, names and
+        currencies are generated from the start every time and would collide.
+        """
+        if populated := [model.__tablename__ for model in GENERATED_MODELS
+                         if self.session.execute(select(model.__table__).limit(1)).first() is not None]:
+            raise ValueError(f"The database already has data ({', '.join(populated)}); "
+                             "generate into an empty database")
+        self.generate_reference_data()
+        self.generate_users()
+        self.generate_passengers()
+        self.generate_traffic()
+        # Reservations and seats went in with Core inserts, so the counters and fare calendar are built in one pass
+        rebuild_occupancy(self.session.connection())
+        rebuild_fare_calendar(self.session.connection())
+        self.session.commit()
+        return self.counts
+
+    def generate_reference_data(self):
+        config, rng = self.config, self.rng
+        self.country_codes = [_code(i, 2) for i in range(config.countries)]
+        self._insert(Country, (
+            {"code": code, "name": f"Country {code}", "continent": rng.choice(("Africa", "Asia", "Europe", "America")),
+             "official_language": "English", "is_schengen_zone_member": rng.random() < 0.2}
+            for code in self.country_codes
+        ))
+        self._insert(Currency, (
+            {"currency_code": code, "symbol": symbol, "exchange_rate": rate, "country_name": country,
+             "last_updated": datetime.combine(config.start_date, time())}
+            for code, symbol, rate, country in CURRENCIES
+        ))
+
+        # Airport rank doubles as hub-ness: airport 0 is the biggest hub
+        self.airport_codes = [_code(i, 3) for i in range(config.airports)]
+        self.airport_weights = _zipf_weights(config.airports, config.hub_skew)
+        country_weights = _zipf_weights(config.countries, 1.0)
+        self._insert(Airport, (
+            {"code": code, "name": f"{code} International", "location": f"City {code}",
+             "country_code": rng.choices(self.country_codes, country_weights)[0],
+             "number_of_terminals": 1 + int(4 * self.airport_weights[i])}
+            for i, code in enumerate(self.airport_codes)
+        ))
+
+        first_airline = _next_id(self.session, Airline.id)
+        self.airlines = []
+        rows = []
+        for i in range(config.airlines):
+            # Airlines cluster at the hubs
+            base = self.airport_codes[rng.choices(range(config.airports), self.airport_weights)[0]]
+            self.airlines.append((first_airline + i, _code(i, 2, ALPHANUMERIC), base))
+            rows.append({"id": first_airline + i, "name": f"Airline {i}", "iata_code": _code(i, 2, ALPHANUMERIC),
+                         "icao_code": _code(i, 3), "headquarters": f"City {base}",
+                         "year_founded": 1920 + rng.randrange(100), "base_airport_code": base})
+        self._insert(Airline, rows)
+
+    def generate_users(self):
+        first_user = _next_id(self.session, User.id)
+        self.ops_user_id = first_user
+
+        def rows():
+            for i in range(self.config.users):
+                hashed_password, salt = User.hash_password(DEFAULT_PASSWORD, f"{self.rng.getrandbits(128):032x}")
+                yield {"id": first_user + i, "username": f"loaduser{i}", "email": f"loaduser{i}@example.com",
+                       "salt": salt, "hashed_password": hashed_password, "is_active": True}
+        self._insert(User, rows())
+
+    def generate_passengers(self):
+        config, rng = self.config, self.rng
+        self.first_passenger = _next_id(self.session, Passenger.id)
+        nationality_weights = _zipf_weights(len(self.country_codes), 1.0)
+
+        def rows():
+            for i in range(config.passengers):
+                yield {
+                    "id": self.first_passenger + i,
+                    "name": f"Passenger {i}",
+                    "national_id": f"NID{config.seed:03d}{i:09d}",
+                    "email": f"passenger{i}@example.com",
+                    "phone_number": f"+20{rng.randrange(10 ** 9):09d}",
+                    "nationality": rng.choices(self.country_codes, nationality_weights)[0],
+                    "is_vip": rng.random() < 0.02,
+                    "address": f"{rng.randrange(1, 200)} Main St",
+                    "date_of_birth": date(1950, 1, 1) + timedelta(days=rng.randrange(365 * 55)),
+                    "passport_number": f"P{config.seed:03d}{i:09d}",
+                    "gender": rng.choice(("Male", "Female")),
+                    "frequent_flyer_number": f"FF{config.seed:03d}{i:09d}" if rng.random() < 0.3 else None,
+                }
+        self._insert(Passenger, rows())
+
+    def _routes(self):
+        """(flight_number, origin, destination, airline_id, departure clock, duration, popularity)"""
+        config, rng = self.config, self.rng
+        indices = range(config.airports)
+        top_weight = self.airport_weights[0] ** 2
+        routes = []
+        for i in range(config.routes):
+            origin = rng.choices(indices, self.airport_weights)[0]
+            destination = origin
+            while destination == origin:
+                destination = rng.choices(indices, self.airport_weights)[0]
+            origin_code = self.airport_codes[origin]
+            based_here = [a for a in self.airlines if a[2] == origin_code]
+            airline_id, iata, _ = rng.choice(based_here) if based_here else rng.choice(self.airlines)
+            popularity = (self.airport_weights[origin] * self.airport_weights[destination] / top_weight) ** 0.25
+            routes.append((
+                f"{iata}{i + 100}",
+                origin_code,
+                self.airport_codes[destination],
+                airline_id,
+                time(rng.randrange(5, 24), rng.choice((0, 15, 30, 45))),
+                timedelta(minutes=rng.randrange(45, 720, 5)),
+                popularity,
+            ))
+        return routes
+
+    def generate_traffic(self):
+        """Flights with their seats, reservations, tickets and payments, one day at a time"""
+        config, rng = self.config, self.rng
+        routes = self._routes()
+        flight_id = _next_id(self.session, Flight.id)
+        reservation_id = _next_id(self.session, Reservation.id)
+        ticket_number = _next_id(self.session, Ticket.ticket_number)
+        payment_number = self.session.execute(select(func.count()).select_from(Payment.__table__)).scalar() + 1
+        seat_map = build_seat_map(config.seats_per_flight, config.business_seats)
+        created_at = datetime.combine(config.start_date, time()) - timedelta(days=30)
+
+        for day_index in range(config.days):
+            day = config.start_date + timedelta(days=day_index)
+            day_weight = DAY_WEIGHTS[day.weekday()]
+            season = _season_factor(day)
+            flights, seats, reservations, tickets, payments = [], [], [], [], []
+
+            for flight_number, origin, destination, airline_id, clock, duration, popularity in routes:
+                if rng.random() > day_weight:
+                    continue
+                departure = datetime.combine(day, clock)
+                load_factor = config.mean_load_factor * popularity * season * (0.8 + 0.4 * day_weight)
+                load_factor = max(0.0, min(0.99, rng.gauss(load_factor, 0.08)))
+                booked = int(config.seats_per_flight * load_factor)
+
+                flights.append({
+                    "id": flight_id, "flight_number": flight_number, "departure_code": origin,
+                    "destination_code": destination, "departure_time": departure,
+                    "arrival_time": departure + duration, "total_seats": config.seats_per_flight,
+                    "available_seats": config.seats_per_flight - booked, "gate": f"{rng.choice('ABCDE')}{rng.randrange(1, 40)}",
+                    "terminal": str(rng.randrange(1, 4)), "airline_id": airline_id,
+                    "days_of_operation": 0b1111111, "user_id": self.ops_user_id,
+                })
+                booked_seats = set(rng.sample(range(config.seats_per_flight), booked))
+                for index, (seat_number, class_type, seat_type) in enumerate(seat_map):
+                    seats.append({
+                        "seat_number": seat_number, "class_type": class_type, "seat_type": seat_type,
+                        "is_available": index not in booked_seats,
+                        "reservation_time": departure - timedelta(days=rng.randrange(1, 60)) if index in booked_seats else None,
+                        "flight_id": flight_id,
+                    })
+                    if index not in booked_seats:
+                        continue
+
+                    # Squaring a uniform sample skews bookings towards the first (frequent flyer) passengers
+                    passenger_id = self.first_passenger + int(config.passengers * rng.random() ** 2)
+                    status = rng.choices(("Confirmed", "Pending", "Canceled"), (0.82, 0.12, 0.06))[0]
+                    price = Ticket.base_prices[class_type] * (0.6 + 0.8 * popularity * season)
+                    reservations.append({
+                        "id": reservation_id, "passenger_id": passenger_id, "flight_id": flight_id,
+                        "seat_number": seat_number, "status": status, "final_price": round(price, 2),
+                        "created_at": created_at + timedelta(days=day_index, seconds=rng.randrange(86400 * 30)),
+                    })
+                    tickets.append({
+                        "ticket_number": ticket_number, "passenger_id": passenger_id, "flight_id": flight_id,
+                        "seat_number": seat_number, "ticket_class": class_type,
+                        "status": "canceled" if status == "Canceled" else "active",
+                        "issue_date": departure - timedelta(days=rng.randrange(1, 60)),
+                        "expiration_date": departure + timedelta(days=365),
+                        "base_price": Ticket.base_prices[class_type], "final_price": round(price, 2),
+                        "reservation_id": reservation_id,
+                    })
+                    if status != "Pending" and rng.random() < config.payment_rate:
+                        refundable = class_type in Ticket.refundable_classes
+                        payments.append({
+                            "payment_id": f"PAY{config.seed:03d}{payment_number:010d}", "amount": round(price, 2),
+                            "method": rng.choice(PAYMENT_METHODS),
+                            "status": "refunded" if status == "Canceled" and refundable else "completed",
+                            "reservation_id": reservation_id,
+                            "payment_date": departure - timedelta(days=rng.randrange(1, 60)),
+                            "transaction_id": f"TXN{config.seed:03d}{payment_number:010d}",
+                            "currency": rng.choices(CURRENCIES, (0.5, 0.2, 0.1, 0.15, 0.05))[0][0],
+                            "is_refundable": refundable,
+                        })
+                        payment_number += 1
+                    reservation_id += 1
+                    ticket_number += 1
+                flight_id += 1
+
+            self._insert(Flight, flights, report=False)
+            self._insert(Seat, seats, report=False)
+            self._insert(Reservation, reservations, report=False)
+            self._insert(Ticket, tickets, report=False)
+            self._insert(Payment, payments, report=False)
+            if self.verbose and (day_index + 1) % 10 == 0:
+                print(f"  day {day_index + 1}/{config.days}: {self.counts.get('flights', 0)} flights, "
+                      f"{self.counts.get('reservations', 0)} reservations", flush=True)
+
+    def generate_interactions(self, db_path: str):
+        """Click/scroll events for the tracking server's interactions table"""
+        config, rng = self.config, self.rng
+        # Clicks cluster around a handful of UI hotspots (search button, results, nav)
+        hotspots = [(rng.randrange(100, 1800), rng.randrange(80, 1000), rng.randrange(10, 80)) for _ in range(8)]
+        hotspot_weights = _zipf_weights(len(hotspots), 1.0)
+        conn = sqlite3.connect(db_path)
+        try:
+            conn.execute('''CREATE TABLE IF NOT EXISTS interactions (
+                                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                                event TEXT NOT NULL,
+                                x INTEGER,
+                                y INTEGER,
+                                scroll_top INTEGER,
+                                scroll_height INTEGER
+                            )''')
+
+            def rows():
+                for _ in range(config.interactions):
+                    if rng.random() < 0.75:
+                        x, y, spread = rng.choices(hotspots, hotspot_weights)[0]
+                        yield ("click", int(rng.gauss(x, spread)), int(rng.gauss(y, spread)), None, None)
+                    else:
+                        scroll_height = rng.choice((2400, 3600, 5200))
+                        yield ("scroll", None, None, int(scroll_height * rng.random() ** 1.5), scroll_height)
+
+            for chunk in _chunks(rows(), config.chunk_size):
+                conn.executemany('''INSERT INTO interactions (event, x, y, scroll_top, scroll_height)
+                                    VALUES (?, ?, ?, ?, ?)''', chunk)
+                conn.commit()
+                self.counts["interactions"] = self.counts.get("interactions", 0) + len(chunk)
+        finally:
+            conn.close()
+        if self.verbose:
+            print(f"  interactions: {self.counts.get('interactions', 0)} rows", flush=True)
+
+
+def create_dataset_engine(database_url: str):
+    """Engine tuned for one-off bulk loads: no fsync, in-memory journal"""
+    engine = create_engine(database_url, connect_args={"check_same_thread": False})
+    if database_url.startswith("sqlite"):
+        @event.listens_for(engine, "connect")
+        def _fast_pragmas(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            cursor.execute("PRAGMA synchronous=OFF")
+            cursor.execute("PRAGMA journal_mode=MEMORY")
+            cursor.close()
+    return engine
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build a reproducible synthetic dataset")
+    parser.add_argument("--database-url", default="sqlite:///./loadtest.db")
+    parser.add_argument("--seed", type=int, default=DatasetConfig.seed)
+    parser.add_argument("--scale", type=float, default=1.0, help="Multiplier for routes, passengers, users and events")
+    parser.add_argument("--days", type=int, default=DatasetConfig.days)
+    parser.add_argument("--start-date", type=date.fromisoformat, default=DatasetConfig.start_date)
+    parser.add_argument("--interactions-db", help="SQLite file of the tracking server to fill with events")
+    args = parser.parse_args(argv)
+
+    config = DatasetConfig(seed=args.seed, days=args.days, start_date=args.start_date).scaled(args.scale)
+    print("Generating dataset with " + ", ".join(f"{f.name}={getattr(config, f.name)}" for f in fields(config)))
+
+    engine = create_dataset_engine(args.database_url)
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine, autoflush=False)()
+    try:
+        generator = DatasetGenerator(session, config)
+        try:
+            generator.generate()
+        except ValueError as e:
+            parser.exit(1, f"❌ {e}\n")
+        if args.interactions_db:
+            generator.generate_interactions(os.path.abspath(args.interactions_db))
+    finally:
+        session.close()
+
+    print("✅ Dataset generated: " + ", ".join(f"{table}={count}" for table, count in generator.counts.items()))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,11 @@
+import os
+
 from sqlalchemy import create_engine
-from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import declarative_base, sessionmaker
 from sqlalchemy.pool import QueuePool 
 
-SQLALCHEMY_DATABASE_URL = "sqlite:///./flight_reservation.db"
+# DATABASE_URL lets benchmarks and tools point the app at another database
+SQLALCHEMY_DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./flight_reservation.db")
 
 engine = create_engine(
     SQLALCHEMY_DATABASE_URL,
@@ -1,7 +1,11 @@
 from database import engine, Base
+from migrations import upgrade
 from models import User, Flight, Passenger, Reservation
 
 def init_db():
     print("Creating database tables...")
     Base.metadata.create_all(bind=engine)
+    with engine.begin() as connection:
+        # create_all leaves existing tables alone; migrations bring them up to the models
+        upgrade(connection)
     print("Database tables created successfully.")
\ No newline at end of file
@@ -0,0 +1,243 @@
+"""Streaming bulk exports of reservations and flights.
+
+Rows come straight from a joined Core SELECT executed with ``yield_per``, so
+nothing is hydrated into ORM objects and only one batch is ever held in
+memory. Each batch is encoded and handed to the HTTP response as soon as it
+is read, which keeps memory flat regardless of how many rows are exported.
+
+Formats:
+    ndjson    one JSON object per row
+    csv       header line plus one line per row
+    columnar  one JSON object per batch, values grouped by column
+    parquet   Apache Parquet, one row group per batch (needs pyarrow)
+"""
+import csv
+import io
+import json
+from datetime import date, datetime
+from typing import Callable, Iterable, Iterator, List
+
+from sqlalchemy import Boolean, Date, DateTime, Float, Integer, select
+
+from models import Airline, Flight, Passenger, Reservation
+
+EXPORT_FORMATS = {
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "csv": ("text/csv", "csv"),
+    "columnar": ("application/x-ndjson", "columnar.ndjson"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+}
+DEFAULT_BATCH_SIZE = 5000
+
+
+def reservation_export_query(status: str = None, flight_id: int = None,
+                             created_from: datetime = None, created_to: datetime = None):
+    reservations = Reservation.__table__
+    passengers = Passenger.__table__
+    flights = Flight.__table__
+    query = (
+        select(
+            reservations.c.id.label("reservation_id"),
+            reservations.c.status,
+            reservations.c.seat_number,
+            reservations.c.final_price,
+            reservations.c.created_at,
+            reservations.c.booking_agent_id,
+            passengers.c.id.label("passenger_id"),
+            passengers.c.name.label("passenger_name"),
+            passengers.c.national_id.label("passenger_national_id"),
+            flights.c.id.label("flight_id"),
+            flights.c.flight_number,
+            flights.c.departure_code,
+            flights.c.destination_code,
+            flights.c.departure_time,
+        )
+        .select_from(
+            reservations
+            .outerjoin(passengers, passengers.c.id == reservations.c.passenger_id)
+            .outerjoin(flights, flights.c.id == reservations.c.flight_id)
+        )
+        .order_by(reservations.c.id)
+    )
+    if status:
+        query = query.where(reservations.c.status == status)
+    if flight_id is not None:
+        query = query.where(reservations.c.flight_id == flight_id)
+    if created_from:
+        query = query.where(reservations.c.created_at >= created_from)
+    if created_to:
+        query = query.where(reservations.c.created_at < created_to)
+    return query
+
+
+def flight_export_query(departure_from: datetime = None, departure_to: datetime = None):
+    flights = Flight.__table__
+    airlines = Airline.__table__
+    query = (
+        select(
+            flights.c.id.label("flight_id"),
+            flights.c.flight_number,
+            airlines.c.name.label("airline_name"),
+            flights.c.departure_code,
+            flights.c.destination_code,
+            flights.c.departure_time,
+            flights.c.arrival_time,
+            flights.c.total_seats,
+            flights.c.available_seats,
+            flights.c.gate,
+            flights.c.terminal,
+        )
+        .select_from(flights.outerjoin(airlines, airlines.c.id == flights.c.airline_id))
+        .order_by(flights.c.id)
+    )
+    if departure_from:
+        query = query.where(flights.c.departure_time >= departure_from)
+    if departure_to:
+        query = query.where(flights.c.departure_time < departure_to)
+    return query
+
+
+def _json_default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Cannot serialise {type(value).__name__}")
+
+
+def _ndjson(columns: List[str], batches: Iterable[list], query) -> Iterator[bytes]:
+    for batch in batches:
+        yield "".join(
+            json.dumps(dict(zip(columns, row)), default=_json_default) + "\n" for row in batch
+        ).encode()
+
+
+def _csv(columns: List[str], batches: Iterable[list], query) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for batch in batches:
+        writer.writerows(batch)
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+def _columnar(columns: List[str], batches: Iterable[list], query) -> Iterator[bytes]:
+    for batch in batches:
+        data = {name: [row[index] for row in batch] for index, name in enumerate(columns)}
+        yield (json.dumps({"rows": len(batch), "columns": data}, default=_json_default) + "\n").encode()
+
+
+class _ByteSink:
+    """Write-only file object that hands written bytes back to the streamer"""
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def _arrow_schema(query):
+    import pyarrow as pa
+
+    def arrow_type(sql_type):
+        if isinstance(sql_type, Boolean):
+            return pa.bool_()
+        if isinstance(sql_type, Integer):
+            return pa.int64()
+        if isinstance(sql_type, Float):
+            return pa.float64()
+        if isinstance(sql_type, DateTime):
+            return pa.timestamp("us")
+        if isinstance(sql_type, Date):
+            return pa.date32()
+        return pa.string()
+
+    return pa.schema([(column.name, arrow_type(column.type)) for column in query.selected_columns])
+
+
+def _parquet(columns: List[str], batches: Iterable[list], query) -> Iterator[bytes]:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = _arrow_schema(query)
+    sink = _ByteSink()
+    writer = pq.ParquetWriter(sink, schema)
+    try:
+        for batch in batches:
+            arrays = [
+                pa.array([row[index] for row in batch], type=field.type)
+                for index, field in enumerate(schema)
+            ]
+            writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+            data = sink.drain()
+            if data:
+                yield data
+    finally:
+        writer.close()
+    yield sink.drain()
+
+
+_ENCODERS = {"ndjson": _ndjson, "csv": _csv, "columnar": _columnar, "parquet": _parquet}
+
+
+def check_format(export_format: str):
+    """Raise ValueError for formats that can't be produced here"""
+    if export_format not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format {export_format!r}; use one of {', '.join(EXPORT_FORMATS)}")
+    if export_format == "parquet":
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            raise ValueError("Parquet export needs the optional pyarrow package")
+
+
+def stream_export(session_factory: Callable, query, export_format: str,
+                  batch_size: int = DEFAULT_BATCH_SIZE) -> Iterator[bytes]:
+    """Yield the encoded export chunk by chunk.
+
+    The session is opened and closed by the generator itself because the
+    response body is streamed after the request's own session is gone.
+    """
+    check_format(export_format)
+    session = session_factory()
+    try:
+        result = session.execute(query.execution_options(yield_per=batch_size))
+        columns = list(result.keys())
+        yield from _ENCODERS[export_format](columns, result.partitions(), query)
+    finally:
+        session.close()
+
+
+def export_response(session_factory: Callable, query, export_format: str, name: str,
+                    batch_size: int = DEFAULT_BATCH_SIZE):
+    """StreamingResponse for an export, served as a file download"""
+    from fastapi.responses import StreamingResponse
+
+    check_format(export_format)
+    media_type, extension = EXPORT_FORMATS[export_format]
+    return StreamingResponse(
+        stream_export(session_factory, query, export_format, batch_size),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{name}.{extension}"'},
+    )
@@ -0,0 +1,310 @@
+"""Temporary seat holds that expire on their own.
+
+A hold takes seats off sale (``is_available = False``) while a customer
+completes checkout. Holds are stored in ``seat_holds`` so they survive a
+restart, and their deadlines are also kept in an in-process min-heap so the
+reaper thread knows exactly when to wake up and which holds to release,
+instead of scanning the table. Extending a hold pushes a new heap entry; the
+old one is skipped when popped (lazy deletion). A slower periodic sweep over
+the indexed ``expires_at`` column picks up holds this process never saw
+(created by another worker, or before a restart).
+
+Settings (environment):
+    SEAT_HOLD_TTL=600          default hold length in seconds
+    SEAT_HOLD_MAX_TTL=1800     longest a single hold or extension may ask for
+    SEAT_HOLD_SWEEP=30         seconds between full sweeps of the table
+"""
+import heapq
+import os
+import secrets
+import threading
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional, Sequence
+
+from sqlalchemy import delete, insert, select, update
+
+from database import SessionLocal
+from models import Flight, Seat, SeatHold
+from models.fares import refresh_fare_calendar
+
+HOLD_TTL_SECONDS = int(os.getenv("SEAT_HOLD_TTL", "600"))
+HOLD_MAX_TTL_SECONDS = int(os.getenv("SEAT_HOLD_MAX_TTL", "1800"))
+SWEEP_INTERVAL_SECONDS = float(os.getenv("SEAT_HOLD_SWEEP", "30"))
+REAP_BATCH_SIZE = 500
+
+
+class HoldSchedule:
+    """Min-heap of hold deadlines with lazy deletion"""
+
+    def __init__(self):
+        self._heap = []
+        self._deadlines: Dict[str, datetime] = {}
+        self._lock = threading.Lock()
+
+    def push(self, hold_id: str, expires_at: datetime):
+        with self._lock:
+            self._deadlines[hold_id] = expires_at
+            heapq.heappush(self._heap, (expires_at, hold_id))
+
+    def discard(self, hold_id: str):
+        with self._lock:
+            self._deadlines.pop(hold_id, None)
+
+    def pop_due(self, now: datetime, limit: int = REAP_BATCH_SIZE) -> List[str]:
+        """Remove and return up to ``limit`` holds whose deadline has passed"""
+        due = []
+        with self._lock:
+            while self._heap and self._heap[0][0] <= now and len(due) < limit:
+                expires_at, hold_id = heapq.heappop(self._heap)
+                if self._deadlines.get(hold_id) == expires_at:  # else extended or released since
+                    del self._deadlines[hold_id]
+                    due.append(hold_id)
+        return due
+
+    def next_deadline(self) -> Optional[datetime]:
+        with self._lock:
+            while self._heap and self._deadlines.get(self._heap[0][1]) != self._heap[0][0]:
+                heapq.heappop(self._heap)
+            return self._heap[0][0] if self._heap else None
+
+    def __len__(self):
+        return len(self._deadlines)
+
+
+def _ttl(ttl_seconds: Optional[int]) -> timedelta:
+    ttl_seconds = HOLD_TTL_SECONDS if ttl_seconds is None else ttl_seconds
+    if not 0 < ttl_seconds <= HOLD_MAX_TTL_SECONDS:
+        raise ValueError(f"Hold TTL must be between 1 and {HOLD_MAX_TTL_SECONDS} seconds")
+    return timedelta(seconds=ttl_seconds)
+
+
+def _owned(hold_id: str, user_id: Optional[int]) -> tuple:
+    """Conditions matching a hold, and only when it belongs to ``user_id`` if one is given.
+
+    Someone else's hold looks like a missing one, so hold ids can't be probed.
+    """
+    if user_id is None:
+        return (SeatHold.hold_id == hold_id,)
+    return SeatHold.hold_id == hold_id, SeatHold.user_id == user_id
+
+
+class SeatHoldService:
+    def __init__(self, session_factory: Callable = SessionLocal, clock: Callable[[], datetime] = datetime.now):
+        self.session_factory = session_factory
+        self.clock = clock
+        self.schedule = HoldSchedule()
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    # Hold lifecycle
+
+    def hold(self, session, flight_id: int, seat_numbers: Sequence[str], user_id: int = None,
+             ttl_seconds: int = None) -> dict:
+        """Take the seats off sale; all of them or none. Raises LookupError / ValueError"""
+        ttl = _ttl(ttl_seconds)
+        seat_numbers = list(dict.fromkeys(seat_numbers))
+        if not seat_numbers:
+            raise ValueError("No seats to hold")
+        now = self.clock()
+        try:
+            if session.get(Flight, flight_id) is None:
+                raise LookupError("Flight not found")
+            seats = session.execute(
+                select(Seat.seat_id, Seat.seat_number)
+                .where(Seat.flight_id == flight_id, Seat.seat_number.in_(seat_numbers))
+            ).all()
+            if missing := sorted(set(seat_numbers) - {seat.seat_number for seat in seats}):
+                raise LookupError(f"Seats not found: {missing}")
+            claimed = session.execute(
+                update(Seat)
+                .where(Seat.seat_id.in_([seat.seat_id for seat in seats]), Seat.is_available == True)
+                .values(is_available=False, reservation_time=now)
+                .execution_options(synchronize_session=False)
+            ).rowcount
+            if claimed != len(seats):
+                raise ValueError("Seats not available")
+            refresh_fare_calendar(session.connection(), [flight_id])
+
+            hold_id = secrets.token_urlsafe(16)
+            expires_at = now + ttl
+            session.execute(insert(SeatHold), [
+                {"hold_id": hold_id, "seat_id": seat.seat_id, "flight_id": flight_id, "seat_number": seat.seat_number,
+                 "user_id": user_id, "created_at": now, "expires_at": expires_at}
+                for seat in seats
+            ])
+            session.commit()
+        except Exception:
+            session.rollback()
+            raise
+        self._schedule(hold_id, expires_at)
+        return {"hold_id": hold_id, "flight_id": flight_id, "seat_numbers": seat_numbers, "expires_at": expires_at}
+
+    def extend(self, session, hold_id: str, ttl_seconds: int = None, user_id: int = None) -> dict:
+        """Push the deadline of a live hold to now + ttl; with ``user_id``, only a hold of that user"""
+        ttl = _ttl(ttl_seconds)
+        now = self.clock()
+        expires_at = now + ttl
+        extended = session.execute(
+            update(SeatHold)
+            .where(*_owned(hold_id, user_id), SeatHold.expires_at > now)
+            .values(expires_at=expires_at)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        session.commit()
+        if not extended:
+            raise LookupError("Hold not found or already expired")
+        self._schedule(hold_id, expires_at)
+        return self._describe(session, hold_id)
+
+    def release(self, session, hold_id: str, user_id: int = None) -> int:
+        """Put the held seats back on sale now; returns how many were released.
+
+        With ``user_id``, only a hold of that user is released.
+        """
+        released = self._release(session, [hold_id], owner=user_id)
+        if not released:
+            raise LookupError("Hold not found or already expired")
+        self.schedule.discard(hold_id)
+        return released
+
+    def take(self, session, hold_id: str, flight_id: int, seat_number: str, user_id: int = None) -> Seat:
+        """Turn one held seat into a booking: drop it from the hold and return the seat.
+
+        The seat stays unavailable; the caller commits together with its reservation.
+        With ``user_id``, only a seat held by that user can be taken.
+        """
+        live = (*_owned(hold_id, user_id), SeatHold.flight_id == flight_id,
+                SeatHold.seat_number == seat_number, SeatHold.expires_at > self.clock())
+        seat_id = session.execute(select(SeatHold.seat_id).where(*live)).scalar()
+        # Conditional delete, so a hold reaped in between is not booked anyway
+        if seat_id is None or not session.execute(
+            delete(SeatHold).where(*live).execution_options(synchronize_session=False)
+        ).rowcount:
+            raise LookupError("Seat is not held under this hold, or the hold has expired")
+        return session.get(Seat, seat_id)
+
+    def _describe(self, session, hold_id: str) -> dict:
+        rows = session.execute(
+            select(SeatHold.flight_id, SeatHold.seat_number, SeatHold.expires_at).where(SeatHold.hold_id == hold_id)
+        ).all()
+        return {"hold_id": hold_id, "flight_id": rows[0].flight_id,
+                "seat_numbers": [row.seat_number for row in rows], "expires_at": rows[0].expires_at}
+
+    def _schedule(self, hold_id: str, expires_at: datetime):
+        earliest = self.schedule.next_deadline()
+        self.schedule.push(hold_id, expires_at)
+        if earliest is None or expires_at < earliest:
+            self._wake.set()  # the reaper is sleeping towards a later deadline
+
+    def _release(self, session, hold_ids: Sequence[str], expired_before: datetime = None, owner: int = None) -> int:
+        """Free the seats of the given holds in one transaction.
+
+        With ``expired_before`` only holds that are still past their deadline
+        are released, so a hold extended by another worker meanwhile survives.
+        With ``owner`` only that user's holds are released.
+        """
+        condition = [SeatHold.hold_id.in_(hold_ids)]
+        if owner is not None:
+            condition.append(SeatHold.user_id == owner)
+        if expired_before is not None:
+            condition.append(SeatHold.expires_at <= expired_before)
+        try:
+            held = session.execute(select(SeatHold.seat_id, SeatHold.flight_id).where(*condition)).all()
+            seat_ids = [seat_id for seat_id, _ in held]
+            if seat_ids:
+                session.execute(
+                    update(Seat).where(Seat.seat_id.in_(seat_ids))
+                    .values(is_available=True, reservation_time=None)
+                    .execution_options(synchronize_session=False)
+                )
+                refresh_fare_calendar(session.connection(), {flight_id for _, flight_id in held})
+                session.execute(delete(SeatHold).where(*condition).execution_options(synchronize_session=False))
+            session.commit()
+        except Exception:
+            session.rollback()
+            raise
+        return len(seat_ids)
+
+    # Reaper
+
+    def reap(self, now: datetime = None) -> int:
+        """Release every hold the heap says is due, in batches; returns seats released"""
+        now = now or self.clock()
+        released = 0
+        session = self.session_factory()
+        try:
+            while due := self.schedule.pop_due(now):
+                released += self._release(session, due, expired_before=now)
+        finally:
+            session.close()
+        return released
+
+    def sweep(self, now: datetime = None) -> int:
+        """Release expired holds straight from the table, including ones not in this heap"""
+        now = now or self.clock()
+        released = 0
+        session = self.session_factory()
+        try:
+            while True:
+                due = session.execute(
+                    select(SeatHold.hold_id).where(SeatHold.expires_at <= now)
+                    .order_by(SeatHold.expires_at).distinct().limit(REAP_BATCH_SIZE)
+                ).scalars().all()
+                if not due:
+                    break
+                released += self._release(session, due, expired_before=now)
+                for hold_id in due:
+                    self.schedule.discard(hold_id)
+        finally:
+            session.close()
+        return released
+
+    def load(self):
+        """Seed the heap with the live holds already in the table"""
+        session = self.session_factory()
+        try:
+            rows = session.execute(
+                select(SeatHold.hold_id, SeatHold.expires_at).distinct()
+            ).all()
+        finally:
+            session.close()
+        for hold_id, expires_at in rows:
+            self.schedule.push(hold_id, expires_at)
+
+    def _run(self):
+        last_sweep = None
+        while not self._stopping.is_set():
+            self._wake.clear()
+            now = self.clock()
+            try:
+                if last_sweep is None or (now - last_sweep).total_seconds() >= SWEEP_INTERVAL_SECONDS:
+                    self.sweep(now)
+                    last_sweep = now
+                self.reap(now)
+            except Exception as e:
+                print(f"Seat hold reaper error: {e}")
+            deadline = self.schedule.next_deadline()
+            timeout = SWEEP_INTERVAL_SECONDS
+            if deadline is not None:
+                timeout = min(timeout, max((deadline - self.clock()).total_seconds(), 0.0))
+            self._wake.wait(timeout)
+
+    def start(self):
+        """Start the background reaper thread (idempotent)"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stopping.clear()
+        self.load()
+        self._thread = threading.Thread(target=self._run, name="seat-hold-reaper", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5):
+        self._stopping.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+
+hold_service = SeatHoldService()
@@ -0,0 +1,276 @@
+"""Idempotency-Key support for the create endpoints.
+
+A client that sends ``Idempotency-Key: <unique value>`` with a POST to one of
+IDEMPOTENT_ROUTES gets the work done at most once for that key. The first
+request claims the key; once it finishes, its status and (zlib-compressed)
+body are stored and every retry with the same key gets that response
+replayed with an ``Idempotent-Replayed: true`` header, without touching the
+endpoint. A retry that arrives while the first attempt is still running
+waits for it instead of running concurrently. Keys are scoped to the
+caller's Authorization header, expire after IDEMPOTENCY_TTL seconds, and
+reusing a key with a different request body is rejected with 422.
+Responses of 500 and above are not stored, so those retries run again.
+
+A claim is leased for IDEMPOTENCY_LEASE seconds. If the worker holding it
+dies before finishing, the key is not stuck until it expires: once the lease
+has lapsed, the next retry takes the claim over and runs the request.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import zlib
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Callable, Optional
+
+from sqlalchemy import and_, delete, insert, or_, update
+from sqlalchemy.exc import IntegrityError
+from starlette.concurrency import run_in_threadpool
+
+from database import SessionLocal
+from models import IdempotencyRecord
+
+IDEMPOTENT_ROUTES = {
+    ("POST", "/reservations/"),
+    ("POST", "/reservations/batch"),
+    ("POST", "/tickets/"),
+    ("POST", "/payments/"),
+}
+IDEMPOTENCY_TTL = timedelta(seconds=int(os.getenv("IDEMPOTENCY_TTL", str(24 * 3600))))
+# How long an unfinished claim blocks retries; longer than any request should take
+LEASE = timedelta(seconds=int(os.getenv("IDEMPOTENCY_LEASE", "60")))
+# How long a retry waits for the original attempt before giving up with 409
+WAIT_SECONDS = float(os.getenv("IDEMPOTENCY_WAIT_SECONDS", "10"))
+POLL_SECONDS = 0.05
+MAX_KEY_LENGTH = 255
+EVICT_EVERY = 200  # claims between sweeps of expired keys
+COMPRESS_OVER = 256
+
+
+@dataclass
+class StoredResponse:
+    status_code: int
+    content_type: Optional[str]
+    body: bytes
+
+
+class IdempotencyStore:
+    """Key claims and stored responses in the idempotency_keys table"""
+
+    def __init__(self, session_factory: Callable = SessionLocal, ttl: timedelta = IDEMPOTENCY_TTL,
+                 clock: Callable[[], datetime] = datetime.now, lease: timedelta = LEASE):
+        self.session_factory = session_factory
+        self.ttl = ttl
+        self.lease = lease
+        self.clock = clock
+        self._claims = 0
+
+    def claim(self, key_hash: str, fingerprint: str):
+        """Returns ("new", None), ("done", StoredResponse), ("in_progress", None) or ("mismatch", None)"""
+        now = self.clock()
+        self._claims += 1
+        session = self.session_factory()
+        try:
+            if self._claims % EVICT_EVERY == 0:
+                session.execute(delete(IdempotencyRecord).where(IdempotencyRecord.expires_at <= now))
+                session.commit()
+            for _ in range(2):
+                try:
+                    session.execute(insert(IdempotencyRecord).values(
+                        key_hash=key_hash, fingerprint=fingerprint, state="in_progress",
+                        created_at=now, expires_at=now + self.ttl, lease_until=now + self.lease
+                    ))
+                    session.commit()
+                    return "new", None
+                except IntegrityError:
+                    session.rollback()
+                record = session.get(IdempotencyRecord, key_hash)
+                if record is None:
+                    continue  # finished-and-abandoned in between; claim again
+                if record.expires_at <= now:
+                    session.execute(delete(IdempotencyRecord).where(IdempotencyRecord.key_hash == key_hash,
+                                                                    IdempotencyRecord.expires_at <= now))
+                    session.commit()
+                    continue
+                if record.fingerprint != fingerprint:
+                    return "mismatch", None
+                if record.state != "done":
+                    if self._lapsed(record, now) and self._take_over(session, key_hash, now):
+                        return "new", None
+                    return "in_progress", None
+                return "done", self._response(record)
+            return "in_progress", None
+        finally:
+            session.close()
+
+    def _lapsed(self, record: IdempotencyRecord, now: datetime) -> bool:
+        # Claims made before leases existed count from their creation
+        return (record.lease_until or record.created_at + self.lease) <= now
+
+    def _take_over(self, session, key_hash: str, now: datetime) -> bool:
+        """Re-claim an in-progress key whose lease lapsed; only one of several retries wins"""
+        lapsed = or_(IdempotencyRecord.lease_until <= now,
+                     and_(IdempotencyRecord.lease_until.is_(None), IdempotencyRecord.created_at <= now - self.lease))
+        taken = session.execute(
+            update(IdempotencyRecord)
+            .where(IdempotencyRecord.key_hash == key_hash, IdempotencyRecord.state == "in_progress", lapsed)
+            .values(lease_until=now + self.lease)
+        ).rowcount
+        session.commit()
+        return bool(taken)
+
+    def lookup(self, key_hash: str) -> Optional[StoredResponse]:
+        """The stored response, once the key's first request has finished"""
+        session = self.session_factory()
+        try:
+            record = session.get(IdempotencyRecord, key_hash)
+            if record is None or record.state != "done":
+                return None
+            return self._response(record)
+        finally:
+            session.close()
+
+    def is_claimed(self, key_hash: str) -> bool:
+        """Whether the key is done or still leased to a running request"""
+        session = self.session_factory()
+        try:
+            record = session.get(IdempotencyRecord, key_hash)
+            return record is not None and (record.state == "done" or not self._lapsed(record, self.clock()))
+        finally:
+            session.close()
+
+    def complete(self, key_hash: str, status_code: int, content_type: Optional[str], body: bytes):
+        compressed = len(body) > COMPRESS_OVER
+        session = self.session_factory()
+        try:
+            session.execute(
+                update(IdempotencyRecord).where(IdempotencyRecord.key_hash == key_hash).values(
+                    state="done", status_code=status_code, content_type=content_type,
+                    # First byte flags whether the rest is compressed
+                    body=(b"z" + zlib.compress(body)) if compressed else (b"-" + body),
+                )
+            )
+            session.commit()
+        finally:
+            session.close()
+
+    def abandon(self, key_hash: str):
+        """Forget a claim whose request failed, so a retry can run again"""
+        session = self.session_factory()
+        try:
+            session.execute(delete(IdempotencyRecord).where(IdempotencyRecord.key_hash == key_hash))
+            session.commit()
+        finally:
+            session.close()
+
+    @staticmethod
+    def _response(record: IdempotencyRecord) -> StoredResponse:
+        raw = record.body or b"-"
+        body = zlib.decompress(raw[1:]) if raw[:1] == b"z" else raw[1:]
+        return StoredResponse(record.status_code, record.content_type, body)
+
+
+def _json_response(status_code: int, detail: str):
+    return StoredResponse(status_code, "application/json", json.dumps({"detail": detail}).encode())
+
+
+async def _send_stored(send, response: StoredResponse, replayed: bool):
+    headers = [(b"content-length", str(len(response.body)).encode())]
+    if response.content_type:
+        headers.append((b"content-type", response.content_type.encode()))
+    if replayed:
+        headers.append((b"idempotent-replayed", b"true"))
+    await send({"type": "http.response.start", "status": response.status_code, "headers": headers})
+    await send({"type": "http.response.body", "body": response.body})
+
+
+class IdempotencyMiddleware:
+    """Pure ASGI middleware; only requests to IDEMPOTENT_ROUTES with the header are affected"""
+
+    def __init__(self, app, store: IdempotencyStore, routes=IDEMPOTENT_ROUTES):
+        self.app = app
+        self.store = store
+        self.routes = routes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or (scope["method"], scope["path"]) not in self.routes:
+            await self.app(scope, receive, send)
+            return
+        headers = dict(scope["headers"])
+        key = headers.get(b"idempotency-key")
+        if key is None:
+            await self.app(scope, receive, send)
+            return
+        if not key or len(key) > MAX_KEY_LENGTH:
+            await _send_stored(send, _json_response(400, "Invalid Idempotency-Key header"), False)
+            return
+
+        # Read the whole body up front: it is part of the fingerprint and replayed to the app
+        chunks, more_body = [], True
+        while more_body:
+            message = await receive()
+            chunks.append(message.get("body", b""))
+            more_body = message.get("more_body", False)
+        body = b"".join(chunks)
+
+        key_hash = hashlib.sha256(headers.get(b"authorization", b"") + b"\0" + key).hexdigest()
+        fingerprint = hashlib.sha256(scope["method"].encode() + scope["path"].encode() + b"\0" + body).hexdigest()
+        outcome, stored = await run_in_threadpool(self.store.claim, key_hash, fingerprint)
+
+        waited = 0.0
+        while outcome == "in_progress" and waited < WAIT_SECONDS:
+            await asyncio.sleep(POLL_SECONDS)
+            waited += POLL_SECONDS
+            stored = await run_in_threadpool(self.store.lookup, key_hash)
+            if stored is not None:
+                outcome = "done"
+            elif not await run_in_threadpool(self.store.is_claimed, key_hash):
+                # The original attempt failed, or its lease lapsed: take over
+                outcome, stored = await run_in_threadpool(self.store.claim, key_hash, fingerprint)
+
+        if outcome == "mismatch":
+            await _send_stored(send, _json_response(422, "Idempotency-Key was already used with a different request"), False)
+            return
+        if outcome == "in_progress":
+            await _send_stored(send, _json_response(409, "A request with this Idempotency-Key is still in progress"), False)
+            return
+        if outcome == "done":
+            await _send_stored(send, stored, True)
+            return
+
+        await self._run_and_store(scope, send, key_hash, body)
+
+    async def _run_and_store(self, scope, send, key_hash: str, body: bytes):
+        delivered = False
+
+        async def replay_body():
+            nonlocal delivered
+            if delivered:
+                return {"type": "http.disconnect"}
+            delivered = True
+            return {"type": "http.request", "body": body, "more_body": False}
+
+        status_code, content_type, response_chunks = 500, None, []
+
+        async def capture(message):
+            nonlocal status_code, content_type
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                content_type = dict(message.get("headers", [])).get(b"content-type", b"").decode() or None
+            elif message["type"] == "http.response.body":
+                response_chunks.append(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, replay_body, capture)
+        except BaseException:
+            await run_in_threadpool(self.store.abandon, key_hash)
+            raise
+        if status_code >= 500:
+            await run_in_threadpool(self.store.abandon, key_hash)
+        else:
+            await run_in_threadpool(self.store.complete, key_hash, status_code, content_type, b"".join(response_chunks))
+
+
+idempotency_store = IdempotencyStore()
@@ -0,0 +1,71 @@
+"""A passenger's trips: reservations with their flights, tickets and payments.
+
+A page is a fixed number of queries however long the history is: the
+passenger, one page of reservations, and one ``selectinload`` IN query each
+for their flights, tickets and payments.
+
+History is newest booking first and paged with a keyset cursor rather than an
+offset. Reservation ids grow with booking time, so the key is the id alone:
+``passenger_id = ? AND id < ? ORDER BY id DESC`` is one range read of
+ix_reservations_passenger_id (SQLite indexes carry the rowid), and a page
+deep into a frequent flyer's history costs the same as the first one.
+"""
+import base64
+import binascii
+from typing import Dict, Optional
+
+from sqlalchemy import select
+from sqlalchemy.orm import selectinload
+
+from models import Passenger, Reservation
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+
+def encode_cursor(reservation_id: int) -> str:
+    return base64.urlsafe_b64encode(f"r{reservation_id}".encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> int:
+    """Reservation id a cursor continues after; ValueError if it is not one of ours"""
+    try:
+        value = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+    except (binascii.Error, UnicodeDecodeError):
+        raise ValueError("Invalid cursor")
+    if not (value.startswith("r") and value[1:].isdigit()):
+        raise ValueError("Invalid cursor")
+    return int(value[1:])
+
+
+def itinerary(session, passenger_id: int, limit: int = DEFAULT_PAGE_SIZE, cursor: Optional[str] = None) -> Dict:
+    """One page of a passenger's history and the cursor of the next page (None on the last one).
+
+    Raises LookupError for an unknown passenger and ValueError for a bad
+    cursor or page size.
+    """
+    if not 1 <= limit <= MAX_PAGE_SIZE:
+        raise ValueError(f"limit must be between 1 and {MAX_PAGE_SIZE}")
+    before = decode_cursor(cursor) if cursor else None
+    passenger = session.get(Passenger, passenger_id)
+    if passenger is None:
+        raise LookupError(f"Passenger {passenger_id} not found")
+
+    query = (
+        select(Reservation)
+        .where(Reservation.passenger_id == passenger_id)
+        .options(selectinload(Reservation.flight), selectinload(Reservation.tickets),
+                 selectinload(Reservation.payments))
+        .order_by(Reservation.id.desc())
+        .limit(limit + 1)  # one extra row tells whether there is a next page
+    )
+    if before is not None:
+        query = query.where(Reservation.id < before)
+    reservations = session.scalars(query).all()
+    has_more = len(reservations) > limit
+    reservations = reservations[:limit]
+    return {
+        "passenger": passenger,
+        "reservations": reservations,
+        "next_cursor": encode_cursor(reservations[-1].id) if has_more else None,
+    }
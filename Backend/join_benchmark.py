@@ -0,0 +1,165 @@
+"""Passenger-history and payment-lookup joins, before and after integer foreign keys.
+
+Until migration 4 the passenger keys of reservations, tickets and luggage and
+the reservation key of payments were VARCHAR columns pointing at INTEGER
+primary keys. A join between the two compares text with integers, so SQLite
+applies numeric affinity to the text column and cannot use that column's
+index; the join reads the child table for every parent row (or builds an
+automatic index first, for every query).
+
+This builds one dataset under the old column types, times both joins, runs
+the migrations and times the same statements again:
+
+    python join_benchmark.py --passengers 20000 --repeat 20
+"""
+import argparse
+import os
+import random
+import re
+import tempfile
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List
+
+from sqlalchemy import bindparam, create_engine, insert, select, text
+
+import migrations
+from database import Base
+from models import Flight, Passenger, Payment, Reservation, Ticket
+
+RESERVATIONS_PER_PASSENGER = 3
+FLIGHTS = 200
+
+
+def history_query():
+    """A passenger's reservations with their flights and tickets, looked up by national ID"""
+    return (
+        select(Reservation.id, Reservation.status, Flight.flight_number, Flight.departure_time,
+               Ticket.ticket_number, Ticket.final_price)
+        .select_from(Passenger)
+        .join(Reservation, Reservation.passenger_id == Passenger.id)
+        .join(Flight, Flight.id == Reservation.flight_id)
+        .outerjoin(Ticket, Ticket.reservation_id == Reservation.id)
+        .where(Passenger.national_id == bindparam("national_id"))
+    )
+
+
+def payments_query():
+    """Payments of every reservation on a flight"""
+    return (
+        select(Reservation.id, Payment.payment_id, Payment.amount, Payment.status)
+        .select_from(Reservation)
+        .join(Payment, Payment.reservation_id == Reservation.id)
+        .where(Reservation.flight_id == bindparam("flight_id"))
+    )
+
+
+def create_legacy_schema(engine):
+    """The current schema, except that the migration 4 key columns are VARCHAR as they used to be"""
+    Base.metadata.create_all(engine)
+    with engine.begin() as connection:
+        for table_name, column_name in migrations.INTEGER_KEYS:
+            ddl = connection.execute(text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = :name"),
+                                     {"name": table_name}).scalar()
+            indexes = connection.execute(text(
+                "SELECT sql FROM sqlite_master WHERE type = 'index' AND tbl_name = :name AND sql IS NOT NULL"
+            ), {"name": table_name}).scalars().all()
+            connection.execute(text(f"DROP TABLE {table_name}"))
+            connection.execute(text(re.sub(rf"\b{column_name} INTEGER\b", f"{column_name} VARCHAR", ddl)))
+            for index in indexes:
+                connection.execute(text(index))
+        # Mark everything but the key change as applied, so upgrade() runs only migration 4
+        migrations.applied_versions(connection)
+        connection.execute(insert(migrations.schema_migrations), [
+            {"version": m.version, "description": m.description, "applied_at": datetime.now()}
+            for m in migrations.MIGRATIONS if m.version != 4
+        ])
+
+
+def populate(engine, passengers: int, seed: int = 0):
+    rng = random.Random(seed)
+    start = datetime(2026, 1, 1, 6)
+    flights = [
+        {"id": i, "flight_number": f"MS{i:04d}", "departure_code": "CAI", "destination_code": "HBE",
+         "departure_time": start + timedelta(hours=6 * i), "total_seats": 180, "available_seats": 180}
+        for i in range(1, FLIGHTS + 1)
+    ]
+    people = [{"id": i, "name": f"Passenger {i}", "national_id": f"NID{i:08d}"} for i in range(1, passengers + 1)]
+    reservations, tickets, payments = [], [], []
+    for number in range(1, passengers * RESERVATIONS_PER_PASSENGER + 1):
+        passenger_id, flight_id = rng.randint(1, passengers), rng.randint(1, FLIGHTS)
+        reservations.append({"id": number, "passenger_id": passenger_id, "flight_id": flight_id,
+                             "seat_number": f"{number % 30 + 1}A", "status": "Confirmed", "final_price": 1000.0})
+        tickets.append({"ticket_number": number, "passenger_id": passenger_id, "flight_id": flight_id,
+                        "reservation_id": number, "ticket_class": "economy", "status": "active",
+                        "base_price": 1000.0, "final_price": 1000.0})
+        payments.append({"payment_id": f"PAY{number:010d}", "reservation_id": number, "amount": 1000.0,
+                         "method": "card", "status": "Completed"})
+    with engine.begin() as connection:
+        for model, rows in ((Flight, flights), (Passenger, people), (Reservation, reservations),
+                            (Ticket, tickets), (Payment, payments)):
+            connection.execute(insert(model.__table__), rows)
+
+
+def measure(engine, passengers: int, repeat: int, seed: int = 0) -> Dict[str, object]:
+    """Median milliseconds, result rows and query plan of each join"""
+    rng = random.Random(seed)
+    cases = {
+        "history": (history_query(), lambda: {"national_id": f"NID{rng.randint(1, passengers):08d}"}),
+        "payments": (payments_query(), lambda: {"flight_id": rng.randint(1, FLIGHTS)}),
+    }
+    result = {}
+    with engine.connect() as connection:
+        for name, (query, parameters) in cases.items():
+            compiled, values = query.compile(dialect=engine.dialect), parameters()
+            plan = connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {compiled}",
+                                              tuple(values[key] for key in compiled.positiontup))
+            result[f"{name}_plan"] = [row[-1] for row in plan]
+            samples: List[float] = []
+            rows = 0
+            for _ in range(repeat):
+                started = time.perf_counter()
+                rows += len(connection.execute(query, parameters()).all())
+                samples.append((time.perf_counter() - started) * 1000)
+            samples.sort()
+            result[f"{name}_ms"] = round(samples[len(samples) // 2], 3)
+            result[f"{name}_rows"] = rows
+    return result
+
+
+def compare(passengers: int = 5000, repeat: int = 20, seed: int = 0) -> Dict[str, Dict]:
+    fd, path = tempfile.mkstemp(suffix=".db")
+    os.close(fd)
+    engine = create_engine(f"sqlite:///{path}")
+    try:
+        create_legacy_schema(engine)
+        populate(engine, passengers, seed)
+        before = measure(engine, passengers, repeat, seed)
+        with engine.begin() as connection:
+            migrations.upgrade(connection)
+        after = measure(engine, passengers, repeat, seed)
+    finally:
+        engine.dispose()
+        os.remove(path)
+    speedup = {name: round(before[f"{name}_ms"] / after[f"{name}_ms"], 1) if after[f"{name}_ms"] else None
+               for name in ("history", "payments")}
+    return {"before": before, "after": after, "speedup": speedup}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark joins on text vs integer foreign keys")
+    parser.add_argument("--passengers", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    result = compare(args.passengers, args.repeat, args.seed)
+    for name in ("history", "payments"):
+        print(f"{name}: {result['before'][f'{name}_ms']} ms -> {result['after'][f'{name}_ms']} ms "
+              f"({result['speedup'][name]}x)")
+        for label in ("before", "after"):
+            print(f"  {label}: " + "; ".join(result[label][f"{name}_plan"]))
+
+
+if __name__ == "__main__":
+    main()
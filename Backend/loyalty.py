@@ -0,0 +1,142 @@
+"""Post-flight loyalty accrual as one set-based batch.
+
+For every confirmed reservation on a flight that has departed, whose
+passenger has a loyalty program and which has not been credited yet, one
+``accrual`` row is inserted into ``loyalty_ledger`` with a single
+INSERT ... SELECT ... RETURNING, which hands back exactly the rows this run
+inserted (a concurrent run's rows are never counted twice). Balances of the
+affected programs are then moved by the sum of their new entries in one
+executemany UPDATE, and tiers are re-evaluated in another, all in one
+transaction. The (reservation_id, entry_type) unique key
+makes a re-run a no-op for already credited reservations.
+
+Usage (e.g. from cron):
+    python loyalty.py                      # everything departed until now
+    python loyalty.py --until 2026-10-19T00:00
+"""
+import argparse
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict
+
+from sqlalchemy import Integer, bindparam, case, cast, exists, func, insert, literal, select, update
+
+from models import Flight, Loyalty_program, LoyaltyLedgerEntry, Reservation, ReservationStatus, Ticket
+
+
+def _earn_rate(ticket_class):
+    """CASE over Loyalty_program.earn_rates; unknown or missing classes earn the economy rate"""
+    rates = Loyalty_program.earn_rates
+    return case(
+        *[(ticket_class == name, rate) for name, rate in rates.items()],
+        else_=rates["economy"]
+    )
+
+
+def _tier_columns(points):
+    """CASE expressions giving (tier, next threshold) for a balance, like Loyalty_program.tier_for"""
+    tiers = Loyalty_program.tiers
+    top = tiers[-1][1]
+    descending = list(reversed(list(enumerate(tiers))))
+    tier = case(*[(points >= threshold, name) for _, (name, threshold) in descending], else_=tiers[0][0])
+    next_threshold = case(
+        *[(points >= threshold, tiers[min(index + 1, len(tiers) - 1)][1]) for index, (_, threshold) in descending],
+        else_=tiers[1][1] if len(tiers) > 1 else top
+    )
+    return tier, next_threshold
+
+
+def accrue_departed_flights(session, until: datetime = None) -> Dict[str, int]:
+    """Credit points for every departed, confirmed, not yet credited reservation"""
+    until = until or datetime.now()
+    ledger = LoyaltyLedgerEntry.__table__
+    programs = Loyalty_program.__table__
+    reservations = Reservation.__table__
+    flights = Flight.__table__
+    tickets = Ticket.__table__
+
+    try:
+        ticket_class = (
+            select(tickets.c.ticket_class)
+            .where(tickets.c.reservation_id == reservations.c.id)
+            .limit(1)
+            .scalar_subquery()
+        )
+        already_credited = exists().where(
+            ledger.c.reservation_id == reservations.c.id, ledger.c.entry_type == "accrual"
+        )
+        accruals = (
+            select(
+                programs.c.id,
+                programs.c.passenger_id,
+                reservations.c.id,
+                literal("accrual"),
+                cast(func.round(func.coalesce(reservations.c.final_price, 0) * _earn_rate(ticket_class)), Integer),
+                literal("Flight ") + flights.c.flight_number,
+                literal(until),
+            )
+            .select_from(
+                reservations
+                .join(flights, flights.c.id == reservations.c.flight_id)
+                .join(programs, programs.c.passenger_id == reservations.c.passenger_id)
+            )
+            .where(
+                reservations.c.status == ReservationStatus.confirmed.value,
+                flights.c.departure_time <= until,
+                ~already_credited,
+            )
+        )
+        inserted = session.execute(insert(ledger).from_select(
+            ["program_id", "passenger_id", "reservation_id", "entry_type", "points", "description", "created_at"],
+            accruals
+        ).returning(ledger.c.program_id, ledger.c.points)).all()
+
+        earned: Dict[int, int] = defaultdict(int)
+        for program_id, entry_points in inserted:
+            earned[program_id] += entry_points
+        entries, points, programs_credited, upgrades = len(inserted), sum(earned.values()), len(earned), 0
+        if earned:
+            credits = [{"program": program_id, "earned": total} for program_id, total in earned.items()]
+            session.execute(
+                update(programs)
+                .where(programs.c.id == bindparam("program"))
+                .values(points=func.coalesce(programs.c.points, 0) + bindparam("earned")),
+                credits
+            )
+            # Same rule as Loyalty_program.check_tier_upgrade, for every credited program at once
+            tier, next_threshold = _tier_columns(programs.c.points)
+            upgrades = session.execute(
+                update(programs)
+                .where(programs.c.id == bindparam("program"),
+                       programs.c.points >= func.coalesce(programs.c.required_points_for_next_tier, 0),
+                       func.coalesce(programs.c.tier_level, "") != tier)
+                .values(tier_level=tier, required_points_for_next_tier=next_threshold),
+                [{"program": credit["program"]} for credit in credits]
+            ).rowcount
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+
+    return {"entries": entries, "points": points, "programs": programs_credited, "upgrades": upgrades}
+
+
+def main(argv=None):
+    from database import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Credit loyalty points for departed flights")
+    parser.add_argument("--until", type=datetime.fromisoformat, default=None,
+                        help="Only flights departed before this time (default: now)")
+    args = parser.parse_args(argv)
+
+    session = SessionLocal()
+    try:
+        result = accrue_departed_flights(session, args.until)
+    finally:
+        session.close()
+    print(f"✅ {result['entries']} accruals, {result['points']} points for {result['programs']} programs, "
+          f"{result['upgrades']} tier upgrades")
+
+
+if __name__ == "__main__":
+    main()
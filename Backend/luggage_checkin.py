@@ -0,0 +1,112 @@
+"""Check-in of a whole flight's bags in one pass.
+
+``compute_charges`` takes arrays of weights and ticket classes and returns
+allowances, fees, fines and statuses computed with numpy, following the same
+rules as ``Luggage.check_luggage_weight`` / ``apply_overweight_fine`` /
+``update_luggage_status``. ``check_in_bags`` loads the bags of a flight with
+one query, runs them through it, and writes every result back with a single
+executemany UPDATE.
+
+numpy is imported here only; main.py imports this module lazily.
+"""
+from dataclasses import dataclass
+from typing import Dict, List, Sequence
+
+import numpy as np
+from sqlalchemy import bindparam, select, update
+
+from models import Luggage, Ticket
+
+MAX_BATCH_SIZE = 2000
+
+WITHIN_LIMIT, EXTRA_WEIGHT, EXCEEDS_LIMIT = "Within free limit", "Extra Weight", "Exceeds maximum limit"
+
+
+@dataclass
+class Charges:
+    allowances: np.ndarray
+    fees: np.ndarray          # luggage_fee, fine included
+    fines: np.ndarray
+    weight_statuses: np.ndarray
+    overweight: np.ndarray    # bool
+
+
+def allowances_for(ticket_classes: Sequence[str]) -> np.ndarray:
+    """Free allowance per bag; each distinct class is looked up once"""
+    classes = np.char.lower(np.char.strip(np.asarray(ticket_classes, dtype=str)))
+    distinct, index = np.unique(classes, return_inverse=True)
+    per_class = np.array([Luggage.allowance_for(name) for name in distinct], dtype=float)
+    return per_class[index.reshape(-1)]
+
+
+def compute_charges(weights: Sequence[float], ticket_classes: Sequence[str]) -> Charges:
+    weights = np.asarray(weights, dtype=float)
+    if weights.shape != (len(ticket_classes),):
+        raise ValueError("weights and ticket_classes must have the same length")
+    if weights.size and (weights < 0).any():
+        raise ValueError("Weights must not be negative")
+
+    allowances = allowances_for(ticket_classes) if weights.size else np.zeros(0)
+    overweight = weights > Luggage.max_weight_limit
+    extra = ~overweight & (weights > allowances)
+    fees = np.where(extra, (weights - allowances) * Luggage.fee_per_kg, 0.0)
+    fines = np.where(overweight, float(Luggage.overweight_fine), 0.0)
+    weight_statuses = np.where(overweight, EXCEEDS_LIMIT, np.where(extra, EXTRA_WEIGHT, WITHIN_LIMIT))
+    return Charges(allowances, fees + fines, fines, weight_statuses, overweight)
+
+
+def check_in_bags(session, flight_id: int, bags: Sequence) -> List[Dict]:
+    """Weigh and check in bags of one flight; ``bags`` have luggage_id, weight and is_fragile (optional).
+
+    Raises LookupError for bags that don't exist or belong to another flight,
+    ValueError for a bad batch. Everything is written in one transaction.
+    """
+    if not bags:
+        raise ValueError("No bags in batch")
+    if len(bags) > MAX_BATCH_SIZE:
+        raise ValueError(f"At most {MAX_BATCH_SIZE} bags per batch")
+    luggage_ids = [bag.luggage_id for bag in bags]
+    if len(set(luggage_ids)) != len(luggage_ids):
+        raise ValueError("The same bag appears more than once in the batch")
+
+    try:
+        rows = session.execute(
+            select(Luggage.luggage_id, Luggage.is_fragile, Ticket.ticket_class)
+            .join(Ticket, Ticket.ticket_number == Luggage.ticket_id)
+            .where(Luggage.luggage_id.in_(luggage_ids), Ticket.flight_id == flight_id)
+        ).all()
+        found = {row.luggage_id: row for row in rows}
+        if missing := sorted(set(luggage_ids) - set(found)):
+            raise LookupError(f"Bags not found on flight {flight_id}: {missing}")
+
+        charges = compute_charges([bag.weight for bag in bags], [found[i].ticket_class for i in luggage_ids])
+        fragile = np.array([
+            bag.is_fragile if getattr(bag, "is_fragile", None) is not None else bool(found[bag.luggage_id].is_fragile)
+            for bag in bags
+        ], dtype=bool)
+        statuses = np.where(charges.overweight, "Overweight", "Approved").astype(object)
+        statuses[fragile] += " - Fragile item so handle with care."
+
+        results = [
+            {"luggage_id": luggage_id, "weight": float(weight), "allowance": float(allowance),
+             "weight_status": str(weight_status), "luggage_fee": float(fee), "fine": float(fine),
+             "status": status, "is_fragile": bool(is_fragile)}
+            for luggage_id, weight, allowance, weight_status, fee, fine, status, is_fragile in zip(
+                luggage_ids, (bag.weight for bag in bags), charges.allowances, charges.weight_statuses,
+                charges.fees, charges.fines, statuses, fragile)
+        ]
+        luggage = Luggage.__table__
+        session.execute(
+            update(luggage).where(luggage.c.luggage_id == bindparam("bag"))
+            .values(weight=bindparam("new_weight"), luggage_fee=bindparam("fee"), fine=bindparam("new_fine"),
+                    weight_status=bindparam("new_weight_status"), status=bindparam("new_status"),
+                    is_fragile=bindparam("fragile"), is_checked_in=True),
+            [{"bag": row["luggage_id"], "new_weight": row["weight"], "fee": row["luggage_fee"],
+              "new_fine": row["fine"], "new_weight_status": row["weight_status"], "new_status": row["status"],
+              "fragile": row["is_fragile"]} for row in results]
+        )
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+    return results
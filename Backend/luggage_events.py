@@ -0,0 +1,87 @@
+"""Luggage scan log: batched writes from scanners and journey queries.
+
+Scanners post scans in batches; each batch is one executemany INSERT into
+``luggage_events`` after a single IN query checks the bags exist. Rows are
+append-only and narrow (integer status code, epoch-millisecond timestamp),
+and (luggage_id, ts) is indexed so a bag's journey and its latest scan are
+index range reads.
+"""
+from datetime import datetime
+from typing import Dict, List, Sequence
+
+from sqlalchemy import insert, select
+
+from models import Luggage, LuggageEvent, LuggageStatusCode
+from models.luggage import from_epoch_ms, to_epoch_ms
+
+MAX_BATCH_SIZE = 5000
+
+
+def _public(event) -> Dict:
+    return {
+        "luggage_id": event.luggage_id,
+        "status": LuggageStatusCode(event.status_code).name,
+        "airport_code": event.airport_code,
+        "scanner_id": event.scanner_id,
+        "scanned_at": from_epoch_ms(event.ts),
+    }
+
+
+def record_scans(session, scans: Sequence, now: datetime = None) -> int:
+    """Append scans (luggage_id, status, airport_code, scanner_id, scanned_at optional) in one INSERT.
+
+    Raises ValueError for unknown statuses and LookupError for unknown bags;
+    nothing is written then.
+    """
+    if not scans:
+        return 0
+    if len(scans) > MAX_BATCH_SIZE:
+        raise ValueError(f"At most {MAX_BATCH_SIZE} scans per batch")
+    now_ms = to_epoch_ms(now or datetime.now())
+    rows = [
+        {"luggage_id": scan.luggage_id, "status_code": int(LuggageStatusCode.parse(scan.status)),
+         "airport_code": scan.airport_code.upper() if scan.airport_code else None,
+         "scanner_id": scan.scanner_id,
+         "ts": to_epoch_ms(scan.scanned_at) if scan.scanned_at else now_ms}
+        for scan in scans
+    ]
+    luggage_ids = {row["luggage_id"] for row in rows}
+    try:
+        found = session.execute(select(Luggage.luggage_id).where(Luggage.luggage_id.in_(luggage_ids))).scalars().all()
+        if missing := sorted(luggage_ids - set(found)):
+            raise LookupError(f"Bags not found: {missing}")
+        session.execute(insert(LuggageEvent.__table__), rows)
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+    return len(rows)
+
+
+def journey(session, luggage_id: str) -> List[Dict]:
+    """Every scan of one bag, oldest first"""
+    events = session.execute(
+        select(LuggageEvent).where(LuggageEvent.luggage_id == luggage_id).order_by(LuggageEvent.ts, LuggageEvent.id)
+    ).scalars().all()
+    return [_public(event) for event in events]
+
+
+def bags_in_state(session, airport_code: str, status: str, limit: int = 1000) -> List[Dict]:
+    """Bags whose latest scan put them in ``status`` at ``airport_code``"""
+    code = int(LuggageStatusCode.parse(status))
+    latest = LuggageEvent.__table__.alias("latest")
+    latest_id = (
+        select(latest.c.id)
+        .where(latest.c.luggage_id == LuggageEvent.luggage_id)
+        .order_by(latest.c.ts.desc(), latest.c.id.desc())
+        .limit(1)
+        .scalar_subquery()
+    )
+    events = session.execute(
+        select(LuggageEvent)
+        .where(LuggageEvent.airport_code == airport_code.upper(), LuggageEvent.status_code == code,
+               LuggageEvent.id == latest_id)
+        .order_by(LuggageEvent.ts)
+        .limit(limit)
+    ).scalars().all()
+    return [_public(event) for event in events]
@@ -1,26 +1,38 @@
 from contextlib import asynccontextmanager
 from typing import List, Annotated
-from datetime import datetime
+from datetime import date, datetime, timedelta
+import binascii
 import hashlib
 import secrets
 
-from fastapi import Depends, FastAPI, HTTPException, status, Query
+from fastapi import Depends, FastAPI, HTTPException, status, Query, Request, UploadFile, File
 from fastapi.security import HTTPBasic, HTTPBasicCredentials, OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from fastapi.middleware.cors import CORSMiddleware
+from jose import JWTError, jwt
+from sqlalchemy import update
 from sqlalchemy.orm import Session
 
+import analytics
+import bookings
+import cache
+import exports
+import itineraries
+import loyalty
+import luggage_events
 import models
+import outbox
+import payment_queue
+import profiling
 import schemas
+import serialization
+from coalescing import coalesce, coalescer
 from database import SessionLocal, engine
 from db_init import init_db
-
-from datetime import datetime, timedelta
-import hashlib
-import secrets
-import binascii
-from jose import JWTError, jwt
-from datetime import datetime, timedelta
-from fastapi.security import OAuth2PasswordBearer
+from holds import hold_service
+from idempotency import IdempotencyMiddleware, idempotency_store
+from outbox import outbox_dispatcher
+from payment_queue import payment_workers
+from response_cache import response_cache
 
 
 SECRET_KEY = "your-secret-key-here"  # Change this to a strong random key in production!
@@ -32,11 +44,21 @@ ACCESS_TOKEN_EXPIRE_MINUTES = 30
 async def lifespan(app: FastAPI):
     print("Initializing database...")
     init_db()
+    hold_service.start()
+    payment_workers.start()
+    outbox_dispatcher.start()
     yield
     print("Shutting down...")
+    outbox_dispatcher.stop()
+    payment_workers.stop()
+    hold_service.stop()
 
 app = FastAPI(lifespan=lifespan)
 
+# Replays stored responses for retried POSTs carrying an Idempotency-Key, see idempotency.py.
+# Added before CORS so CORS wraps it: replays and key errors need the CORS headers too.
+app.add_middleware(IdempotencyMiddleware, store=idempotency_store)
+
 # CORS configuration
 app.add_middleware(
     CORSMiddleware,
@@ -46,6 +68,10 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Opt-in timing breakdown (Server-Timing header, /debug/metrics), see profiling.py
+if profiling.PROFILING_ENABLED:
+    profiling.install(app, engine)
+
 security = HTTPBasic()
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
@@ -64,12 +90,13 @@ credentials_dependency = Annotated[HTTPBasicCredentials, Depends(security)]
 def hash_password(password: str, salt: str = None) -> tuple[str, str]:
     """Secure password hashing using PBKDF2-HMAC-SHA256"""
     salt = salt or secrets.token_hex(16)
-    dk = hashlib.pbkdf2_hmac(
-        'sha256',
-        password.encode('utf-8'),
-        salt.encode('utf-8'),
-        10  # Number of iterations
-    )
+    with profiling.span("hash"):
+        dk = hashlib.pbkdf2_hmac(
+            'sha256',
+            password.encode('utf-8'),
+            salt.encode('utf-8'),
+            10  # Number of iterations
+        )
     hashed = binascii.hexlify(dk).decode()
     return hashed, salt
 
@@ -119,6 +146,17 @@ def get_current_user(
 
 current_user_dependency = Annotated[models.User, Depends(get_current_user)]
 
+def get_current_admin(
+    db: db_dependency,
+    current_user: current_user_dependency
+):
+    """Dependency for admin endpoints: the user's email must belong to an administrator with management access"""
+    if not models.Administrator.has_management_access(db, current_user.email):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Administrator access required")
+    return current_user
+
+admin_dependency = Annotated[models.User, Depends(get_current_admin)]
+
 # Authentication Endpoints
 
 # endpoint for token verification
@@ -266,8 +304,89 @@ def create_flight(
     db.refresh(db_flight)
     return db_flight
 
+@app.post("/flights/import", response_model=schemas.ScheduleImportResult)
+def import_flight_schedule(
+    db: db_dependency,
+    current_user: admin_dependency,
+    file: UploadFile = File(...),
+    with_seats: bool = False
+):
+    """Expand a CSV/JSON schedule file into dated flights (and seats)"""
+    import schedule_import  # Only needed by this admin endpoint; keep it off the startup path
+
+    try:
+        file_format = schedule_import.detect_format(file.filename)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    result = schedule_import.import_schedule_file(
+        db, file.file, file_format, with_seats=with_seats, user_id=current_user.id
+    )
+    return schemas.ScheduleImportResult(**vars(result))
+
+# Seat Endpoints
+@app.get("/flights/{flight_id}/seats", response_model=List[schemas.SeatPublic])
+def search_seats(
+    flight_id: int,
+    db: db_dependency,
+    current_user: current_user_dependency,
+    seat_type: str = None,
+    class_type: str = None,
+    feature: List[str] = Query([]),
+    available: bool = True
+):
+    """Seats of a flight, e.g. ?seat_type=window&feature=extra legroom for window seats with extra legroom"""
+    if db.get(models.Flight, flight_id) is None:
+        raise HTTPException(status_code=404, detail="Flight not found")
+    return models.Seat.search(db, flight_id, seat_type, class_type, feature, available)
+
+# Seat Hold Endpoints
+@app.post("/flights/{flight_id}/holds", response_model=schemas.SeatHoldPublic)
+def hold_seats(
+    flight_id: int,
+    db: db_dependency,
+    current_user: current_user_dependency,
+    seat_hold: schemas.SeatHoldCreate
+):
+    """Keep seats off sale while the customer checks out; the hold expires on its own"""
+    try:
+        return hold_service.hold(db, flight_id, seat_hold.seat_numbers, current_user.id, seat_hold.ttl_seconds)
+    except LookupError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.post("/holds/{hold_id}/extend", response_model=schemas.SeatHoldPublic)
+def extend_hold(
+    hold_id: str,
+    db: db_dependency,
+    current_user: current_user_dependency,
+    extension: schemas.SeatHoldExtend
+):
+    """Push a live hold's expiry to now + ttl_seconds"""
+    try:
+        return hold_service.extend(db, hold_id, extension.ttl_seconds, current_user.id)
+    except LookupError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.delete("/holds/{hold_id}")
+def release_hold(
+    hold_id: str,
+    db: db_dependency,
+    current_user: current_user_dependency
+):
+    """Give the held seats back before the hold expires"""
+    try:
+        return {"released": hold_service.release(db, hold_id, current_user.id)}
+    except LookupError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
 @app.get("/flights/", response_model=List[schemas.FlightPublic])
+@coalesce()
 def read_flights(
+    request: Request,
     db: db_dependency,
     skip: int = 0,
     limit: int = 100,
@@ -276,17 +395,53 @@ def read_flights(
     departure_date: datetime = None
 ):
     """Get list of flights with optional filters"""
-    query = db.query(models.Flight)
-    
+    query = serialization.FLIGHTS.select()
+
     if departure_code:
-        query = query.filter(models.Flight.departure_code == departure_code)
+        query = query.where(models.Flight.departure_code == departure_code)
     if destination_code:
-        query = query.filter(models.Flight.destination_code == destination_code)
+        query = query.where(models.Flight.destination_code == destination_code)
     if departure_date:
-        query = query.filter(models.Flight.departure_time >= departure_date)
-    
-    flights = query.offset(skip).limit(limit).all()
-    return flights
+        query = query.where(models.Flight.departure_time >= departure_date)
+
+    # Seat counts move with every booking, so clients revalidate after a few seconds
+    return response_cache.respond(
+        request, {"flights"}, lambda: serialization.FLIGHTS.response(db.execute(query.offset(skip).limit(limit))),
+        cache_control="public, max-age=5, must-revalidate"
+    )
+
+@app.get("/routes/{departure_code}/{destination_code}/calendar", response_model=List[schemas.FareCalendarDayPublic])
+@coalesce()
+def read_fare_calendar(
+    request: Request,
+    departure_code: str,
+    destination_code: str,
+    db: db_dependency,
+    month: str,
+    cabin: str = None
+):
+    """Lowest fare and seats left per day and cabin for a month of a route, e.g. ?month=2026-10"""
+    try:
+        first = datetime.strptime(month, "%Y-%m").date()
+    except ValueError:
+        raise HTTPException(status_code=400, detail="month must look like YYYY-MM")
+    following = (first + timedelta(days=31)).replace(day=1)
+
+    calendar = models.FareCalendarDay
+    query = serialization.FARE_CALENDAR.select().where(
+        calendar.departure_code == departure_code,
+        calendar.destination_code == destination_code,
+        calendar.day >= first,
+        calendar.day < following
+    )
+    if cabin:
+        query = query.where(calendar.cabin == cabin.strip().lower())
+
+    return response_cache.respond(
+        request, {"fare_calendar"},
+        lambda: serialization.FARE_CALENDAR.response(db.execute(query.order_by(calendar.day, calendar.cabin))),
+        cache_control="public, max-age=60, must-revalidate"
+    )
 
 # Passenger Endpoints
 @app.post("/passengers/", response_model=schemas.PassengerPublic)
@@ -303,13 +458,33 @@ def create_passenger(
 
 @app.get("/passengers/", response_model=List[schemas.PassengerPublic])
 def read_passengers(
+    request: Request,
     db: db_dependency,
     skip: int = 0,
     limit: int = 100
 ):
     """Get list of passengers"""
-    passengers = db.query(models.Passenger).offset(skip).limit(limit).all()
-    return passengers
+    query = serialization.PASSENGERS.select().offset(skip).limit(limit)
+    return response_cache.respond(
+        request, {"passengers"}, lambda: serialization.PASSENGERS.response(db.execute(query)),
+        cache_control="private, no-cache"
+    )
+
+@app.get("/passengers/{passenger_id}/itinerary", response_model=schemas.PassengerItinerary)
+def read_passenger_itinerary(
+    passenger_id: int,
+    db: db_dependency,
+    current_user: current_user_dependency,
+    limit: int = Query(itineraries.DEFAULT_PAGE_SIZE, ge=1, le=itineraries.MAX_PAGE_SIZE),
+    cursor: str = None
+):
+    """A passenger's reservations with flights, tickets and payments, newest first, paged by cursor"""
+    try:
+        return itineraries.itinerary(db, passenger_id, limit, cursor)
+    except LookupError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 # Reservation Endpoints
 @app.post("/reservations/", response_model=schemas.ReservationPublic)
@@ -333,22 +508,94 @@ def create_reservation(
     if not db_passenger:
         raise HTTPException(status_code=404, detail="Passenger not found")
     
-    # Check seat availability
-    seat = db.query(models.Seat).filter(
-        models.Seat.flight_id == reservation.flight_id,
-        models.Seat.seat_number == reservation.seat_number,
-        models.Seat.is_available == True
-    ).first()
+    # Check seat availability, or that the seat is held for this checkout
+    if reservation.hold_id:
+        try:
+            seat = hold_service.take(db, reservation.hold_id, reservation.flight_id, reservation.seat_number,
+                                     current_user.id)
+        except LookupError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    else:
+        seat = db.query(models.Seat).filter(
+            models.Seat.flight_id == reservation.flight_id,
+            models.Seat.seat_number == reservation.seat_number,
+            models.Seat.is_available == True
+        ).first()
     if not seat:
         raise HTTPException(status_code=400, detail="Seat not available")
     
-    db_reservation = models.Reservation(**reservation.model_dump())
+    db_reservation = models.Reservation(db_passenger, db_flight, reservation.seat_number, reservation.status)
+    db_reservation.booking_agent_id = reservation.booking_agent_id
     seat.is_available = False
+    seat.reservation_time = datetime.now()
     db.add(db_reservation)
-    db.commit()
+    db.commit()  # flight occupancy counters are updated in the same transaction
     db.refresh(db_reservation)
     return db_reservation
 
+@app.post("/reservations/batch", response_model=List[schemas.ReservationSummary])
+def create_reservations_batch(
+    db: db_dependency,
+    current_user: current_user_dependency,
+    batch: schemas.ReservationBatchCreate
+):
+    """Book a group of seats in one transaction; either all succeed or none do"""
+    try:
+        return bookings.book_batch(db, batch.reservations, batch.status, batch.booking_agent_id)
+    except LookupError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+# Luggage Endpoints
+@app.post("/flights/{flight_id}/luggage/batch", response_model=List[schemas.LuggageCharge])
+def check_in_luggage_batch(
+    flight_id: int,
+    db: db_dependency,
+    current_user: current_user_dependency,
+    batch: schemas.LuggageBatchCheckIn
+):
+    """Weigh and check in many bags of a flight at once; fees and fines are computed for the whole batch"""
+    import luggage_checkin  # numpy is only needed here; keep it off the startup path
+
+    try:
+        return luggage_checkin.check_in_bags(db, flight_id, batch.bags)
+    except LookupError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.post("/luggage/events", status_code=status.HTTP_201_CREATED)
+def record_luggage_scans(db: db_dependency, current_user: current_user_dependency, batch: schemas.LuggageScanBatch):
+    """Append a batch of scanner readings to the luggage event log"""
+    try:
+        return {"recorded": luggage_events.record_scans(db, batch.scans)}
+    except LookupError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/luggage/{luggage_id}/events", response_model=List[schemas.LuggageEventPublic])
+def read_luggage_journey(luggage_id: str, db: db_dependency, current_user: current_user_dependency):
+    """Every scan of a bag, oldest first"""
+    if db.get(models.Luggage, luggage_id) is None:
+        raise HTTPException(status_code=404, detail="Luggage not found")
+    return luggage_events.journey(db, luggage_id)
+
+@app.get("/airports/{airport_code}/luggage", response_model=List[schemas.LuggageEventPublic])
+def read_luggage_at_airport(
+    airport_code: str,
+    db: db_dependency,
+    current_user: current_user_dependency,
+    status: str,
+    limit: int = Query(1000, ge=1, le=10000)
+):
+    """Bags whose latest scan left them in the given state at this airport"""
+    try:
+        return luggage_events.bags_in_state(db, airport_code, status, limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
 # Ticket Endpoints
 @app.post("/tickets/", response_model=schemas.TicketPublic)
 def create_ticket(
@@ -370,29 +617,166 @@ def create_ticket(
     return db_ticket
 
 # Payment Endpoints
-@app.post("/payments/", response_model=schemas.PaymentPublic)
+@app.post("/payments/", response_model=schemas.PaymentPublic, status_code=status.HTTP_202_ACCEPTED)
 def create_payment(
     db: db_dependency,
+    current_user: current_user_dependency,
     payment: schemas.PaymentCreate
 ):
-    """Create a new payment"""
-    db_payment = models.Payment(**payment.model_dump())
+    """Record a payment and queue it for the gateway; poll GET /payments/{id} for the outcome"""
+    reservation = db.get(models.Reservation, payment.reservation_id)
+    if not reservation:
+        raise HTTPException(status_code=404, detail="Reservation not found")
+
+    db_payment = models.Payment(
+        payment_id=payment_queue.new_payment_id(),
+        amount=float(payment.amount),
+        method=payment.method,
+        status="pending",
+        payment_date=None,
+        transaction_id=None,
+        currency=payment.currency,
+        # Refundable when it pays for a ticket of a refundable class (Ticket.is_refundable itself is not stored)
+        is_refundable=any(ticket.ticket_class in models.Ticket.refundable_classes for ticket in reservation.tickets),
+        reservation_id=payment.reservation_id
+    )
     db.add(db_payment)
+    db.flush()
+    payment_queue.enqueue(db, db_payment.payment_id, "charge")
     db.commit()
     db.refresh(db_payment)
     return db_payment
 
+@app.get("/payments/{payment_id}", response_model=schemas.PaymentStatus)
+def read_payment_status(payment_id: str, db: db_dependency, current_user: current_user_dependency):
+    """Where a queued payment is: pending, completed, failed, refunded"""
+    payment_status = payment_queue.payment_status(db, payment_id)
+    if payment_status is None:
+        raise HTTPException(status_code=404, detail="Payment not found")
+    return payment_status
+
+@app.post("/payments/{payment_id}/refund", response_model=schemas.PaymentStatus, status_code=status.HTTP_202_ACCEPTED)
+def refund_payment(payment_id: str, db: db_dependency, current_user: current_user_dependency):
+    """Queue a refund of a completed, refundable payment"""
+    refunded = db.execute(
+        update(models.Payment)
+        .where(models.Payment.payment_id == payment_id, models.Payment.status == "completed",
+               models.Payment.is_refundable == True)
+        .values(status="refund_pending")
+    ).rowcount
+    if not refunded:
+        db.rollback()
+        db_payment = db.get(models.Payment, payment_id)
+        if db_payment is None:
+            raise HTTPException(status_code=404, detail="Payment not found")
+        if not db_payment.is_refundable:
+            raise HTTPException(status_code=400, detail="Payment is not refundable")
+        raise HTTPException(status_code=400, detail="Only completed payments can be refunded")
+    payment_queue.enqueue(db, payment_id, "refund")
+    db.commit()
+    return payment_queue.payment_status(db, payment_id)
+
 # Airport Endpoints
 @app.get("/airports/", response_model=List[schemas.AirportPublic])
+@coalesce()
 def read_airports(
+    request: Request,
     db: db_dependency,
     country_code: str = None,
     skip: int = 0,
     limit: int = 100
 ):
     """Get list of airports"""
-    query = db.query(models.Airport)
+    query = serialization.AIRPORTS.select()
     if country_code:
-        query = query.filter(models.Airport.country_code == country_code)
-    airports = query.offset(skip).limit(limit).all()
-    return airports
\ No newline at end of file
+        query = query.where(models.Airport.country_code == country_code)
+    # Reference data: rarely changes, so clients keep it for an hour
+    return response_cache.respond(
+        request, {"airports"}, lambda: serialization.AIRPORTS.response(db.execute(query.offset(skip).limit(limit))),
+        cache_control="public, max-age=3600"
+    )
+
+# Occupancy analytics endpoints
+@app.get("/analytics/occupancy/flights", response_model=List[schemas.FlightLoadFactor])
+def read_flight_load_factors(
+    db: db_dependency,
+    current_user: current_user_dependency,
+    departure_from: datetime = None,
+    departure_to: datetime = None,
+    min_load_factor: float = Query(None, ge=0, le=1),
+    airline_id: int = None,
+    limit: int = Query(5000, ge=1, le=100000)
+):
+    """Load factors of many flights at once, fullest first"""
+    return analytics.flight_load_factors(db, departure_from, departure_to, min_load_factor, airline_id, limit)
+
+@app.get("/analytics/occupancy/{dimension}", response_model=List[schemas.OccupancyRollupPublic])
+def read_occupancy_rollups(
+    dimension: str,
+    db: db_dependency,
+    current_user: current_user_dependency,
+    day_from: date = None,
+    day_to: date = None
+):
+    """Materialized load factors per route, airline or day"""
+    try:
+        return analytics.occupancy_rollups(db, dimension, day_from, day_to)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+# Event stream endpoints
+@app.get("/events/{topic}", response_model=schemas.OutboxEventPage)
+def read_events(
+    topic: str,
+    db: db_dependency,
+    current_user: current_user_dependency,
+    after: int = Query(0, ge=0),
+    limit: int = Query(500, ge=1, le=5000)
+):
+    """Tail the outbox: events after the given offset, oldest first; resume from next_offset"""
+    events = outbox.read_events(db, after, limit, topic)
+    # Event is a dataclass, which orjson encodes as is
+    return serialization.ORJSONResponse({"events": events, "next_offset": events[-1].id if events else after})
+
+# Loyalty endpoints
+@app.post("/loyalty/accruals/run", response_model=schemas.LoyaltyAccrualRun)
+def run_loyalty_accruals(db: db_dependency, current_user: admin_dependency, until: datetime = None):
+    """Credit points for all departed flights not credited yet (normally run from cron: python loyalty.py)"""
+    return loyalty.accrue_departed_flights(db, until)
+
+# Cache metrics
+@app.get("/debug/cache")
+def read_cache_stats(current_user: current_user_dependency):
+    """Hit/miss counters of every cache in this worker, and of request coalescing"""
+    return {**cache.stats(), "coalescing": coalescer.metrics.snapshot()}
+
+# Admin export endpoints
+@app.get("/admin/exports/reservations")
+def export_reservations(
+    current_user: admin_dependency,
+    format: str = "ndjson",
+    status: str = None,
+    flight_id: int = None,
+    created_from: datetime = None,
+    created_to: datetime = None
+):
+    """Stream all reservations with passenger and flight columns (ndjson, csv, columnar or parquet)"""
+    query = exports.reservation_export_query(status, flight_id, created_from, created_to)
+    try:
+        return exports.export_response(SessionLocal, query, format, "reservations")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/admin/exports/flights")
+def export_flights(
+    current_user: admin_dependency,
+    format: str = "ndjson",
+    departure_from: datetime = None,
+    departure_to: datetime = None
+):
+    """Stream all flights with their airline name (ndjson, csv, columnar or parquet)"""
+    query = exports.flight_export_query(departure_from, departure_to)
+    try:
+        return exports.export_response(SessionLocal, query, format, "flights")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
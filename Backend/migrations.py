@@ -0,0 +1,257 @@
+"""Versioned schema migrations.
+
+``Base.metadata.create_all`` creates missing tables but never changes one that
+already exists, so columns, indexes and constraints added to the models since
+a database was created would never reach it. Each such change is a numbered
+migration here. ``upgrade`` applies the pending ones in order, in one
+transaction, and records them in ``schema_migrations``. ``init_db`` runs it on
+every start. A new database already gets the current schema from create_all,
+so there the migrations find nothing to do and are only recorded.
+
+Migrations must be safe to run against a schema that already has the change.
+Values a migration cannot carry over are copied to ``migration_rejected_values``
+before they are cleared.
+
+Usage:
+    python migrations.py             # apply pending migrations
+    python migrations.py --status    # list applied and pending migrations
+"""
+import argparse
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable, Dict, Iterable, List, Set, Tuple
+
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, inspect, insert, select, text
+
+from database import Base
+from models.fares import backfill_fare_calendar
+from models.flights import Flight, migrate_seat_features
+from models.occupancy import backfill_occupancy
+from models.passengers import migrate_loyalty_rewards
+
+# Kept out of Base.metadata: the applied versions must outlive drop_all/create_all of the models
+schema_migrations = Table(
+    "schema_migrations", MetaData(),
+    Column("version", Integer, primary_key=True),
+    Column("description", String, nullable=False),
+    Column("applied_at", DateTime, nullable=False),
+)
+
+# Values a migration had to clear, kept so they can be reviewed or repaired by hand
+rejected_values = Table(
+    "migration_rejected_values", MetaData(),
+    Column("id", Integer, primary_key=True, autoincrement=True),
+    Column("version", Integer, nullable=False),
+    Column("table_name", String, nullable=False),
+    Column("row_key", String, nullable=False),  # primary key of the row the value was cleared in
+    Column("column_name", String, nullable=False),
+    Column("value", String),
+    Column("cleared_at", DateTime, nullable=False),
+)
+
+
+@dataclass(frozen=True)
+class Migration:
+    version: int
+    description: str
+    upgrade: Callable
+
+
+MIGRATIONS: List[Migration] = []
+
+
+def migration(version: int, description: str):
+    def register(upgrade):
+        MIGRATIONS.append(Migration(version, description, upgrade))
+        return upgrade
+    return register
+
+
+# Helpers
+
+def add_missing_columns(connection):
+    """Add the columns that models gained since their table was created"""
+    inspector = inspect(connection)
+    existing_tables = set(inspector.get_table_names())
+    for table in Base.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in existing and not column.primary_key:
+                column_type = column.type.compile(dialect=connection.dialect)
+                connection.execute(text(f'ALTER TABLE {table.name} ADD COLUMN "{column.name}" {column_type}'))
+
+
+def create_indexes(connection, names: Iterable[str]):
+    """Create the named model indexes that the database does not have yet"""
+    indexes = {index.name: index for table in Base.metadata.tables.values() for index in table.indexes}
+    for name in names:
+        indexes[name].create(connection, checkfirst=True)
+
+
+def unique_column_sets(connection, table_name: str) -> Set[Tuple[str, ...]]:
+    inspector = inspect(connection)
+    unique = {tuple(constraint["column_names"]) for constraint in inspector.get_unique_constraints(table_name)}
+    unique |= {tuple(index["column_names"]) for index in inspector.get_indexes(table_name) if index["unique"]}
+    return unique
+
+
+def rebuild_table(connection, table: Table):
+    """Recreate ``table`` from its model definition and copy the rows over.
+
+    SQLite cannot add, drop or change constraints or column types in place.
+    The old table is renamed aside with legacy_alter_table on, so foreign keys
+    in other tables keep pointing at the name rather than following the
+    rename. Columns the model no longer has are dropped.
+    """
+    old_name = f"_old_{table.name}"
+    existing = [column["name"] for column in inspect(connection).get_columns(table.name)]
+    columns = ", ".join(f'"{column.name}"' for column in table.columns if column.name in existing)
+
+    connection.execute(text("PRAGMA legacy_alter_table = ON"))
+    try:
+        connection.execute(text(f'ALTER TABLE "{table.name}" RENAME TO "{old_name}"'))
+    finally:
+        connection.execute(text("PRAGMA legacy_alter_table = OFF"))
+    # The renamed table keeps its index names; free them for the new table
+    index_names = connection.execute(text(
+        "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = :table AND sql IS NOT NULL"
+    ), {"table": old_name}).scalars().all()
+    for index_name in index_names:
+        connection.execute(text(f'DROP INDEX "{index_name}"'))
+    table.create(connection)
+    connection.execute(text(f'INSERT INTO "{table.name}" ({columns}) SELECT {columns} FROM "{old_name}"'))
+    connection.execute(text(f'DROP TABLE "{old_name}"'))
+
+
+def rejecter(connection, version: int, table_name: str, column_name: str) -> Callable:
+    """Callback keeping a value a migration could not convert in migration_rejected_values"""
+    def reject(row_key, value):
+        rejected_values.create(connection, checkfirst=True)
+        connection.execute(insert(rejected_values).values(
+            version=version, table_name=table_name, row_key=str(row_key), column_name=column_name,
+            value=value, cleared_at=datetime.now()
+        ))
+    return reject
+
+
+# Migrations
+
+@migration(1, "Columns added since tables were created; seat features, loyalty rewards, counters and fare calendar")
+def _baseline(connection):
+    add_missing_columns(connection)
+    migrate_seat_features(connection, rejecter(connection, 1, "seats", "additional_features"))
+    migrate_loyalty_rewards(connection, rejecter(connection, 1, "loyalty_programs", "available_rewards"))
+    backfill_occupancy(connection)
+    backfill_fare_calendar(connection)
+
+
+@migration(2, "Flight numbers are unique per departure, not overall")
+def _flights_unique_per_departure(connection):
+    if ("flight_number", "departure_time") not in unique_column_sets(connection, "flights"):
+        rebuild_table(connection, Flight.__table__)
+
+
+@migration(3, "Indexes for hot queries")
+def _hot_query_indexes(connection):
+    create_indexes(connection, [
+        "ix_flights_route_departure",
+        "ix_flights_departure_time",
+        "ix_flights_flight_number",
+        "ix_seats_flight_type",
+        "ix_reservations_flight_id",
+        "ix_reservations_passenger_id",
+        "ix_tickets_reservation_id",
+        "ix_payments_reservation_id",
+        "ix_promotions_end_start",
+        "ix_promotions_promo_code",
+        "ix_seat_holds_expires_hold",
+    ])
+    # Replaced by ix_seat_holds_expires_hold
+    connection.execute(text("DROP INDEX IF EXISTS ix_seat_holds_expires_at"))
+
+
+# Keys that were declared VARCHAR although they point at integer primary keys
+INTEGER_KEYS = (
+    ("reservations", "passenger_id"),
+    ("tickets", "passenger_id"),
+    ("luggage", "passenger_id"),
+    ("payments", "reservation_id"),
+)
+
+
+@migration(4, "Passenger and reservation foreign keys are integers, like the keys they reference")
+def _integer_foreign_keys(connection):
+    inspector = inspect(connection)
+    for table_name, column_name in INTEGER_KEYS:
+        declared = {column["name"]: column["type"] for column in inspector.get_columns(table_name)}
+        if isinstance(declared[column_name], Integer):
+            continue
+        # The copy converts '42' to 42 through the new column's integer affinity
+        rebuild_table(connection, Base.metadata.tables[table_name])
+        # Anything left as text was not a number, so it never matched a row; don't keep it as a dangling key,
+        # but copy it to migration_rejected_values first
+        primary_key = Base.metadata.tables[table_name].primary_key.columns.values()[0].name
+        rejected_values.create(connection, checkfirst=True)
+        connection.execute(text(
+            f"INSERT INTO {rejected_values.name} (version, table_name, row_key, column_name, value, cleared_at) "
+            f"SELECT 4, :table_name, {primary_key}, :column_name, {column_name}, :now "
+            f"FROM {table_name} WHERE typeof({column_name}) = 'text'"
+        ), {"table_name": table_name, "column_name": column_name, "now": datetime.now()})
+        dangling = connection.execute(text(
+            f"UPDATE {table_name} SET {column_name} = NULL WHERE typeof({column_name}) = 'text'"
+        )).rowcount
+        if dangling:
+            print(f"{table_name}.{column_name}: moved {dangling} non-numeric key(s) to {rejected_values.name}")
+    create_indexes(connection, ["ix_tickets_passenger_id", "ix_luggage_passenger_id"])
+
+
+@migration(5, "Index administrator contact emails, looked up by every admin endpoint")
+def _administrator_email_index(connection):
+    create_indexes(connection, ["ix_administrators_contactEmail"])
+
+
+@migration(6, "Leases on in-progress idempotency keys")
+def _idempotency_leases(connection):
+    add_missing_columns(connection)
+
+
+def applied_versions(connection) -> Dict[int, datetime]:
+    schema_migrations.create(connection, checkfirst=True)
+    return dict(connection.execute(select(schema_migrations.c.version, schema_migrations.c.applied_at)).all())
+
+
+def upgrade(connection) -> List[Migration]:
+    """Apply the pending migrations in version order; returns the ones applied"""
+    applied = applied_versions(connection)
+    pending = sorted((m for m in MIGRATIONS if m.version not in applied), key=lambda m: m.version)
+    for pending_migration in pending:
+        pending_migration.upgrade(connection)
+        connection.execute(insert(schema_migrations).values(
+            version=pending_migration.version, description=pending_migration.description, applied_at=datetime.now()
+        ))
+    return pending
+
+
+def main(argv=None):
+    from database import engine
+
+    parser = argparse.ArgumentParser(description="Apply schema migrations")
+    parser.add_argument("--status", action="store_true", help="only list applied and pending migrations")
+    args = parser.parse_args(argv)
+
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as connection:
+        if args.status:
+            applied = applied_versions(connection)
+            for m in sorted(MIGRATIONS, key=lambda m: m.version):
+                state = f"applied {applied[m.version]:%Y-%m-%d %H:%M}" if m.version in applied else "pending"
+                print(f"{m.version:>4}  {state:<24}  {m.description}")
+            return
+        applied = upgrade(connection)
+    print(f"Applied {len(applied)} migration(s)" + "".join(f"\n  {m.version}: {m.description}" for m in applied))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,36 @@
+"""ORM models, one submodule per domain area.
+
+Everything is re-exported here, so ``import models`` / ``models.Flight``
+keep working. Importing the package registers every mapped class, which
+SQLAlchemy needs before it can resolve the string-based relationships.
+"""
+from database import Base, engine
+from models.session import get_session, init_db
+from models.users import User
+from models.flights import Airline, Airport, Country, Flight, Seat, SeatFeature, SeatHold
+from models.passengers import Loyalty_program, LoyaltyLedgerEntry, LoyaltyReward, Passenger
+from models.promotions import Promotion, Special_promotion
+from models.reservations import BookingAgent, Payment, PaymentJob, Reservation, ReservationStatus, Ticket
+from models.luggage import Base_luggage, Luggage, LuggageEvent, LuggageStatusCode, Overweight_luggage, Standard_luggage
+from models.currencies import Currency
+from models.occupancy import FlightOccupancy, OccupancyRollup
+from models.fares import FareCalendarDay
+from models.idempotency import IdempotencyRecord
+from models.outbox import OutboxEvent, OutboxOffset
+from models.admin import Administrator
+
+__all__ = [
+    "Base", "engine", "get_session", "init_db",
+    "User",
+    "Airline", "Airport", "Country", "Flight", "Seat", "SeatFeature", "SeatHold",
+    "Loyalty_program", "LoyaltyLedgerEntry", "LoyaltyReward", "Passenger",
+    "Promotion", "Special_promotion",
+    "BookingAgent", "Payment", "PaymentJob", "Reservation", "ReservationStatus", "Ticket",
+    "Base_luggage", "Luggage", "LuggageEvent", "LuggageStatusCode", "Overweight_luggage", "Standard_luggage",
+    "Currency",
+    "FlightOccupancy", "OccupancyRollup",
+    "FareCalendarDay",
+    "IdempotencyRecord",
+    "OutboxEvent", "OutboxOffset",
+    "Administrator",
+]
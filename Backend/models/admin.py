@@ -0,0 +1,131 @@
+"""Administrator operations over flights and reservations"""
+from sqlalchemy import Boolean, Column, String, exists
+
+from database import Base
+from models.flights import Flight
+from models.reservations import Reservation
+
+
+class Administrator(Base):
+    __tablename__ = 'administrators'
+
+    adminID = Column(String, primary_key=True)
+    name = Column(String, nullable=False)
+    role = Column(String)
+    contactEmail = Column(String, index=True)  # admin endpoints look the caller up by email
+    hasManagementAccess = Column(Boolean, default=False)
+
+    def __init__(self, adminID: str, name: str, role: str, contactEmail: str, hasManagementAccess: bool):
+        self.adminID = adminID
+        self.name = name
+        self.role = role
+        self.contactEmail = contactEmail
+        self.hasManagementAccess = hasManagementAccess
+
+    @staticmethod
+    def has_management_access(session, email: str) -> bool:
+        """Whether ``email`` is the contact of an administrator with management access"""
+        return session.query(
+            exists().where(Administrator.contactEmail == email, Administrator.hasManagementAccess == True)
+        ).scalar()
+
+    @staticmethod
+    def create_flight(session, airline_id: int, flight_number: str, departure_code: str, destination_code: str,
+                      departure_time: str, arrival_time: str, total_seats: int, gate: str, terminal: str, days_of_operation: int):
+        try:
+            flight = Flight(
+                flight_number=flight_number,
+                departure_code=departure_code,
+                destination_code=destination_code,
+                departure_time=departure_time,
+                arrival_time=arrival_time,
+                total_seats=total_seats,
+                gate=gate,
+                terminal=terminal,
+                airline_id=airline_id,
+                days_of_operation=days_of_operation
+            )
+            session.add(flight)
+            session.commit()
+            print(f"Flight {flight_number} created for Airline ID {airline_id}.")
+        except Exception as e:
+            session.rollback()
+            print(f"Error creating flight: {e}")
+
+    @staticmethod
+    def remove_flight(session, flight_number: str):
+        try:
+            flight = session.query(Flight).filter_by(flight_number=flight_number).first()
+            if not flight:
+                print(f"Flight {flight_number} does not exist.")
+                return
+            session.delete(flight)
+            session.commit()
+            print(f"Flight {flight_number} removed successfully.")
+        except Exception as e:
+            session.rollback()
+            print(f"Error removing flight: {e}")
+
+    @staticmethod
+    def approve_reservation(session, reservation_id: int):
+       
+        try:
+            reservation = session.query(Reservation).filter_by(id=reservation_id, status="Pending").first()
+            if not reservation:
+                print(f"Reservation {reservation_id} does not exist or is not pending.")
+                return
+            reservation.status = "Confirmed"
+
+            session.commit()
+            print(f"Reservation {reservation_id} approved successfully.")
+        except Exception as e:
+            session.rollback()
+            print(f"Error approving reservation: {e}")
+
+    @staticmethod
+    def cancel_reservation(session, reservation_id: int):
+        try:
+            reservation = session.query(Reservation).filter_by(id=reservation_id).first()
+            if not reservation:
+                print(f"Reservation {reservation_id} does not exist.")
+                return
+            reservation.cancel()
+
+            
+            session.commit()
+            print(f"Reservation {reservation_id} canceled successfully.")
+        except Exception as e:
+            session.rollback()
+            print(f"Error canceling reservation: {e}")
+
+    @staticmethod
+    def view_all_reservations(session):
+        try:
+            from exports import reservation_export_query
+            rows = session.execute(reservation_export_query().execution_options(yield_per=1000))
+            found = False
+            for row in rows:
+                if not found:
+                    print("Reservations:")
+                    found = True
+                print(f"Reservation ID: {row.reservation_id}, Passenger: {row.passenger_name}, Flight: {row.flight_number}, Status: {row.status}")
+            if not found:
+                print("No reservations found.")
+        except Exception as e:
+            print(f"Error viewing reservations: {e}")
+
+    @staticmethod
+    def view_all_flights(session):
+        try:
+            from exports import flight_export_query
+            rows = session.execute(flight_export_query().execution_options(yield_per=1000))
+            found = False
+            for row in rows:
+                if not found:
+                    print("Flights:")
+                    found = True
+                print(f"Flight Number: {row.flight_number}, Departure: {row.departure_code}, Destination: {row.destination_code}, Seats Available: {row.available_seats}")
+            if not found:
+                print("No flights found.")
+        except Exception as e:
+            print(f"Error viewing flights: {e}")
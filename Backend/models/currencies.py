@@ -0,0 +1,67 @@
+"""Currencies and exchange rates"""
+from datetime import datetime
+
+from sqlalchemy import Column, DateTime, Float, String
+
+from database import Base
+
+
+class Currency(Base):
+    __tablename__ = 'currencies'
+    
+    currency_code = Column(String, primary_key=True)
+    symbol = Column(String)
+    exchange_rate = Column(Float)
+    country_name = Column(String)
+    last_updated = Column(DateTime)
+
+    def __init__(self, currency_code: str, symbol: str, exchange_rate: float, country_name: str, last_updated: datetime):
+        self.currency_code = currency_code
+        self.symbol = symbol
+        self.exchange_rate = exchange_rate
+        self.country_name = country_name
+        self.last_updated = last_updated
+
+    @staticmethod
+    def convert_to(session, amount: float, source_currency_code: str, target_currency_code: str) -> float:
+        source_currency = session.query(Currency).filter_by(currency_code=source_currency_code).first()
+        target_currency = session.query(Currency).filter_by(currency_code=target_currency_code).first()
+
+        if not source_currency or not target_currency:
+            raise ValueError("One or both currencies do not exist in the database.")
+
+        if source_currency.exchange_rate <= 0 or target_currency.exchange_rate <= 0:
+            raise ValueError("Exchange rate must be a positive number.")
+
+        # Perform the conversion
+        converted_amount = amount * (target_currency.exchange_rate / source_currency.exchange_rate)
+        return round(converted_amount, 2)
+
+    @staticmethod
+    def update_exchange_rate(session, currency_code: str, new_rate: float):
+        currency = session.query(Currency).filter_by(currency_code=currency_code).first()
+
+        if not currency:
+            raise ValueError(f"Currency with code {currency_code} does not exist in the database.")
+
+        if new_rate <= 0:
+            raise ValueError("Exchange rate must be a positive number.")
+
+        currency.exchange_rate = new_rate
+        currency.last_updated = datetime.now()
+        session.commit()
+        print(f"Exchange rate updated to {new_rate} for {currency_code}.")
+
+    @staticmethod
+    def display_currency_info(session, currency_code: str):
+        currency = session.query(Currency).filter_by(currency_code=currency_code).first()
+
+        if not currency:
+            raise ValueError(f"Currency with code {currency_code} does not exist in the database.")
+
+        return {
+            "Currency": f"{currency.currency_code} ({currency.symbol})",
+            "Country": currency.country_name,
+            "Exchange Rate": currency.exchange_rate,
+            "Last Updated": currency.last_updated
+        }
@@ -0,0 +1,213 @@
+"""Lowest fare and seats left per route, day and cabin.
+
+``fare_calendar`` holds one row per (departure_code, destination_code, day,
+cabin): how many flights operate it, how many seats of the cabin are still
+available, the cabin's base fare and the lowest fare after promotions. The
+primary key is the lookup order, so a month for a route is one index range
+scan.
+
+Fares come from ``Ticket.base_prices``; a promotion lowers the fare of the
+departure days its start_date..end_date window covers (usage limits are only
+checked when a code is redeemed). Rows are recomputed for just the cells a
+write touches, in the writer's transaction: ORM flushes of flights, seats and
+promotions go through the session event below, and code that writes seats or
+flights with Core statements calls ``refresh_fare_calendar`` itself.
+"""
+from datetime import date, datetime, time, timedelta
+from itertools import chain
+from typing import Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import Column, Date, DateTime, Float, Integer, String, and_, case, delete, distinct, event, func, \
+    inspect, insert, or_, select
+from sqlalchemy.orm import Session
+
+from database import Base
+from models.flights import Flight, Seat
+from models.promotions import Promotion, Special_promotion
+from models.reservations import Ticket
+
+Cell = Tuple[str, str, date]  # (departure_code, destination_code, day)
+# Cells per statement; SQLite limits how deeply an OR chain may nest
+_CELLS_PER_STATEMENT = 200
+_FLIGHT_FIELDS = ("departure_code", "destination_code", "departure_time")
+_SEAT_FIELDS = ("flight_id", "class_type", "is_available")
+_PROMOTION_FIELDS = ("discount_percentage", "start_date", "end_date", "min_purchase", "max_discount")
+
+
+class FareCalendarDay(Base):
+    __tablename__ = 'fare_calendar'
+
+    departure_code = Column(String, primary_key=True)
+    destination_code = Column(String, primary_key=True)
+    day = Column(Date, primary_key=True)
+    cabin = Column(String, primary_key=True)
+    flights = Column(Integer, nullable=False)
+    seats_left = Column(Integer, nullable=False)
+    base_fare = Column(Float)
+    min_fare = Column(Float)  # None when the cabin is sold out
+    promo_id = Column(String)  # Promotion that gives min_fare, if any
+    refreshed_at = Column(DateTime, nullable=False)
+
+
+def _as_date(value) -> date:
+    return value if isinstance(value, date) else date.fromisoformat(value)
+
+
+def _cell(departure_code, destination_code, departure_time) -> Optional[Cell]:
+    if not (departure_code and destination_code and departure_time):
+        return None
+    return departure_code, destination_code, departure_time.date()
+
+
+def lowest_fare(base_fare: float, day: date, promotions) -> Tuple[float, Optional[str]]:
+    """Cheapest price of ``base_fare`` on ``day`` over the promotion rows, and the promotion that gives it"""
+    best, best_id = base_fare, None
+    for promotion in promotions:
+        if not promotion.start_date.date() <= day <= promotion.end_date.date():
+            continue
+        if promotion.min_purchase and base_fare < promotion.min_purchase:
+            continue
+        price = Promotion.calculate_discounted_price(
+            base_fare, (promotion.discount_percentage or 0.0) + (promotion.extra_bonus or 0.0), promotion.max_discount
+        )
+        if price < best:
+            best, best_id = price, promotion.promo_id
+    return round(best, 2), best_id
+
+
+def _promotions_between(connection, first: date, last: date) -> List:
+    promotions, special = Promotion.__table__, Special_promotion.__table__
+    return connection.execute(
+        select(promotions.c.promo_id, promotions.c.discount_percentage, promotions.c.max_discount,
+               promotions.c.min_purchase, promotions.c.start_date, promotions.c.end_date, special.c.extra_bonus)
+        .select_from(promotions.outerjoin(special, special.c.promo_id == promotions.c.promo_id))
+        .where(promotions.c.start_date < datetime.combine(last + timedelta(days=1), time()),
+               promotions.c.end_date >= datetime.combine(first, time()))
+    ).all()
+
+
+def flight_cells(connection, flight_ids: Iterable[int]) -> Set[Cell]:
+    flights = Flight.__table__
+    flight_ids = list(set(flight_ids) - {None})
+    if not flight_ids:
+        return set()
+    rows = connection.execute(
+        select(flights.c.departure_code, flights.c.destination_code, flights.c.departure_time)
+        .where(flights.c.id.in_(flight_ids))
+    ).all()
+    return {cell for cell in (_cell(*row) for row in rows) if cell}
+
+
+def _recompute(connection, calendar_scope, flight_scope) -> int:
+    """Replace the calendar rows matching ``calendar_scope`` with fresh aggregates of the flights in ``flight_scope``"""
+    calendar, flights, seats = FareCalendarDay.__table__, Flight.__table__, Seat.__table__
+    day = func.date(flights.c.departure_time)
+    cabin = func.lower(seats.c.class_type)
+    aggregate = (
+        select(
+            flights.c.departure_code, flights.c.destination_code, day, cabin,
+            func.count(distinct(flights.c.id)),
+            func.coalesce(func.sum(case((seats.c.is_available == True, 1), else_=0)), 0),
+        )
+        .select_from(flights.join(seats, seats.c.flight_id == flights.c.id))
+        # Flights first (route/departure index), then their seats (flight_id index)
+        .where(seats.c.flight_id.in_(select(flights.c.id).where(flights.c.departure_time.is_not(None), flight_scope)))
+        .group_by(flights.c.departure_code, flights.c.destination_code, day, cabin)
+    )
+    groups = [(departure, destination, _as_date(day), cabin, count, seats_left)
+              for departure, destination, day, cabin, count, seats_left in connection.execute(aggregate)]
+
+    connection.execute(delete(calendar).where(calendar_scope))
+    if not groups:
+        return 0
+    promotions = _promotions_between(connection, min(group[2] for group in groups), max(group[2] for group in groups))
+    now = datetime.now()
+    rows = []
+    for departure, destination, day, cabin, count, seats_left in groups:
+        base_fare = Ticket.base_prices.get(cabin)
+        min_fare, promo_id = (lowest_fare(base_fare, day, promotions)
+                              if base_fare is not None and seats_left else (None, None))
+        rows.append({"departure_code": departure, "destination_code": destination, "day": day, "cabin": cabin,
+                     "flights": count, "seats_left": seats_left, "base_fare": base_fare, "min_fare": min_fare,
+                     "promo_id": promo_id, "refreshed_at": now})
+    connection.execute(insert(calendar), rows)
+    return len(rows)
+
+
+def refresh_fare_calendar(connection, flight_ids: Iterable[int] = (), cells: Iterable[Cell] = (),
+                          days: Tuple[date, date] = None) -> int:
+    """Recompute the cells of some flights, explicit (from, to, day) cells, and/or every route on days first..last"""
+    calendar, flights = FareCalendarDay.__table__, Flight.__table__
+    refreshed = 0
+    if days is not None:
+        first, last = days
+        refreshed += _recompute(
+            connection,
+            calendar.c.day.between(first, last),
+            and_(flights.c.departure_time >= datetime.combine(first, time()),
+                 flights.c.departure_time < datetime.combine(last + timedelta(days=1), time())),
+        )
+    cells = sorted(set(cells) | flight_cells(connection, flight_ids))
+    for start in range(0, len(cells), _CELLS_PER_STATEMENT):
+        chunk = cells[start:start + _CELLS_PER_STATEMENT]
+        refreshed += _recompute(
+            connection,
+            or_(*(and_(calendar.c.departure_code == departure, calendar.c.destination_code == destination,
+                       calendar.c.day == day) for departure, destination, day in chunk)),
+            or_(*(and_(flights.c.departure_code == departure, flights.c.destination_code == destination,
+                       flights.c.departure_time >= datetime.combine(day, time()),
+                       flights.c.departure_time < datetime.combine(day + timedelta(days=1), time()))
+                  for departure, destination, day in chunk)),
+        )
+    return refreshed
+
+
+def rebuild_fare_calendar(connection) -> int:
+    """Recompute the whole calendar"""
+    flights = Flight.__table__
+    return _recompute(connection, FareCalendarDay.__table__.c.day.is_not(None), flights.c.id.is_not(None))
+
+
+def backfill_fare_calendar(connection):
+    """Build the calendar once for a database that predates it"""
+    has_rows = connection.execute(select(FareCalendarDay.day).limit(1)).first()
+    has_seats = connection.execute(select(Seat.seat_id).limit(1)).first()
+    if has_seats and not has_rows:
+        rebuild_fare_calendar(connection)
+
+
+def _changed(state, fields) -> bool:
+    return any(state.attrs[name].history.has_changes() for name in fields)
+
+
+def _old_value(state, name):
+    history = state.attrs[name].history
+    return history.deleted[0] if history.deleted else getattr(state.object, name)
+
+
+@event.listens_for(Session, "after_flush")
+def _refresh_after_flush(session, flush_context):
+    # new/dirty/deleted and attribute history still describe this flush here
+    cells, flight_ids, windows = set(), set(), []
+    for obj in chain(session.new, session.dirty, session.deleted):
+        if not isinstance(obj, (Flight, Seat, Promotion)):
+            continue
+        state = inspect(obj)
+        touched = obj in session.new or obj in session.deleted
+        if isinstance(obj, Flight) and (touched or _changed(state, _FLIGHT_FIELDS)):
+            cells.add(_cell(obj.departure_code, obj.destination_code, obj.departure_time))
+            cells.add(_cell(*(_old_value(state, name) for name in _FLIGHT_FIELDS)))
+        elif isinstance(obj, Seat) and (touched or _changed(state, _SEAT_FIELDS)):
+            flight_ids.update((obj.flight_id, _old_value(state, "flight_id")))
+        elif isinstance(obj, Promotion) and (touched or _changed(state, _PROMOTION_FIELDS)
+                                             or (isinstance(obj, Special_promotion)
+                                                 and _changed(state, ("extra_bonus",)))):
+            for start, end in ((obj.start_date, obj.end_date),
+                               (_old_value(state, "start_date"), _old_value(state, "end_date"))):
+                if start and end and start <= end:
+                    windows.append((start.date(), end.date()))
+    cells.discard(None)
+    if not (cells or flight_ids or windows):
+        return
+    days = (min(first for first, _ in windows), max(last for _, last in windows)) if windows else None
+    refresh_fare_calendar(session.connection(), flight_ids, cells, days)
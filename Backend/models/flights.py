@@ -0,0 +1,417 @@
+"""Reference data (countries, airports, airlines), flights and their seats"""
+import json
+from datetime import datetime
+from typing import Callable, List, Optional
+
+from sqlalchemy import (Boolean, Column, DateTime, ForeignKey, Index, Integer, String, UniqueConstraint, exists, inspect,
+                        select, text)
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import relationship, selectinload
+
+from database import Base
+from models.session import get_session
+
+
+class Country(Base):
+    __tablename__ = 'countries'
+
+    name = Column(String, nullable=False)
+    code = Column(String, primary_key=True)
+    continent = Column(String)
+    official_language = Column(String)
+    is_schengen_zone_member = Column(Boolean, default=False)
+
+    airports = relationship("Airport", back_populates="country")
+
+    def __init__(self, name: str, code: str, continent: str, official_language: str, is_schengen_zone_member: bool):
+        self.name = name
+        self.code = code
+        self.continent = continent
+        self.official_language = official_language
+        self.is_schengen_zone_member = is_schengen_zone_member
+
+    def __repr__(self):
+        return f"<Country(name={self.name}, code={self.code})>"
+
+
+class Airport(Base):
+    __tablename__ = 'airports'
+
+    code = Column(String, primary_key=True)
+    name = Column(String, nullable=False)
+    location = Column(String)
+    country_code = Column(String, ForeignKey('countries.code'))  # ✅ Foreign key to Country.code
+    number_of_terminals = Column(Integer)
+
+    # Relationships
+    country = relationship("Country", back_populates="airports")  # ✅ Works with Country.airports
+    airlines = relationship("Airline", back_populates="base_airport")
+
+    def __init__(self, name: str, code: str, location: str, country_code: str, number_of_terminals: int):
+        self.name = name
+        self.code = code
+        self.location = location
+        self.country_code = country_code
+        self.number_of_terminals = number_of_terminals
+
+    def save(self):
+        session = get_session()
+        session.add(self)
+        session.commit()
+        session.close()
+
+    @staticmethod
+    def create_flight(session, departure_code: str, flight_number: str, destination_code: str,
+                      departure_time: str, arrival_time: str, total_seats: int,
+                      gate: str, terminal: str, airline_id: int, days_of_operation: int):
+        flight = Flight(
+            flight_number=flight_number,
+            departure_code=departure_code,
+            destination_code=destination_code,
+            departure_time=departure_time,
+            arrival_time=arrival_time,
+            total_seats=total_seats,
+            gate=gate,
+            terminal=terminal,
+            airline_id=airline_id,
+            days_of_operation=days_of_operation
+        )
+        session.add(flight)
+        session.commit()
+        print(f"Flight {flight_number} created departing from Airport {departure_code}.")
+
+    @staticmethod
+    def remove_flight(session, flight_number):
+        try:
+            flight = session.query(Flight).filter_by(flight_number=flight_number).first()
+            if not flight:
+                print(f"Flight {flight_number} does not exist.")
+                return
+            session.delete(flight)
+            session.commit()
+            print(f"Flight {flight_number} removed.")
+        except Exception as e:
+            session.rollback()
+            print(f"Error while removing flight: {e}")
+
+    @staticmethod
+    def manage_seats(session, flight_number: int):
+        flight = session.query(Flight).filter_by(flight_number=flight_number).first()
+        if not flight:
+            print(f"No flight found with ID {flight_number}")
+            return
+        print(f"Managing seats for Flight {flight.flight_number}:")
+        for seat in flight.seats:
+            print(f"Seat Number {seat.seat_number} - Available: {seat.is_available} Class type {seat.class_type}")
+
+
+class Airline(Base):
+    __tablename__ = 'airlines'
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    name = Column(String, nullable=False)
+    iata_code = Column(String, unique=True)
+    icao_code = Column(String, unique=True)
+    headquarters = Column(String)
+    year_founded = Column(Integer)
+    base_airport_code = Column(String, ForeignKey('airports.code'))
+
+    base_airport = relationship("Airport", back_populates="airlines")
+    flights = relationship("Flight", back_populates="airline")
+
+    def __init__(self, name, iata_code, icao_code, headquarters, year_founded, base_airport_code):
+        self.name = name
+        self.iata_code = iata_code
+        self.icao_code = icao_code
+        self.headquarters = headquarters
+        self.year_founded = year_founded
+        self.base_airport_code = base_airport_code
+
+    @staticmethod
+    def create_flight(session, airline_id: int, flight_number: str, departure_code: str, destination_code: str,
+                      departure_time: str, arrival_time: str, total_seats: int, gate: str, terminal: str, days_of_operation: int):
+        try:
+            flight = Flight(
+                flight_number=flight_number,
+                departure_code=departure_code,
+                destination_code=destination_code,
+                departure_time=departure_time,
+                arrival_time=arrival_time,
+                total_seats=total_seats,
+                gate=gate,
+                terminal=terminal,
+                airline_id=airline_id,
+                days_of_operation=days_of_operation
+            )
+            session.add(flight)
+            session.commit()
+            print(f"Flight {flight_number} created for Airline ID {airline_id}.")
+        except Exception as e:
+            session.rollback()
+            print(f"Error creating flight: {e}")
+
+    @staticmethod
+    def delete_flight(session, airline_id: int, flight_number: str):
+        try:
+            flight = session.query(Flight).filter_by(airline_id=airline_id, flight_number=flight_number).first()
+            if not flight:
+                print(f"Flight {flight_number} does not exist for Airline ID {airline_id}.")
+                return
+            session.delete(flight)
+            session.commit()
+            print(f"Flight {flight_number} deleted for Airline ID {airline_id}.")
+        except Exception as e:
+            session.rollback()
+            print(f"Error deleting flight: {e}")
+
+    def get_flight(self, flight_number):
+        for flight in self.flights:
+            if flight.flight_number == flight_number:
+                return flight
+        return None
+
+    @staticmethod
+    def manage_seats(session, flight_number: int):
+        flight = session.query(Flight).filter_by(flight_number=flight_number).first()
+        if not flight:
+            print(f"No flight found with ID {flight_number}")
+            return
+        print(f"Managing seats for Flight {flight.flight_number}:")
+        for seat in flight.seats:
+            print(f"Seat Number {seat.seat_number} - Available: {seat.is_available} Class type {seat.class_type}")
+
+
+class Flight(Base):
+    __tablename__ = 'flights'
+    # A flight number operates on many dates, so it is only unique per departure
+    __table_args__ = (
+        UniqueConstraint('flight_number', 'departure_time', name='uq_flight_number_departure'),
+        Index('ix_flights_route_departure', 'departure_code', 'destination_code', 'departure_time'),
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    flight_number = Column(String, nullable=False, index=True)
+    departure_code = Column(String, ForeignKey('airports.code'), nullable=False)
+    destination_code = Column(String, ForeignKey('airports.code'), nullable=False)
+    departure_time = Column(DateTime, index=True)  # Changed to DateTime
+    arrival_time = Column(DateTime)    # Changed to DateTime
+    total_seats = Column(Integer)
+    available_seats = Column(Integer)
+    gate = Column(String)
+    terminal = Column(String)
+    airline_id = Column(Integer, ForeignKey('airlines.id'))
+    days_of_operation = Column(Integer)  # Weekday bitmask, Monday = 1 ... Sunday = 64
+
+    user_id = Column(Integer, ForeignKey('users.id'))
+    user = relationship("User", back_populates="flights") 
+
+    # Relationships
+    seats = relationship("Seat", back_populates="flight", cascade="all, delete-orphan")
+    airline = relationship("Airline", back_populates="flights")
+    departure_airport = relationship("Airport", foreign_keys=[departure_code])
+    destination_airport = relationship("Airport", foreign_keys=[destination_code])
+    reservations = relationship("Reservation", back_populates="flight", cascade="all, delete-orphan")
+
+    def __init__(self, flight_number: str, departure_code: str, destination_code: str,
+                 departure_time: datetime, arrival_time: datetime, total_seats: int, gate: str,
+                 terminal: str, airline_id: int, days_of_operation: int):
+        self.flight_number = flight_number
+        self.departure_code = departure_code
+        self.destination_code = destination_code
+        self.departure_time = departure_time
+        self.arrival_time = arrival_time
+        self.total_seats = total_seats
+        self.available_seats = total_seats
+        self.gate = gate
+        self.terminal = terminal
+        self.airline_id = airline_id
+        self.days_of_operation = days_of_operation
+
+    def add_reservation(self, reservation):
+        if reservation.seat.is_available:
+            reservation.seat.reserve_seat()
+            self.reservations.append(reservation)  # available_seats is updated by the occupancy counters
+        else:
+            print(f"Seat {reservation.seat.seat_number} is already reserved!")
+
+    def remove_reservation(self, reservation):
+        if reservation in self.reservations:
+            reservation.seat.release_seat()
+            self.reservations.remove(reservation)
+
+    @staticmethod
+    def calculate_empty_seats(session, flight_id: int):
+        flight = session.query(Flight).filter_by(id=flight_id).first()
+        if not flight:
+            print(f"No flight found with ID {flight_id}")
+            return
+        empty_seats = session.query(Seat).filter_by(flight_id=flight_id, is_available=True).count()
+        print(f"Flight {flight.flight_number} has {empty_seats} empty seats.")
+        return empty_seats
+
+    @staticmethod
+    def calculate_duration(departure_time: datetime, arrival_time: datetime) -> str:
+        # Duration calculation with proper DateTime objects
+        duration = arrival_time - departure_time
+        return str(duration)
+
+    def __repr__(self):
+        return f"<Flight({self.flight_number}: {self.departure_code} -> {self.destination_code})>"
+
+
+class Seat(Base):
+    __tablename__ = 'seats'
+    # Seat searches always narrow by flight first
+    __table_args__ = (Index('ix_seats_flight_type', 'flight_id', 'seat_type', 'is_available'),)
+
+    seat_id = Column(Integer, primary_key=True, autoincrement=True)
+    seat_number = Column(String, nullable=False)
+    class_type = Column(String, nullable=False)
+    is_available = Column(Boolean, default=True)
+    seat_type = Column(String, nullable=False)
+    reservation_time = Column(DateTime, nullable=True)
+    flight_id = Column(Integer, ForeignKey('flights.id'))
+    flight = relationship("Flight", back_populates="seats")
+    # One row per feature, so seats can be filtered by feature in SQL
+    features = relationship("SeatFeature", cascade="all, delete-orphan")
+
+    def __init__(self, seat_number: str, class_type: str, is_available: bool, seat_type: str, flight_id: int, additional_features: List[str] = None):
+        self.seat_number = seat_number
+        self.class_type = class_type
+        self.is_available = is_available
+        self.seat_type = seat_type
+        self.flight_id = flight_id
+        self.additional_features = additional_features or []
+        self.reservation_time = None
+
+    @property
+    def additional_features(self) -> List[str]:
+        return [feature.feature for feature in self.features]
+
+    @additional_features.setter
+    def additional_features(self, features: List[str]):
+        self.features = [SeatFeature(feature=name) for name in dict.fromkeys(normalize_feature(f) for f in features)]
+
+    @staticmethod
+    def search(session, flight_id: int, seat_type: str = None, class_type: str = None,
+               features: List[str] = (), available_only: bool = True):
+        """Seats of a flight matching all the given features, e.g. window seats with extra legroom.
+
+        Each feature is an EXISTS on the seat_features primary key, so nothing is parsed in Python.
+        """
+        query = select(Seat).where(Seat.flight_id == flight_id).options(selectinload(Seat.features))
+        if seat_type:
+            query = query.where(Seat.seat_type == seat_type)
+        if class_type:
+            query = query.where(Seat.class_type == class_type)
+        if available_only:
+            query = query.where(Seat.is_available == True)
+        for name in dict.fromkeys(normalize_feature(f) for f in features):
+            query = query.where(exists().where(SeatFeature.seat_id == Seat.seat_id, SeatFeature.feature == name))
+        return session.execute(query.order_by(Seat.seat_id)).scalars().all()
+
+    @staticmethod
+    def calculate_empty_seats(session, flight_id: int):
+        empty_seats = session.query(Seat).filter_by(flight_id=flight_id, is_available=True).count()
+        print(f"Flight {flight_id} has {empty_seats} empty seats.")
+        return empty_seats
+
+    @staticmethod
+    def display_reserved_seats(session, flight_id: int):
+        reserved_seats = session.query(Seat).filter_by(flight_id=flight_id, is_available=False).all()
+        if not reserved_seats:
+            print(f"No reserved seats found for Flight ID {flight_id}")
+            return
+
+        print(f"Reserved seats for Flight ID {flight_id}:")
+        for seat in reserved_seats:
+            print(f"Seat Number: {seat.seat_number}, Reserved at: {seat.reservation_time}")
+
+    def reserve_seat(self):
+        if self.is_available:
+            self.is_available = False
+            self.reservation_time = datetime.now()
+            print(f"Seat {self.seat_number} has been reserved at {self.reservation_time}.")
+        else:
+            print(f"Seat {self.seat_number} is already reserved.")
+
+    def release_seat(self):
+        if not self.is_available:
+            self.is_available = True
+            self.reservation_time = None
+            print(f"Seat {self.seat_number} is now available.")
+        else:
+            print(f"Seat {self.seat_number} is not reserved.")
+
+    def get_additional_features(self):
+        return self.additional_features
+
+    def __str__(self):
+        return f"Seat {self.seat_number} - Class: {self.class_type}, Type: {self.seat_type}, Available: {self.is_available}"
+
+
+def normalize_feature(name: str) -> str:
+    return " ".join(name.strip().lower().replace("_", " ").split())
+
+
+class SeatFeature(Base):
+    __tablename__ = 'seat_features'
+    # (feature, seat_id) answers "which seats have X" without touching the seats table
+    __table_args__ = (Index('ix_seat_features_feature_seat', 'feature', 'seat_id'),)
+
+    seat_id = Column(Integer, ForeignKey('seats.seat_id', ondelete="CASCADE"), primary_key=True)
+    feature = Column(String, primary_key=True)  # normalized, e.g. "extra legroom"
+
+
+def parse_legacy_list(raw: str) -> Optional[list]:
+    """The list a legacy JSON column held; [] for 'null', None for anything else"""
+    try:
+        value = json.loads(raw)
+    except json.JSONDecodeError:
+        return None
+    if value is None:
+        return []
+    return value if isinstance(value, list) else None
+
+
+def migrate_seat_features(connection, reject: Callable[[int, str], None] = None) -> int:
+    """Move features from the old JSON ``seats.additional_features`` column into seat_features.
+
+    Run once, by migration 1; the WHERE clause reads the whole table. A value
+    that is not a JSON list is passed to ``reject(seat_id, value)`` and the
+    seat is left without features.
+    """
+    if "additional_features" not in {column["name"] for column in inspect(connection).get_columns("seats")}:
+        return 0
+    rows = connection.execute(text(
+        "SELECT seat_id, additional_features FROM seats "
+        "WHERE additional_features IS NOT NULL AND additional_features NOT IN ('', '[]')"
+    )).all()
+    features = []
+    for seat_id, raw in rows:
+        names = parse_legacy_list(raw)
+        if names is None:
+            if reject is not None:
+                reject(seat_id, raw)
+            names = []
+        features += [{"seat_id": seat_id, "feature": name} for name in dict.fromkeys(map(normalize_feature, names))]
+    if features:
+        connection.execute(sqlite_insert(SeatFeature.__table__).on_conflict_do_nothing(), features)
+    if rows:
+        connection.execute(text("UPDATE seats SET additional_features = NULL WHERE additional_features IS NOT NULL"))
+    return len(features)
+
+
+class SeatHold(Base):
+    """A seat kept off sale while a customer checks out; see holds.py"""
+    __tablename__ = 'seat_holds'
+    # Covers the reaper's DISTINCT hold_id lookup of expired holds
+    __table_args__ = (Index('ix_seat_holds_expires_hold', 'expires_at', 'hold_id'),)
+
+    hold_id = Column(String, primary_key=True)
+    seat_id = Column(Integer, ForeignKey('seats.seat_id'), primary_key=True)
+    flight_id = Column(Integer, ForeignKey('flights.id'), nullable=False)
+    seat_number = Column(String, nullable=False)
+    user_id = Column(Integer, ForeignKey('users.id'), nullable=True)
+    created_at = Column(DateTime, nullable=False)
+    expires_at = Column(DateTime, nullable=False)
@@ -0,0 +1,18 @@
+"""Stored responses for requests sent with an Idempotency-Key header"""
+from sqlalchemy import Column, DateTime, Integer, LargeBinary, String
+
+from database import Base
+
+
+class IdempotencyRecord(Base):
+    __tablename__ = 'idempotency_keys'
+
+    key_hash = Column(String, primary_key=True)      # sha256 of caller + Idempotency-Key
+    fingerprint = Column(String, nullable=False)     # sha256 of method, path and body
+    state = Column(String, nullable=False)           # "in_progress" or "done"
+    lease_until = Column(DateTime)                   # an in_progress claim older than this was abandoned
+    status_code = Column(Integer)
+    content_type = Column(String)
+    body = Column(LargeBinary)                       # zlib-compressed response body
+    created_at = Column(DateTime, nullable=False)
+    expires_at = Column(DateTime, nullable=False, index=True)
@@ -0,0 +1,181 @@
+"""Checked luggage and its scan history"""
+from abc import abstractmethod
+from datetime import datetime
+from enum import IntEnum
+from typing import List
+
+from sqlalchemy import Boolean, Column, Float, ForeignKey, Index, Integer, SmallInteger, String, inspect
+from sqlalchemy.orm import object_session, relationship
+
+from database import Base
+
+
+class LuggageStatusCode(IntEnum):
+    """Status codes stored in luggage_events; the names are what the API speaks"""
+    pending = 0
+    approved = 1
+    overweight = 2
+    checked_in = 3
+    screened = 4
+    loaded = 5
+    in_transit = 6
+    arrived = 7
+    on_belt = 8
+    claimed = 9
+    delayed = 10
+    lost = 11
+
+    @classmethod
+    def parse(cls, status: str) -> "LuggageStatusCode":
+        """'Approved - Fragile item ...', 'checked in' and 'CHECKED_IN' all map to a code"""
+        name = status.split(" - ")[0].strip().lower().replace(" ", "_").replace("-", "_")
+        try:
+            return cls[name]
+        except KeyError:
+            raise ValueError(f"Unknown luggage status: {status}") from None
+
+
+def to_epoch_ms(moment: datetime) -> int:
+    return int(moment.timestamp() * 1000)
+
+
+def from_epoch_ms(ts: int) -> datetime:
+    return datetime.fromtimestamp(ts / 1000)
+
+
+class Base_luggage(Base):
+    __abstract__ = True
+
+    def __init__(self, luggage_id: str, passenger: "Passenger", ticket: "Ticket", weight: float,
+                 volume: int = (0, 0, 0), luggage_fee: float = 0.0, 
+                 status: str = "Pending", is_checked_in: bool = False, is_fragile: bool = False):
+        self.luggage_id = luggage_id
+        self.passenger = passenger
+        self.ticket = ticket
+        self.weight = weight
+        self.volume = volume
+        self.is_fragile = is_fragile
+        self.status = status
+        self.is_checked_in = is_checked_in
+        self.luggage_fee = luggage_fee  # Fee to be calculated based on weight and other factors.
+        self.fine = 0  # Default fine is set to zero.
+
+    @abstractmethod
+    def calculate_fee(self):
+        pass
+
+
+class Luggage(Base_luggage):
+    max_weight_limit = 50
+    free_weight_limit = 20
+    fee_per_kg = 10
+    overweight_fine = 100
+    # Free allowance in kg by ticket class; other classes get free_weight_limit
+    class_allowances = {"economy": 20, "business": 30, "first": 40}
+    __tablename__ = 'luggage'
+    luggage_id = Column(String, primary_key=True)
+    passenger_id = Column(Integer, ForeignKey('passengers.id'), index=True)
+    ticket_id = Column(Integer, ForeignKey('tickets.ticket_number'))
+    weight = Column(Float)
+    dimensions = Column(String)
+    luggage_fee = Column(Float)
+    fine = Column(Float, default=0.0)
+    weight_status = Column(String)
+    status = Column(String)
+    is_checked_in = Column(Boolean, default=False)
+    is_fragile = Column(Boolean, default=False)
+
+    # Append-only; never loaded with the bag unless asked for
+    events = relationship("LuggageEvent", lazy="write_only", order_by="LuggageEvent.ts")
+
+    def __init__(self, luggage_id: str, passenger: "Passenger", ticket: "Ticket", weight: float,
+                 ticket_class: str, volume: int, luggage_fee: float = 0.0,
+                 status: str = "Pending", is_checked_in: bool = False, is_fragile: bool = False):
+        super().__init__(luggage_id, passenger, ticket, weight, volume, luggage_fee, status, is_checked_in, is_fragile)
+        self.ticket_class = ticket_class
+        self.weight_status, self.luggage_fee = self.check_luggage_weight()
+
+    @classmethod
+    def allowance_for(cls, ticket_class: str) -> float:
+        return cls.class_allowances.get((ticket_class or "").strip().lower(), cls.free_weight_limit)
+
+    def check_luggage_weight(self):
+        """(weight status, fee) for this bag; luggage_checkin.py applies the same rules to whole flights"""
+        allowed_weight = self.allowance_for(self.ticket_class)
+        if self.weight <= allowed_weight:
+            return "Within free limit", 0
+        elif self.weight <= self.max_weight_limit:
+            extra_weight = self.weight - allowed_weight
+            return "Extra Weight", extra_weight * self.fee_per_kg
+        else:
+            return "Exceeds maximum limit", 0
+
+    def apply_overweight_fine(self):
+        if self.weight > self.max_weight_limit:
+            self.fine = self.overweight_fine
+            self.luggage_fee += self.fine
+            return f"Overweight fine of {self.overweight_fine} applied to luggage {self.luggage_id}. New luggage fee: {self.luggage_fee} EGP"
+        else:
+            return "There is no fine applied."
+
+    def update_luggage_status(self):
+        if self.weight > self.max_weight_limit:
+            self.status = "Overweight"
+            self.apply_overweight_fine()
+        else:
+            self.status = "Approved"
+        if self.is_fragile:
+            self.status += " - Fragile item so handle with care."
+        self.track_luggage_status()
+
+    def track_luggage_status(self, airport_code: str = None):
+        """Append the current status to the bag's event log (written on the next flush)"""
+        self.events.add(LuggageEvent(luggage_id=self.luggage_id, ts=to_epoch_ms(datetime.now()),
+                                     status_code=LuggageStatusCode.parse(self.status), airport_code=airport_code))
+
+    @property
+    def tracking_history(self) -> List[str]:
+        """The bag's journey as "timestamp: status" lines, oldest first"""
+        session = object_session(self)
+        if session is None:  # never saved: only what was tracked in memory
+            events = inspect(self).attrs.events.history.added
+        else:
+            events = session.scalars(self.events.select()).all()
+        return [f"{from_epoch_ms(event.ts):%Y-%m-%d %H:%M:%S}: {LuggageStatusCode(event.status_code).name}"
+                for event in events]
+
+    def luggage_information(self):
+        return (f"Luggage ID: {self.luggage_id}\n"
+                f"Passenger: {self.passenger.name}\n"
+                f"Weight: {self.weight}\n"
+                f"Dimensions (L W H): {self.dimensions}\n"
+                f"Fragile: {'Yes' if self.is_fragile else 'No'}\n"
+                f"Luggage Fee: {self.luggage_fee} EGP\n"
+                f"Luggage Fine: {self.fine} EGP\n"
+                f"Status: {self.status}")
+
+
+class LuggageEvent(Base):
+    """One scan of one bag. Kept narrow: integer status code and epoch-millisecond timestamp"""
+    __tablename__ = 'luggage_events'
+    __table_args__ = (
+        Index('ix_luggage_events_luggage_ts', 'luggage_id', 'ts'),
+        Index('ix_luggage_events_airport_status', 'airport_code', 'status_code'),
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    luggage_id = Column(String, ForeignKey('luggage.luggage_id'), nullable=False)
+    ts = Column(Integer, nullable=False)             # epoch milliseconds
+    status_code = Column(SmallInteger, nullable=False)  # LuggageStatusCode
+    airport_code = Column(String(3), nullable=True)
+    scanner_id = Column(String, nullable=True)
+
+
+class Standard_luggage(Luggage):
+    def calculate_fee (self) :
+        return max ( 0 , (self.weight - 20 ) * 10 ) 
+
+
+class Overweight_luggage(Luggage) :
+    def calculate_fee (self) :
+        return 100 + max( 0 , (self.weight - 30) * 15 ) 
@@ -0,0 +1,169 @@
+"""Per-flight booking counters and the occupancy rollups built from them.
+
+``flight_occupancy`` holds one row per flight with how many reservations are
+pending, confirmed and canceled. The counters (and ``flights.available_seats``)
+are shifted in the same transaction as the reservation change itself: ORM
+inserts, status changes and deletes go through the mapper events below, and
+code that writes reservations with Core statements calls
+``apply_occupancy_delta`` itself. A flight without a row yet gets one rebuilt
+from its reservations the first time it is touched.
+"""
+from datetime import datetime
+from typing import Iterable, Optional
+
+from sqlalchemy import Column, Date, DateTime, Float, ForeignKey, Integer, String, case, delete, event, func, \
+    insert, inspect, literal, select, update
+
+from database import Base
+from models.flights import Flight
+from models.reservations import Reservation, ReservationStatus
+
+ACTIVE_STATUSES = (ReservationStatus.pending.value, ReservationStatus.confirmed.value)
+_COUNTER_COLUMNS = {
+    ReservationStatus.pending.value: "pending",
+    ReservationStatus.confirmed.value: "confirmed",
+    ReservationStatus.canceled.value: "canceled",
+}
+
+
+class FlightOccupancy(Base):
+    __tablename__ = 'flight_occupancy'
+
+    flight_id = Column(Integer, ForeignKey('flights.id'), primary_key=True)
+    pending = Column(Integer, nullable=False, default=0)
+    confirmed = Column(Integer, nullable=False, default=0)
+    canceled = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.now)
+
+
+class OccupancyRollup(Base):
+    """Load factor per route, airline or network-wide, per departure day"""
+    __tablename__ = 'occupancy_rollups'
+
+    dimension = Column(String, primary_key=True)  # "route", "airline" or "day"
+    key = Column(String, primary_key=True)        # "CAI-HBE", airline id, or "all"
+    day = Column(Date, primary_key=True)
+    flights = Column(Integer, nullable=False)
+    seats = Column(Integer, nullable=False)
+    pending = Column(Integer, nullable=False)
+    confirmed = Column(Integer, nullable=False)
+    load_factor = Column(Float, nullable=False)
+    refreshed_at = Column(DateTime, nullable=False)
+
+
+def status_delta(status: Optional[str], sign: int = 1) -> dict:
+    """Counter changes for adding (sign=1) or removing (sign=-1) one reservation"""
+    column = _COUNTER_COLUMNS.get(status or ReservationStatus.pending.value)
+    return {column: sign} if column else {}
+
+
+def apply_occupancy_delta(connection, flight_id: int, pending: int = 0, confirmed: int = 0, canceled: int = 0):
+    """Shift one flight's counters and available_seats inside the caller's transaction"""
+    if flight_id is None or not (pending or confirmed or canceled):
+        return
+    occupancy = FlightOccupancy.__table__
+    result = connection.execute(
+        update(occupancy)
+        .where(occupancy.c.flight_id == flight_id)
+        .values(
+            pending=occupancy.c.pending + pending,
+            confirmed=occupancy.c.confirmed + confirmed,
+            canceled=occupancy.c.canceled + canceled,
+            updated_at=datetime.now(),
+        )
+    )
+    if result.rowcount == 0:
+        # First change for this flight: the reservation row is already written,
+        # so counting the flight's reservations gives the new totals
+        rebuild_occupancy(connection, [flight_id])
+        return
+    if pending + confirmed:
+        flights = Flight.__table__
+        connection.execute(
+            update(flights)
+            .where(flights.c.id == flight_id)
+            .values(available_seats=flights.c.available_seats - (pending + confirmed))
+        )
+
+
+def rebuild_occupancy(connection, flight_ids: Iterable[int] = None):
+    """Recount counters from the reservations table (all flights, or just some)"""
+    occupancy = FlightOccupancy.__table__
+    reservations = Reservation.__table__
+    flights = Flight.__table__
+    flight_ids = list(flight_ids) if flight_ids is not None else None
+
+    def count(status):
+        return func.coalesce(func.sum(case((reservations.c.status == status, 1), else_=0)), 0)
+
+    counts = (
+        select(
+            reservations.c.flight_id,
+            count(ReservationStatus.pending.value),
+            count(ReservationStatus.confirmed.value),
+            count(ReservationStatus.canceled.value),
+            literal(datetime.now(), DateTime),
+        )
+        .where(reservations.c.flight_id.is_not(None))
+        .group_by(reservations.c.flight_id)
+    )
+    clear = delete(occupancy)
+    sync = update(flights)
+    if flight_ids is not None:
+        counts = counts.where(reservations.c.flight_id.in_(flight_ids))
+        clear = clear.where(occupancy.c.flight_id.in_(flight_ids))
+        sync = sync.where(flights.c.id.in_(flight_ids))
+
+    connection.execute(clear)
+    connection.execute(insert(occupancy).from_select(
+        ["flight_id", "pending", "confirmed", "canceled", "updated_at"], counts
+    ))
+    booked = (
+        select(occupancy.c.pending + occupancy.c.confirmed)
+        .where(occupancy.c.flight_id == flights.c.id)
+        .scalar_subquery()
+    )
+    connection.execute(sync.values(available_seats=flights.c.total_seats - func.coalesce(booked, 0)))
+
+
+def backfill_occupancy(connection):
+    """Build the counters once for a database that predates them"""
+    has_counters = connection.execute(select(FlightOccupancy.flight_id).limit(1)).first()
+    has_reservations = connection.execute(select(Reservation.id).limit(1)).first()
+    if has_reservations and not has_counters:
+        rebuild_occupancy(connection)
+
+
+@event.listens_for(Reservation, "after_insert")
+def _reservation_inserted(mapper, connection, target):
+    apply_occupancy_delta(connection, target.flight_id, **status_delta(target.status))
+
+
+@event.listens_for(Reservation, "after_update")
+def _reservation_updated(mapper, connection, target):
+    state = inspect(target)
+    status_history = state.attrs.status.history
+    flight_history = state.attrs.flight_id.history
+    if not status_history.has_changes() and not flight_history.has_changes():
+        return
+    old_status = status_history.deleted[0] if status_history.deleted else target.status
+    old_flight = flight_history.deleted[0] if flight_history.deleted else target.flight_id
+    removed, added = status_delta(old_status, -1), status_delta(target.status)
+    if old_flight == target.flight_id:
+        # One combined shift, so a first-touch rebuild is never followed by a second delta
+        for column, change in removed.items():
+            added[column] = added.get(column, 0) + change
+        apply_occupancy_delta(connection, target.flight_id, **added)
+    else:
+        apply_occupancy_delta(connection, old_flight, **removed)
+        apply_occupancy_delta(connection, target.flight_id, **added)
+
+
+@event.listens_for(Reservation, "after_delete")
+def _reservation_deleted(mapper, connection, target):
+    apply_occupancy_delta(connection, target.flight_id, **status_delta(target.status, -1))
+
+
+@event.listens_for(Flight, "after_delete")
+def _flight_deleted(mapper, connection, target):
+    connection.execute(delete(FlightOccupancy.__table__).where(FlightOccupancy.flight_id == target.id))
@@ -0,0 +1,98 @@
+"""Outbox of reservation state changes, written in the changing transaction.
+
+Every reservation insert, status change and delete made through the ORM
+appends an ``outbox_events`` row from the mapper events below, on the same
+connection and so in the same transaction as the change itself. Code that
+writes reservations with Core statements calls ``record_reservation_events``.
+Consumers read the table in id order and keep their position in
+``outbox_offsets`` (see outbox.py).
+"""
+import json
+from datetime import datetime
+from typing import Iterable, Optional
+
+from sqlalchemy import Column, DateTime, Integer, String, Text, event, insert, inspect
+
+from database import Base
+from models.reservations import Reservation
+
+RESERVATION_TOPIC = "reservation"
+
+
+class OutboxEvent(Base):
+    __tablename__ = 'outbox_events'
+
+    id = Column(Integer, primary_key=True, autoincrement=True)  # the consumers' offset
+    topic = Column(String, nullable=False, index=True)
+    event_type = Column(String, nullable=False)
+    aggregate_id = Column(String, nullable=False)
+    payload = Column(Text, nullable=False)  # JSON
+    created_at = Column(DateTime, nullable=False)
+
+
+class OutboxOffset(Base):
+    __tablename__ = 'outbox_offsets'
+
+    consumer = Column(String, primary_key=True)
+    last_event_id = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime)
+
+
+def reservation_event(reservation: dict, event_type: str, previous_status: Optional[str] = None,
+                      now: datetime = None) -> dict:
+    """Outbox row for one reservation change; ``reservation`` holds its column values"""
+    payload = {
+        "reservation_id": reservation["id"],
+        "flight_id": reservation.get("flight_id"),
+        "passenger_id": reservation.get("passenger_id"),
+        "seat_number": reservation.get("seat_number"),
+        "status": reservation.get("status"),
+        "previous_status": previous_status,
+        "booking_agent_id": reservation.get("booking_agent_id"),
+    }
+    return {
+        "topic": RESERVATION_TOPIC,
+        "event_type": event_type,
+        "aggregate_id": str(reservation["id"]),
+        "payload": json.dumps(payload),
+        "created_at": now or datetime.now(),
+    }
+
+
+def record_reservation_events(connection, events: Iterable[dict]):
+    """Append outbox rows (from ``reservation_event``) on the caller's connection"""
+    events = list(events)
+    if events:
+        connection.execute(insert(OutboxEvent.__table__), events)
+
+
+def _columns(target: Reservation) -> dict:
+    return {
+        "id": target.id, "flight_id": target.flight_id, "passenger_id": target.passenger_id,
+        "seat_number": target.seat_number, "status": target.status, "booking_agent_id": target.booking_agent_id,
+    }
+
+
+def _status_event(status: Optional[str]) -> str:
+    return f"reservation.{(status or 'pending').lower()}"
+
+
+@event.listens_for(Reservation, "after_insert")
+def _reservation_created(mapper, connection, target):
+    record_reservation_events(connection, [reservation_event(_columns(target), "reservation.created")])
+
+
+@event.listens_for(Reservation, "after_update")
+def _reservation_changed(mapper, connection, target):
+    history = inspect(target).attrs.status.history
+    if not history.has_changes():
+        return
+    previous = history.deleted[0] if history.deleted else None
+    if previous == target.status:
+        return
+    record_reservation_events(connection, [reservation_event(_columns(target), _status_event(target.status), previous)])
+
+
+@event.listens_for(Reservation, "after_delete")
+def _reservation_deleted(mapper, connection, target):
+    record_reservation_events(connection, [reservation_event(_columns(target), "reservation.deleted", target.status)])
@@ -0,0 +1,247 @@
+"""Passengers and their loyalty programs"""
+from datetime import datetime
+from typing import Callable, List
+
+from sqlalchemy import (Boolean, Column, Date, DateTime, ForeignKey, Index, Integer, String, UniqueConstraint,
+                        inspect, select, text)
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import relationship
+
+from database import Base
+from models.flights import parse_legacy_list
+
+
+class Loyalty_program(Base):
+    __tablename__ = 'loyalty_programs'
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    program_name = Column(String)
+    passenger_id = Column(Integer, ForeignKey('passengers.id'), unique=True)  # One-to-one relationship
+    points = Column(Integer)
+    tier_level = Column(String)
+    required_points_for_next_tier = Column(Integer)
+    membership_start_date = Column(DateTime)
+
+    # One-to-one relationship with Passenger
+    passenger = relationship("Passenger", back_populates="loyalty_program")
+    ledger_entries = relationship("LoyaltyLedgerEntry", back_populates="program")
+    rewards = relationship("LoyaltyReward", cascade="all, delete-orphan")
+
+    # (tier, points needed to reach it), lowest first
+    tiers = [("Blue", 0), ("Silver", 25000), ("Gold", 50000), ("Platinum", 100000)]
+    # Points earned per unit of fare, by ticket class
+    earn_rates = {"economy": 1.0, "premium economy": 1.25, "business": 1.5, "first": 2.0}
+
+    def __init__(self, program_name: str, passenger: "Passenger", points: int, available_rewards: List[str],
+                 membership_start_date: datetime, tier_level: str, required_points_for_next_tier: int):
+        self.program_name = program_name
+        self.passenger = passenger
+        self.points = points
+        self.available_rewards = available_rewards or []
+        self.membership_start_date = membership_start_date
+        self.tier_level = tier_level
+        self.required_points_for_next_tier = required_points_for_next_tier
+
+    def add_points(self, pts: int, description: str = None):
+        if pts > 0:
+            self.points += pts
+            self.ledger_entries.append(LoyaltyLedgerEntry(self, "adjustment", pts, description))
+            print(f"{pts} points have been added to your account. Total Points: {self.points}")
+
+    def redeem_points(self, pts: int, description: str = None):
+        if pts > 0 and pts <= self.points:
+            self.points -= pts
+            self.ledger_entries.append(LoyaltyLedgerEntry(self, "redemption", -pts, description))
+            print(f"You have redeemed {pts} points. Remaining points: {self.points}")
+        else:
+            print("You don't have enough points to redeem.")
+
+    @staticmethod
+    def tier_for(points: int):
+        """(tier, points needed for the next tier) for a balance; the top tier keeps its own threshold"""
+        tier, next_threshold = Loyalty_program.tiers[0][0], Loyalty_program.tiers[-1][1]
+        for index, (name, threshold) in enumerate(Loyalty_program.tiers):
+            if points >= threshold:
+                tier = name
+                next_threshold = Loyalty_program.tiers[min(index + 1, len(Loyalty_program.tiers) - 1)][1]
+        return tier, next_threshold
+
+    def check_tier_upgrade(self):
+        if self.points >= self.required_points_for_next_tier:
+            tier, next_threshold = Loyalty_program.tier_for(self.points)
+            if tier != self.tier_level:
+                self.tier_level, self.required_points_for_next_tier = tier, next_threshold
+                print(f"Congratulations, you have been upgraded to {tier}.")
+                return True
+            print("You are already in the highest tier.")
+        else:
+            print(f"You need {self.required_points_for_next_tier - self.points} more points to upgrade.")
+        return False
+
+    def get_program_info(self):
+        available_rewards_list = self.get_available_rewards()  # Deserialize the rewards list
+        return (f"Loyalty Program: {self.program_name}\n"
+                f"Passenger: {self.passenger.name}\n"  # Ensure passenger has a `name` attribute
+                f"Current Points: {self.points}\n"
+                f"Membership Start Date: {self.membership_start_date.strftime('%Y-%m-%d')}\n"
+                f"Points Needed for Upgrade: {self.required_points_for_next_tier}\n"
+                f"Available Rewards: {', '.join(available_rewards_list)}")
+
+    @property
+    def available_rewards(self) -> List[str]:
+        return [reward.reward for reward in self.rewards]
+
+    @available_rewards.setter
+    def available_rewards(self, rewards: List[str]):
+        self.rewards = [LoyaltyReward(reward=name) for name in dict.fromkeys(rewards)]
+
+    def get_available_rewards(self):
+        return self.available_rewards
+
+    @staticmethod
+    def with_reward(session, reward: str):
+        """Programs holding the given reward, found through the loyalty_rewards index"""
+        return session.execute(
+            select(Loyalty_program).join(LoyaltyReward).where(LoyaltyReward.reward == reward)
+        ).scalars().all()
+
+
+class LoyaltyReward(Base):
+    __tablename__ = 'loyalty_rewards'
+    __table_args__ = (Index('ix_loyalty_rewards_reward_program', 'reward', 'program_id'),)
+
+    program_id = Column(Integer, ForeignKey('loyalty_programs.id', ondelete="CASCADE"), primary_key=True)
+    reward = Column(String, primary_key=True)
+
+
+def migrate_loyalty_rewards(connection, reject: Callable[[int, str], None] = None) -> int:
+    """Move rewards from the old JSON ``loyalty_programs.available_rewards`` column into loyalty_rewards.
+
+    Run once, by migration 1; the WHERE clause reads the whole table. A value
+    that is not a JSON list is passed to ``reject(program_id, value)``.
+    """
+    if "available_rewards" not in {column["name"] for column in inspect(connection).get_columns("loyalty_programs")}:
+        return 0
+    rows = connection.execute(text(
+        "SELECT id, available_rewards FROM loyalty_programs "
+        "WHERE available_rewards IS NOT NULL AND available_rewards NOT IN ('', '[]')"
+    )).all()
+    rewards = []
+    for program_id, raw in rows:
+        names = parse_legacy_list(raw)  # the old __init__ stored json.dumps(None) as 'null'
+        if names is None:
+            if reject is not None:
+                reject(program_id, raw)
+            names = []
+        rewards += [{"program_id": program_id, "reward": name} for name in dict.fromkeys(names)]
+    if rewards:
+        connection.execute(sqlite_insert(LoyaltyReward.__table__).on_conflict_do_nothing(), rewards)
+    if rows:
+        connection.execute(text("UPDATE loyalty_programs SET available_rewards = NULL WHERE available_rewards IS NOT NULL"))
+    return len(rewards)
+
+
+class LoyaltyLedgerEntry(Base):
+    """Append-only history of point movements; a program's points are the sum of its entries"""
+    __tablename__ = 'loyalty_ledger'
+    __table_args__ = (UniqueConstraint('reservation_id', 'entry_type', name='uq_loyalty_ledger_reservation_entry'),)
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    program_id = Column(Integer, ForeignKey('loyalty_programs.id'), nullable=False, index=True)
+    passenger_id = Column(Integer, ForeignKey('passengers.id'), nullable=False)
+    reservation_id = Column(Integer, ForeignKey('reservations.id'), nullable=True)  # set for flight accruals
+    entry_type = Column(String, nullable=False)  # accrual, redemption or adjustment
+    points = Column(Integer, nullable=False)     # negative for redemptions
+    description = Column(String)
+    created_at = Column(DateTime, nullable=False, default=datetime.now)
+
+    program = relationship("Loyalty_program", back_populates="ledger_entries")
+
+    def __init__(self, program: "Loyalty_program", entry_type: str, points: int, description: str = None):
+        self.program = program
+        self.passenger_id = program.passenger_id if program.passenger_id is not None else program.passenger.id
+        self.entry_type = entry_type
+        self.points = points
+        self.description = description
+        self.created_at = datetime.now()
+
+
+class Passenger(Base):
+    __tablename__ = 'passengers'
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    name = Column(String)
+    national_id = Column(String, unique=True)  # Make national_id a unique key
+    email = Column(String)
+    phone_number = Column(String)
+    nationality = Column(String)
+    is_vip = Column(Boolean)
+    address = Column(String)
+    date_of_birth = Column(Date)  # Changed to Date type
+    passport_number = Column(String)
+    gender = Column(String)
+    frequent_flyer_number = Column(String, unique=True)  # Unique constraint added
+
+    # One-to-one relationship with Loyalty_program
+    loyalty_program = relationship("Loyalty_program", back_populates="passenger", uselist=False)
+
+    reservations = relationship("Reservation", back_populates="passenger", cascade="all, delete-orphan")
+
+    def __init__(self, name: str, national_id: str, email: str, phone_number: str, nationality: str, is_vip: bool, address: str, 
+                 date_of_birth: str, passport_number: str, gender: str, frequent_flyer_number: str):
+        self.name = name
+        self.national_id = national_id
+        self.email = email
+        self.phone_number = phone_number
+        self.nationality = nationality
+        self.is_vip = is_vip
+        self.address = address
+        self.date_of_birth = datetime.strptime(date_of_birth, "%Y-%m-%d") if isinstance(date_of_birth, str) else date_of_birth
+        self.passport_number = passport_number
+        self.gender = gender
+        self.frequent_flyer_number = frequent_flyer_number
+
+    @staticmethod
+    def enroll_in_loyalty_program(session, national_id: str, program_name: str):
+        passenger = session.query(Passenger).filter_by(national_id=national_id).first()
+        if not passenger:
+            print(f"No passenger found with National ID: {national_id}")
+            return
+
+        if not passenger.loyalty_program:
+            loyalty_program = Loyalty_program(
+                program_name=program_name,
+                passenger=passenger,
+                points=0,
+                available_rewards=[],
+                membership_start_date=datetime.now(),
+                tier_level="Basic",
+                required_points_for_next_tier=100
+            )
+            session.add(loyalty_program)
+            session.commit()
+            print(f"{passenger.name} has been enrolled in the {program_name} loyalty program.")
+        else:
+            print(f"{passenger.name} is already enrolled in the {passenger.loyalty_program.program_name} loyalty program.")
+
+    @staticmethod
+    def get_passenger_info(session, national_id: str):
+        passenger = session.query(Passenger).filter_by(national_id=national_id).first()
+        if not passenger:
+            return f"No passenger found with National ID: {national_id}"
+
+        loyalty_info = f"Loyalty Program: {passenger.loyalty_program.program_name}" if passenger.loyalty_program else "There is no loyalty program."
+        return (f"Passenger ID: {passenger.id}\n"
+                f"Name: {passenger.name}\n"
+                f"National ID: {passenger.national_id}\n"
+                f"Phone Number: {passenger.phone_number}\n"
+                f"Nationality: {passenger.nationality}\n"
+                f"VIP Status: {passenger.is_vip}\n"
+                f"Address: {passenger.address}\n"
+                f"Date of Birth: {passenger.date_of_birth.strftime('%Y-%m-%d')}\n"
+                f"Passport Number: {passenger.passport_number}\n"
+                f"Gender: {passenger.gender}\n"
+                f"Frequent Flyer Number: {passenger.frequent_flyer_number}\n"
+                f"{loyalty_info}")
+
+    def __str__(self):
+        return f"Passenger: {self.name}, National ID: {self.national_id}, Email: {self.email}"
@@ -0,0 +1,155 @@
+"""Discount promotions"""
+from datetime import datetime
+
+from sqlalchemy import Column, DateTime, Float, ForeignKey, Index, Integer, String, select, update
+
+from database import Base
+
+
+class Promotion(Base):
+    __tablename__ = 'promotions'
+    
+    promo_id = Column(String, primary_key=True)
+    description = Column(String)
+    discount_percentage = Column(Float)
+    start_date = Column(DateTime)
+    end_date = Column(DateTime)
+    promo_code = Column(String, index=True)
+    min_purchase = Column(Float)
+    max_discount = Column(Float)
+    usage_limit = Column(Integer)
+    usage_count = Column(Integer)
+
+    def __init__(self, promo_id: str, description: str, discount_percentage: float, start_date: datetime, 
+                 end_date: datetime, promo_code: str, min_purchase: float, max_discount: float, usage_limit: int):
+        self.promo_id = promo_id
+        self.description = description
+        self.discount_percentage = discount_percentage
+        self.start_date = start_date
+        self.end_date = end_date
+        self.promo_code = promo_code
+        self.min_purchase = min_purchase
+        self.max_discount = max_discount
+        self.usage_limit = usage_limit
+        self.usage_count = 0
+
+    @staticmethod
+    def check_promotion_validity(session, promo_id: str) -> bool:
+        promotion = session.query(Promotion).filter_by(promo_id=promo_id).first()
+        if not promotion:
+            raise ValueError(f"No promotion found with ID: {promo_id}")
+
+        now = datetime.now()
+        # Promotion is valid if the current date is within the promotion period and usage limit is not exceeded
+        is_valid = promotion.start_date <= now <= promotion.end_date and promotion.usage_count < promotion.usage_limit
+        return is_valid
+
+    @staticmethod
+    def consume_usage(session, promo_id: str, now: datetime = None) -> bool:
+        """Atomically count one use of a promotion if it is active and under its limit"""
+        now = now or datetime.now()
+        promotions = Promotion.__table__
+        result = session.execute(
+            update(promotions)
+            .where(
+                promotions.c.promo_id == promo_id,
+                promotions.c.usage_count < promotions.c.usage_limit,
+                promotions.c.start_date <= now,
+                promotions.c.end_date >= now
+            )
+            .values(usage_count=promotions.c.usage_count + 1)
+        )
+        return result.rowcount == 1
+
+    @staticmethod
+    def calculate_discounted_price(original_price: float, discount_percentage: float, max_discount: float = None) -> float:
+        discounted_price = original_price * (1 - discount_percentage / 100)
+        # max_discount caps the amount taken off, not the resulting price
+        if max_discount is not None:
+            discounted_price = max(discounted_price, original_price - max_discount)
+        return discounted_price
+
+    @staticmethod
+    def apply_discount(session, promo_id: str, original_price: float) -> float:
+        # The conditional UPDATE both checks validity and counts the use, so
+        # concurrent redemptions can't overshoot usage_limit
+        if not Promotion.consume_usage(session, promo_id):
+            session.rollback()
+            if not session.get(Promotion, promo_id):
+                raise ValueError(f"No promotion found with ID: {promo_id}")
+            raise ValueError(f"Promotion {promo_id} is not valid or has expired.")
+
+        promotion = session.get(Promotion, promo_id)
+        # Special promotions stack their extra bonus on top, as the promo code index does
+        extra_bonus = session.execute(
+            select(Special_promotion.__table__.c.extra_bonus)
+            .where(Special_promotion.__table__.c.promo_id == promo_id)
+        ).scalar()
+        discount_percentage = (promotion.discount_percentage or 0.0) + (extra_bonus or 0.0)
+        max_discount = promotion.max_discount
+        session.commit()
+
+        return Promotion.calculate_discounted_price(original_price, discount_percentage, max_discount)
+
+    @staticmethod
+    def extend_promotion(session, promo_id: str, new_end_date: datetime):
+        promotion = session.query(Promotion).filter_by(promo_id=promo_id).first()
+        if not promotion:
+            raise ValueError(f"No promotion found with ID: {promo_id}")
+
+        if new_end_date > promotion.end_date:
+            promotion.end_date = new_end_date
+            session.commit()
+            print(f"Promotion {promo_id} has been extended to {new_end_date.strftime('%Y-%m-%d')}.")
+        else:
+            raise ValueError("The new date must be after the current end date.")
+
+    @staticmethod
+    def get_promotion_info(session, promo_id: str) -> str:
+        promotion = session.query(Promotion).filter_by(promo_id=promo_id).first()
+        if not promotion:
+            raise ValueError(f"No promotion found with ID: {promo_id}")
+
+        # Check if the promotion is valid at the moment
+        promo_validity = 'Active' if Promotion.check_promotion_validity(session, promo_id) else 'Expired'
+        
+        return (f"Promo ID: {promotion.promo_id}\n"
+                f"Description: {promotion.description}\n"
+                f"Discount: {promotion.discount_percentage}% (Max: {promotion.max_discount})\n"
+                f"Min Purchase: {promotion.min_purchase}\n"
+                f"Promo Code: {promotion.promo_code}\n"
+                f"Usage Limit: {promotion.usage_limit}, Usage Count: {promotion.usage_count}\n"
+                f"Start Date: {promotion.start_date.strftime('%Y-%m-%d')}\n"
+                f"End Date: {promotion.end_date.strftime('%Y-%m-%d')}\n"
+                f"Status: {promo_validity}")
+
+
+# Promotions running during a range of days (fare calendar). Declared outside the
+# class so the joined Special_promotion table does not inherit it
+Index('ix_promotions_end_start', Promotion.end_date, Promotion.start_date)
+
+
+class Special_promotion(Promotion):
+    __tablename__ = 'special_promotions'
+
+    # Foreign key to the parent Promotion table
+    promo_id = Column(String, ForeignKey('promotions.promo_id'), primary_key=True)
+    extra_bonus = Column(Float, nullable=False)  # Additional attribute for Special_promotion
+
+    def __init__(self, promo_id: str, description: str, discount_percentage: float, start_date: datetime, 
+                 end_date: datetime, promo_code: str, min_purchase: float, max_discount: float, 
+                 usage_limit: int, extra_bonus: float):
+        super().__init__(promo_id, description, discount_percentage, start_date, end_date, promo_code, 
+                         min_purchase, max_discount, usage_limit)
+        self.extra_bonus = extra_bonus
+
+    def apply_discount(self, original_price: float) -> float:
+        # Apply both discount and extra bonus; max_discount caps the amount taken off
+        return Promotion.calculate_discounted_price(
+            original_price, self.discount_percentage + self.extra_bonus, self.max_discount
+        )
+
+    def promotion_information(self) -> str:
+        # Include base promotion info and extra bonus
+        base_information = super().promotion_information()
+        return base_information + f" Extra Bonus: {self.extra_bonus}%"
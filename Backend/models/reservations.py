@@ -0,0 +1,374 @@
+"""Reservations and what hangs off them: tickets, payments, booking agents"""
+from datetime import datetime, timedelta
+from enum import Enum
+from typing import Optional
+
+from sqlalchemy import Boolean, Column, DateTime, Float, ForeignKey, Index, Integer, String, update
+from sqlalchemy.orm import column_property, object_session, relationship
+
+from database import Base
+
+
+class ReservationStatus(Enum):
+    pending = "Pending" 
+    confirmed = "Confirmed"
+    canceled = "Canceled" 
+
+
+class Reservation(Base):
+    __tablename__ = 'reservations'
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    passenger_id = Column(Integer, ForeignKey('passengers.id'), index=True)
+    # Old values are loaded on change so the occupancy counters know what to move
+    flight_id = column_property(Column(Integer, ForeignKey('flights.id'), index=True), active_history=True)
+    seat_number = Column(String)
+    status = column_property(Column(String, default="Pending"), active_history=True)
+    final_price = Column(Float)
+    created_at = Column(DateTime, default=datetime.now)
+
+    # Relationships
+    flight = relationship("Flight", back_populates="reservations")
+    passenger = relationship("Passenger", back_populates="reservations")
+    tickets = relationship("Ticket", back_populates="reservation", cascade="all, delete-orphan")
+    payments = relationship("Payment", back_populates="reservation", cascade="all, delete-orphan")
+    booking_agent_id = Column(String, ForeignKey('booking_agents.agent_id'), nullable=True)
+    booking_agent = relationship("BookingAgent", back_populates="managed_reservations")
+
+
+    def __init__(self, passenger: "Passenger", flight: "Flight", seat_number: str, status: str = "Pending"):
+
+        self.passenger = passenger
+        self.flight = flight
+        self.seat_number = seat_number
+        self.status = status
+        self.final_price = 0.0
+
+    def confirm(self):
+        """Confirm the reservation (flight counters follow on flush)"""
+        if self.status == "Pending":
+            self.status = "Confirmed"
+            return True
+        return False
+
+    def cancel(self):
+        """Cancel the reservation, put its seat back on sale and queue refunds of its payments.
+
+        The caller commits; the occupancy counters and available_seats follow on flush.
+        """
+        if self.status != "Canceled":
+            self.status = "Canceled"
+            session = object_session(self)
+            if session is not None and self.flight_id is not None:
+                self._free_seat(session)
+            for payment in self.payments:
+                payment.refund()
+            return True
+        return False
+
+    def _free_seat(self, session):
+        """Release the seat the way seat holds do, so the fare calendar sees it"""
+        from models.fares import refresh_fare_calendar  # models.fares imports this module
+        from models.flights import Seat
+
+        session.execute(
+            update(Seat)
+            .where(Seat.flight_id == self.flight_id, Seat.seat_number == self.seat_number, Seat.is_available == False)
+            .values(is_available=True, reservation_time=None)
+            .execution_options(synchronize_session=False)
+        )
+        refresh_fare_calendar(session.connection(), [self.flight_id])
+
+    def calculate_duration(self) -> timedelta:
+        """Calculate flight duration"""
+        return self.flight.arrival_time - self.flight.departure_time
+
+    def add_ticket(self, ticket: "Ticket"):
+        """Add a ticket to the reservation"""
+        if ticket not in self.tickets:
+            self.tickets.append(ticket)
+            self.final_price += ticket.price
+            ticket.reservation = self
+
+
+class Ticket(Base):
+    __tablename__ = 'tickets'
+
+    ticket_number = Column(Integer, primary_key=True, autoincrement=True)
+    passenger_id = Column(Integer, ForeignKey('passengers.id'), index=True)
+    flight_id = Column(Integer, ForeignKey('flights.id'))
+    seat_number = Column(String)
+    ticket_class = Column(String)
+    status = Column(String)
+    issue_date = Column(DateTime)
+    expiration_date = Column(DateTime)
+    base_price = Column(Float)
+    final_price = Column(Float)
+    
+    # Foreign key reference to Reservation
+    reservation_id = Column(Integer, ForeignKey('reservations.id'), index=True)
+
+    # Relationship to Reservation (one ticket belongs to one reservation)
+    reservation = relationship("Reservation", back_populates="tickets")
+
+    base_prices = {
+        "first": 6000.0,
+        "business": 3000.0,
+        "premium economy": 2000.0,
+        "economy": 1000.0,
+    }
+    # Classes whose tickets, and the payments for them, can be refunded
+    refundable_classes = {"first"}
+
+    def __init__(self, passenger: "Passenger", flight: "Flight", seat_number: str, 
+                 ticket_class: str, reservation: "Reservation" = None,
+                 is_changeable: Optional[bool] = None, 
+                 is_refundable: Optional[bool] = None,
+                 promotion: Optional["Promotion"] = None):
+        
+        ticket_class = ticket_class.strip().lower()
+        if ticket_class not in Ticket.base_prices:
+            raise ValueError(f"Invalid ticket class: {ticket_class}. Must be one of {list(Ticket.base_prices.keys())}")
+        
+        self.passenger = passenger
+        self.flight = flight
+        self.seat_number = seat_number
+        self.ticket_class = ticket_class
+        self.status = "active"
+        self.issue_date = datetime.now()
+        self.promotion = promotion
+        self.expiration_date = None
+        self.base_price = Ticket.base_prices[ticket_class]
+        self.final_price = self.get_final_price()
+        self.reservation = reservation
+
+        self.is_changeable = is_changeable if is_changeable is not None else self.ticket_class in {"first", "business"}
+        self.is_refundable = is_refundable if is_refundable is not None else self.ticket_class in Ticket.refundable_classes
+
+        # Add the ticket to the latest reservation if available
+        if reservation is None:
+            latest_reservation = self.passenger.get_latest_reservation()
+            if latest_reservation:
+                latest_reservation.add_ticket(self)
+
+    def get_ticket_number(self):
+        return self.ticket_number  # Use auto-generated ticket_number
+
+    def issue_ticket(self):
+        self.expiration_date = self.issue_date.replace(year=self.issue_date.year + 1)
+
+    def cancel_ticket(self):
+        if self.is_refundable:
+            self.status = "canceled"
+            return "The Ticket was canceled and your money was refunded"
+        else:
+            return "This ticket is Nonrefundable."
+
+    def change_seat(self, new_seat: str):
+        if self.is_changeable:
+            self.seat_number = new_seat
+            return f"Your Seat changed to {new_seat}."
+        else:
+            return "This ticket is not changeable."
+
+    def is_ticket_valid(self):
+        if self.expiration_date and datetime.now() > self.expiration_date:
+            self.status = "expired"
+            return False
+        return True
+
+    def get_final_price(self):
+        if self.promotion:
+            return self.promotion.apply_discount(self.base_price)
+        return self.base_price
+
+    def set_promotion(self, promotion: "Promotion"):
+        if promotion.is_valid():
+            self.promotion = promotion
+            self.final_price = self.get_final_price()
+
+    @property
+    def price(self):
+        return self.final_price
+
+    def ticket_information(self):
+        promo_information = (f"The added offer: {self.promotion.promo_code} "
+                             f"({self.promotion.discount_percentage}% discount)"
+                             if self.promotion else "There is no discount")
+        
+        return (
+            f"Ticket Number: {self.ticket_number}\n"
+            f"Passenger: {self.passenger}\n"
+            f"Flight: {self.flight.flight_number}\n"
+            f"Seat: {self.seat_number}\n"
+            f"Ticket Class: {self.ticket_class}\n"
+            f"Original Price: {self.base_price}\n"
+            f"Price After Discount: {self.final_price}\n"
+            f"Status: {self.status}\n"
+            f"Issue Date: {self.issue_date}\n"
+            f"Expiration Date: {self.expiration_date if self.expiration_date else 'Not defined'}\n"
+            f"{promo_information}"
+        )
+
+
+class BookingAgent(Base):
+    __tablename__ = 'booking_agents'
+    agent_id = Column("agent_id", String, primary_key=True)
+    name = Column(String)
+    agency = Column(String)
+    contact_number = Column(String)
+    email = Column(String)
+    agency_license_number = Column(String)
+    is_certified = Column(Boolean)
+
+    managed_reservations = relationship("Reservation", back_populates="booking_agent")
+
+    
+    # If managed_reservations is related to a Reservation model, it should be a relationship:
+    # managed_reservations = relationship("Reservation", backref="agent")
+
+    def __init__(self, agent_id: str, name: str, agency: str, contact_number: str, email: str, managed_reservations, agency_license_number: str, is_certified: bool):
+        self.agent_id = agent_id
+        self.name = name
+        self.agency = agency
+        self.contact_number = contact_number
+        self.email = email
+        self.managed_reservations = managed_reservations
+        self.agency_license_number = agency_license_number
+        self.is_certified = is_certified
+
+    # No need for properties on simple fields like agent_id, email, etc.
+    # Directly access them as attributes. If you want logic in setters/getters, then use them.
+    @property
+    def contact_number(self):
+        return self._contact_number
+
+    @contact_number.setter
+    def contact_number(self, value):
+        self._contact_number = value
+
+
+    @property
+    def email(self):
+        return self.email
+
+    @email.setter
+    def email(self, new_email):
+        self.email = new_email
+
+    @property
+    def agency_license_number(self):
+        return self.agency_license_number
+
+    @property
+    def is_certified(self):
+        return self.is_certified
+
+    def certify_agent(self):
+        self.is_certified = True
+        self.certified_date = datetime.now()  # Log certification date
+
+    def _generate_reservation_id(self) -> str:
+        return f"reservation-{len(self.managed_reservations) + 1}"
+
+    def create_reservation(self, flight, passenger, seat_number, meal_preference=None):
+        reservation_id = self._generate_reservation_id()
+        new_reservation = Reservation(
+            reservation_id=reservation_id,
+            flight=flight,
+            passenger=passenger,
+            seat_number=seat_number,
+            booking_date=datetime.today(),
+            is_confirmed=False,
+            travel_class=seat_number.class_type,
+            special_requests=[],
+            meal_preference=meal_preference,
+            luggage=[]
+        )
+        self.managed_reservations.append(new_reservation)
+        passenger.add_reservation(new_reservation)
+        print(f"Reservation {reservation_id} created by agent {self.name}.")
+        return new_reservation
+
+    def cancel_reservation(self, reservation: 'Reservation'):
+        if reservation in self.managed_reservations:
+            self.managed_reservations.remove(reservation)
+            reservation.passenger.cancel_reservation(reservation)
+            print(f"Reservation {reservation.reservation_id} canceled by agent {self.name}.")
+        else:
+            print("Reservation not found.")
+
+    def find_flights(self, departure, destination, date):
+        # Here you should query the database or other service for available flights
+        available_flights = []  # Replace with actual search logic
+        print(f"Searching for flights from {departure} to {destination} on {date}.")
+        return available_flights
+
+
+class Payment(Base):
+    __tablename__ = 'payments'
+
+    payment_id = Column(String, primary_key=True)
+    amount = Column(Float)
+    method = Column(String)
+    status = Column(String)
+    reservation_id = Column(Integer, ForeignKey('reservations.id'), index=True)
+    payment_date = Column(DateTime)
+    transaction_id = Column(String)
+    currency = Column(String, ForeignKey('currencies.currency_code'))
+    is_refundable = Column(Boolean)
+
+    reservation = relationship("Reservation", back_populates="payments")
+
+    def __init__(self, payment_id, amount, method, status, payment_date, transaction_id, currency, is_refundable, reservation_id=None):
+        self.payment_id = payment_id
+        self.amount = amount
+        self.method = method
+        self.status = status
+        self.payment_date = payment_date
+        self.transaction_id = transaction_id
+        self.currency = currency
+        self.is_refundable = is_refundable
+        self.reservation_id = reservation_id
+
+    def process_payment(self) -> bool:
+        if self.status == "pending":
+            self.status = "completed"
+            print(f"Payment {self.payment_id} processed successfully")
+            return True
+        elif self.status == "completed":
+            print(f"Payment {self.payment_id} has already been processed successfully")
+            return False
+        else:
+            print(f"Payment {self.payment_id} could not be processed")
+            return False
+
+    def refund(self) -> bool:
+        """Queue a refund with the payment worker, like POST /payments/{id}/refund; the caller commits"""
+        from payment_queue import enqueue  # payment_queue imports the models
+
+        if self.is_refundable and self.status == "completed":
+            self.status = "refund_pending"
+            enqueue(object_session(self), self.payment_id, "refund")
+            print(f"Payment {self.payment_id} refund queued")
+            return True
+        print(f"Payment {self.payment_id} is not refundable.")
+        return False
+
+
+class PaymentJob(Base):
+    """Queued gateway work for a payment (charge or refund); see payment_queue.py"""
+    __tablename__ = 'payment_jobs'
+    __table_args__ = (Index('ix_payment_jobs_state_available', 'state', 'available_at'),)
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    payment_id = Column(String, ForeignKey('payments.payment_id'), nullable=False, index=True)
+    operation = Column(String, nullable=False)            # "charge" or "refund"
+    state = Column(String, nullable=False, default="queued")  # queued, processing, done, failed
+    attempts = Column(Integer, nullable=False, default=0)
+    available_at = Column(DateTime, nullable=False)       # not picked up before this (retry backoff)
+    locked_by = Column(String)
+    locked_at = Column(DateTime)
+    last_error = Column(String)
+    created_at = Column(DateTime, nullable=False, default=datetime.now)
+    updated_at = Column(DateTime)
@@ -0,0 +1,19 @@
+"""Session helpers used by the model classes' own static methods"""
+from sqlalchemy.orm import sessionmaker
+
+from database import Base, engine
+
+SessionFactory = sessionmaker(bind=engine, autoflush=False)
+
+
+def get_session():
+    """Create and return a new database session"""
+    return SessionFactory()
+
+
+# Initialize the database (create tables for all Base subclasses)
+def init_db():
+    """
+    Import all ORM models before calling this, then run to create tables .
+    """
+    Base.metadata.create_all(bind=engine)
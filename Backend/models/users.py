@@ -0,0 +1,69 @@
+"""Application login accounts"""
+import binascii
+import hashlib
+import secrets
+
+from sqlalchemy import Boolean, Column, Integer, String
+from sqlalchemy.orm import Session, relationship
+
+from database import Base
+from profiling import span
+
+
+class User(Base):
+    __tablename__ = 'users'
+    
+    id = Column(Integer, primary_key=True, index=True)  
+    username = Column(String, unique=True, index=True)  
+    email = Column(String, unique=True, index=True)
+    salt = Column(String)
+    hashed_password = Column(String)
+    is_active = Column(Boolean, default=True)
+    # is_admin = Column(Boolean, default=False, nullable=False)
+
+    flights = relationship("Flight", back_populates="user")
+
+    def __init__(self, username: str, email: str, password: str = None, hashed_password: str = None, salt: str = None):
+        self.username = username
+        self.email = email
+        self.is_active = True
+        
+        # Handle both plain password and pre-hashed password cases
+        if password:
+            self.hashed_password, self.salt = self.hash_password(password)
+        elif hashed_password and salt:
+            self.hashed_password = hashed_password
+            self.salt = salt
+        else:
+            raise ValueError("Either password or hashed_password with salt must be provided")
+    @staticmethod
+    def authenticate(db: Session, username: str, password: str):
+        user = db.query(User).filter(User.username == username).first()
+        if not user or not user.verify_password(password):
+            return None
+        return user
+
+    @staticmethod
+    def hash_password(password: str, salt: str = None) -> tuple[str, str]:
+        """Hash password with salt using PBKDF2"""
+        salt = salt or secrets.token_hex(16)
+        with span("hash"):
+            dk = hashlib.pbkdf2_hmac(
+                'sha256',
+                password.encode('utf-8'),
+                salt.encode('utf-8'),
+                10  # hashing iterations, originally 100000
+            )
+        hashed = binascii.hexlify(dk).decode()
+        return hashed, salt
+
+    def verify_password(self, password: str) -> bool:
+        """Verify password against stored hash"""
+        with span("hash"):
+            new_hash = hashlib.pbkdf2_hmac(
+                'sha256',
+                password.encode('utf-8'),
+                self.salt.encode('utf-8'),
+                10
+            ).hex()
+        return secrets.compare_digest(new_hash, self.hashed_password)
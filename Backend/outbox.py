@@ -0,0 +1,189 @@
+"""Delivery of outbox events to consumers.
+
+Events are read in id order in batches. Each consumer has a committed offset
+in ``outbox_offsets``, which only moves after the consumer has handled the
+batch, so delivery is at-least-once: a consumer that fails or a process that
+dies gets the same events again from its last offset. Handlers should be
+idempotent on the event id.
+
+In-process consumers register with ``outbox_dispatcher.subscribe``; external
+ones tail ``GET /events/{topic}?after=<offset>`` and keep the offset
+themselves.
+
+The dispatcher thread (started in the app lifespan, subscribers or not) also
+prunes delivered events past OUTBOX_RETENTION_DAYS every
+OUTBOX_PRUNE_SECONDS.
+"""
+import json
+import os
+import threading
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional
+
+from sqlalchemy import delete, func, insert, select, update
+
+from database import SessionLocal
+from models.outbox import OutboxEvent, OutboxOffset
+
+BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", "500"))
+POLL_SECONDS = float(os.getenv("OUTBOX_POLL_SECONDS", "0.5"))
+RETENTION = timedelta(days=int(os.getenv("OUTBOX_RETENTION_DAYS", "7")))
+PRUNE_INTERVAL = timedelta(seconds=float(os.getenv("OUTBOX_PRUNE_SECONDS", "3600")))
+
+
+@dataclass(frozen=True)
+class Event:
+    id: int
+    topic: str
+    event_type: str
+    aggregate_id: str
+    payload: dict
+    created_at: datetime
+
+
+def read_events(session, after: int = 0, limit: int = BATCH_SIZE, topic: str = None) -> List[Event]:
+    """Events with id > ``after``, oldest first.
+
+    Offsets can't skip a late-committing event because SQLite has a single
+    writer: ids become visible in the order they were assigned.
+    """
+    query = select(OutboxEvent).where(OutboxEvent.id > after).order_by(OutboxEvent.id).limit(limit)
+    if topic:
+        query = query.where(OutboxEvent.topic == topic)
+    return [
+        Event(row.id, row.topic, row.event_type, row.aggregate_id, json.loads(row.payload), row.created_at)
+        for row in session.execute(query).scalars()
+    ]
+
+
+def load_offset(session, consumer: str) -> int:
+    offset = session.get(OutboxOffset, consumer)
+    return offset.last_event_id if offset else 0
+
+
+def commit_offset(session, consumer: str, last_event_id: int):
+    """Move the consumer's offset forward (never backward) and commit"""
+    now = datetime.now()
+    moved = session.execute(
+        update(OutboxOffset)
+        .where(OutboxOffset.consumer == consumer, OutboxOffset.last_event_id < last_event_id)
+        .values(last_event_id=last_event_id, updated_at=now)
+    ).rowcount
+    if not moved and session.get(OutboxOffset, consumer) is None:
+        session.execute(insert(OutboxOffset).values(consumer=consumer, last_event_id=last_event_id, updated_at=now))
+    session.commit()
+
+
+def prune(session, now: datetime = None) -> int:
+    """Delete events older than the retention that every registered consumer has passed.
+
+    With no registered consumer the retention alone decides: external
+    consumers keep their offsets themselves and must read within it.
+    """
+    now = now or datetime.now()
+    expired = delete(OutboxEvent).where(OutboxEvent.created_at < now - RETENTION)
+    lowest = session.execute(select(func.min(OutboxOffset.last_event_id))).scalar()
+    if lowest is not None:
+        expired = expired.where(OutboxEvent.id <= lowest)
+    pruned = session.execute(expired).rowcount
+    session.commit()
+    return pruned
+
+
+@dataclass
+class Subscription:
+    consumer: str
+    handler: Callable[[List[Event]], None]
+    topic: Optional[str] = None
+    failures: int = 0
+    last_error: Optional[str] = None
+
+
+class OutboxDispatcher:
+    def __init__(self, session_factory: Callable = SessionLocal, batch_size: int = BATCH_SIZE):
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+        self.subscriptions: Dict[str, Subscription] = {}
+        self.last_prune: Optional[datetime] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = threading.Event()
+
+    def subscribe(self, consumer: str, handler: Callable[[List[Event]], None], topic: str = None):
+        """Register a handler that receives batches of events; ``consumer`` names its offset"""
+        self.subscriptions[consumer] = Subscription(consumer, handler, topic)
+
+    def dispatch_once(self) -> int:
+        """Deliver at most one batch to each subscriber; returns events delivered"""
+        delivered = 0
+        session = self.session_factory()
+        try:
+            for subscription in list(self.subscriptions.values()):
+                offset = load_offset(session, subscription.consumer)
+                events = read_events(session, offset, self.batch_size, subscription.topic)
+                session.rollback()  # don't hold a read transaction open while the handler runs
+                if not events:
+                    continue
+                try:
+                    subscription.handler(events)
+                except Exception as e:
+                    subscription.failures += 1
+                    subscription.last_error = f"{type(e).__name__}: {e}"
+                    continue  # offset unchanged: the same batch comes again next round
+                subscription.failures = 0
+                subscription.last_error = None
+                commit_offset(session, subscription.consumer, events[-1].id)
+                delivered += len(events)
+        finally:
+            session.close()
+        return delivered
+
+    def drain(self, max_rounds: int = 1000) -> int:
+        delivered = 0
+        for _ in range(max_rounds):
+            batch = self.dispatch_once()
+            if not batch:
+                break
+            delivered += batch
+        return delivered
+
+    def prune_if_due(self, now: datetime = None) -> int:
+        """Prune at most once per PRUNE_INTERVAL; returns events deleted"""
+        now = now or datetime.now()
+        if self.last_prune is not None and now - self.last_prune < PRUNE_INTERVAL:
+            return 0
+        self.last_prune = now
+        session = self.session_factory()
+        try:
+            return prune(session, now)
+        finally:
+            session.close()
+
+    def _run(self):
+        while not self._stopping.is_set():
+            delivered = 0
+            try:
+                if self.subscriptions:
+                    delivered = self.dispatch_once()
+                self.prune_if_due()
+            except Exception as e:
+                print(f"Outbox dispatcher error: {e}")
+            if not delivered:
+                self._stopping.wait(POLL_SECONDS)
+
+    def start(self):
+        """Start the delivery and pruning thread (idempotent)"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name="outbox-dispatcher", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 10):
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+
+outbox_dispatcher = OutboxDispatcher()
@@ -0,0 +1,294 @@
+"""Asynchronous payment processing.
+
+``create_payment`` only writes the payment (status "pending") and a
+``payment_jobs`` row in one transaction, then returns. A worker pool picks
+jobs up and talks to the payment gateway off the request path:
+
+* jobs are claimed in batches with one ``UPDATE ... RETURNING``, so several
+  processes can share the queue without handing out a job twice;
+* gateway calls of a batch run concurrently on a thread pool;
+* the resulting payment and job state changes are written back with one
+  executemany UPDATE per table for the whole batch;
+* retryable gateway errors are retried with exponential backoff, up to
+  MAX_ATTEMPTS; jobs left "processing" by a crashed worker are re-queued
+  once their lease runs out.
+
+The gateway is pluggable: PAYMENT_GATEWAY is "fake" (the default, for local
+runs and tests) or a "module:Class" path to an implementation of
+``PaymentGateway``.
+"""
+from abc import ABC, abstractmethod
+import importlib
+import os
+import random
+import secrets
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Callable, List, Optional
+
+from sqlalchemy import bindparam, insert, select, update
+
+from database import SessionLocal
+from models import Payment, PaymentJob
+
+PAYMENT_WORKERS = int(os.getenv("PAYMENT_WORKERS", "8"))
+BATCH_SIZE = int(os.getenv("PAYMENT_BATCH_SIZE", "50"))
+POLL_SECONDS = float(os.getenv("PAYMENT_POLL_SECONDS", "0.2"))
+MAX_ATTEMPTS = 5
+RETRY_BASE_SECONDS = 2
+LEASE = timedelta(minutes=5)
+
+
+@dataclass
+class GatewayResult:
+    success: bool
+    transaction_id: Optional[str] = None
+    error: Optional[str] = None
+    retryable: bool = False
+
+
+class PaymentGateway(ABC):
+    """What the queue needs from a payment provider"""
+
+    @abstractmethod
+    def charge(self, payment_id: str, amount: float, currency: str, method: str) -> GatewayResult:
+        pass
+
+    @abstractmethod
+    def refund(self, payment_id: str, transaction_id: str, amount: float, currency: str) -> GatewayResult:
+        pass
+
+
+class FakeGateway(PaymentGateway):
+    """Local stand-in: optional latency, random declines and transient errors"""
+
+    def __init__(self, latency: float = 0.0, decline_rate: float = 0.0, error_rate: float = 0.0, seed: int = None):
+        self.latency = latency
+        self.decline_rate = decline_rate
+        self.error_rate = error_rate
+        self.rng = random.Random(seed)
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def _outcome(self) -> GatewayResult:
+        if self.latency:
+            time.sleep(self.latency)
+        with self._lock:
+            self.calls += 1
+            roll = self.rng.random()
+        if roll < self.error_rate:
+            return GatewayResult(False, error="Gateway timeout", retryable=True)
+        if roll < self.error_rate + self.decline_rate:
+            return GatewayResult(False, error="Card declined")
+        return GatewayResult(True, transaction_id=f"TXN{secrets.token_hex(8).upper()}")
+
+    def charge(self, payment_id, amount, currency, method):
+        return self._outcome()
+
+    def refund(self, payment_id, transaction_id, amount, currency):
+        return self._outcome()
+
+
+def load_gateway(spec: str = None) -> PaymentGateway:
+    spec = spec or os.getenv("PAYMENT_GATEWAY", "fake")
+    if spec == "fake":
+        return FakeGateway(latency=float(os.getenv("FAKE_GATEWAY_LATENCY", "0")))
+    module_name, _, class_name = spec.partition(":")
+    return getattr(importlib.import_module(module_name), class_name)()
+
+
+def new_payment_id() -> str:
+    return f"PAY{secrets.token_hex(8).upper()}"
+
+
+def enqueue(session, payment_id: str, operation: str, now: datetime = None):
+    """Add a job for the payment; the caller commits it together with the payment change"""
+    now = now or datetime.now()
+    session.execute(insert(PaymentJob).values(
+        payment_id=payment_id, operation=operation, state="queued", attempts=0,
+        available_at=now, created_at=now, updated_at=now
+    ))
+
+
+def payment_status(session, payment_id: str) -> Optional[dict]:
+    """Payment status plus the state of its latest job, for polling clients"""
+    payment = session.get(Payment, payment_id)
+    if payment is None:
+        return None
+    job = session.execute(
+        select(PaymentJob).where(PaymentJob.payment_id == payment_id).order_by(PaymentJob.id.desc()).limit(1)
+    ).scalar_one_or_none()
+    return {
+        "payment_id": payment.payment_id,
+        "status": payment.status,
+        "transaction_id": payment.transaction_id,
+        "payment_date": payment.payment_date,
+        "job_state": job.state if job else None,
+        "attempts": job.attempts if job else 0,
+        "last_error": job.last_error if job else None,
+    }
+
+
+# Payment status for each (operation, outcome)
+_FINAL_STATUS = {
+    ("charge", True): "completed",
+    ("charge", False): "failed",
+    ("refund", True): "refunded",
+    ("refund", False): "completed",  # refund refused: the charge stands
+}
+
+
+class PaymentWorkerPool:
+    def __init__(self, session_factory: Callable = SessionLocal, gateway: PaymentGateway = None,
+                 workers: int = PAYMENT_WORKERS, batch_size: int = BATCH_SIZE,
+                 clock: Callable[[], datetime] = datetime.now):
+        self.session_factory = session_factory
+        self.gateway = gateway
+        self.workers = workers
+        self.batch_size = batch_size
+        self.clock = clock
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{id(self):x}"
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = threading.Event()
+
+    def _claim(self, session, now: datetime) -> List:
+        jobs = PaymentJob.__table__
+        # Re-queue jobs whose worker died mid-batch
+        session.execute(
+            update(jobs).where(jobs.c.state == "processing", jobs.c.locked_at < now - LEASE)
+            .values(state="queued", locked_by=None, locked_at=None, updated_at=now)
+        )
+        due = (
+            select(jobs.c.id)
+            .where(jobs.c.state == "queued", jobs.c.available_at <= now)
+            .order_by(jobs.c.available_at, jobs.c.id)
+            .limit(self.batch_size)
+            .scalar_subquery()
+        )
+        claimed = session.execute(
+            update(jobs).where(jobs.c.id.in_(due), jobs.c.state == "queued")
+            .values(state="processing", locked_by=self.worker_id, locked_at=now,
+                    attempts=jobs.c.attempts + 1, updated_at=now)
+            .returning(jobs.c.id, jobs.c.payment_id, jobs.c.operation, jobs.c.attempts)
+        ).all()
+        session.commit()
+        return claimed
+
+    def _call_gateway(self, job, payment) -> GatewayResult:
+        try:
+            if job.operation == "refund":
+                return self.gateway.refund(payment.payment_id, payment.transaction_id, payment.amount, payment.currency)
+            return self.gateway.charge(payment.payment_id, payment.amount, payment.currency, payment.method)
+        except Exception as e:
+            return GatewayResult(False, error=f"{type(e).__name__}: {e}", retryable=True)
+
+    def process_batch(self) -> int:
+        """Claim one batch, run it through the gateway and record the outcome; returns jobs handled"""
+        if self.gateway is None:
+            self.gateway = load_gateway()
+        session = self.session_factory()
+        try:
+            claimed = self._claim(session, self.clock())
+            if not claimed:
+                return 0
+            payments = {
+                row.payment_id: row for row in session.execute(
+                    select(Payment.payment_id, Payment.amount, Payment.currency, Payment.method, Payment.transaction_id)
+                    .where(Payment.payment_id.in_({job.payment_id for job in claimed}))
+                )
+            }
+            executor = self._executor or ThreadPoolExecutor(self.workers)
+            try:
+                results = list(executor.map(
+                    lambda job: self._call_gateway(job, payments[job.payment_id]) if job.payment_id in payments
+                    else GatewayResult(False, error="Payment not found"),
+                    claimed
+                ))
+            finally:
+                if executor is not self._executor:
+                    executor.shutdown()
+            self._record(session, claimed, results)
+            return len(claimed)
+        finally:
+            session.close()
+
+    def _record(self, session, claimed, results: List[GatewayResult]):
+        now = self.clock()
+        job_updates, payment_updates = [], []
+        for job, result in zip(claimed, results):
+            if not result.success and result.retryable and job.attempts < MAX_ATTEMPTS:
+                retry_at = now + timedelta(seconds=RETRY_BASE_SECONDS * 2 ** (job.attempts - 1))
+                job_updates.append({"job_id": job.id, "new_state": "queued", "retry_at": retry_at,
+                                    "error": result.error})
+                continue
+            job_updates.append({"job_id": job.id, "new_state": "done" if result.success else "failed",
+                                "retry_at": now, "error": result.error})
+            update_row = {"key": job.payment_id, "new_status": _FINAL_STATUS[(job.operation, result.success)]}
+            if job.operation == "charge" and result.success:
+                # Only a successful charge is a payment date; declines and refunds keep it as is
+                update_row.update(transaction=result.transaction_id, paid_at=now)
+            payment_updates.append(update_row)
+
+        jobs = PaymentJob.__table__
+        payments = Payment.__table__
+        session.execute(
+            update(jobs).where(jobs.c.id == bindparam("job_id"))
+            .values(state=bindparam("new_state"), available_at=bindparam("retry_at"),
+                    last_error=bindparam("error"), locked_by=None, locked_at=None, updated_at=now),
+            job_updates
+        )
+        # executemany needs one statement shape, so successful charges (transaction id, date) go separately
+        for with_transaction in (True, False):
+            rows = [row for row in payment_updates if ("transaction" in row) == with_transaction]
+            if not rows:
+                continue
+            values = {"status": bindparam("new_status")}
+            if with_transaction:
+                values.update(transaction_id=bindparam("transaction"), payment_date=bindparam("paid_at"))
+            session.execute(update(payments).where(payments.c.payment_id == bindparam("key")).values(**values), rows)
+        session.commit()
+
+    def drain(self, max_batches: int = 1000) -> int:
+        """Process until nothing is due (tests and one-off runs)"""
+        handled = 0
+        for _ in range(max_batches):
+            batch = self.process_batch()
+            if not batch:
+                break
+            handled += batch
+        return handled
+
+    def _run(self):
+        while not self._stopping.is_set():
+            try:
+                handled = self.process_batch()
+            except Exception as e:
+                print(f"Payment worker error: {e}")
+                handled = 0
+            if not handled:
+                self._stopping.wait(POLL_SECONDS)
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stopping.clear()
+        self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix="payment-gateway")
+        self._thread = threading.Thread(target=self._run, name="payment-queue", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 10):
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+
+payment_workers = PaymentWorkerPool()
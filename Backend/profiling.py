@@ -0,0 +1,357 @@
+"""Opt-in request profiling for the FastAPI app.
+
+Enabled with PROFILING=1. For every request it records wall time, number of
+SQL statements and time spent in the database (SQLAlchemy cursor events),
+response serialization time and password hashing time, and:
+
+* returns them to the client as a ``Server-Timing`` header,
+* aggregates them per route into latency histograms served at /debug/metrics,
+* optionally runs a sample of requests under a profiler and dumps the profile
+  of the ones slower than a threshold.
+
+Settings (environment):
+    PROFILING=1                    turn the whole thing on
+    PROFILING_SAMPLE_RATE=0.05     fraction of requests run under a profiler
+    PROFILING_SLOW_MS=500          dump sampled profiles slower than this
+    PROFILING_DUMP_DIR=profiles    where .prof / .html dumps go
+    PROFILING_PROFILER=cprofile    or "pyinstrument" if it is installed
+
+When disabled, ``span`` is the only thing other modules touch and it costs one
+context variable lookup.
+"""
+import functools
+import inspect
+import os
+import random
+import re
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Dict, Optional
+
+PROFILING_ENABLED = os.getenv("PROFILING", "0") == "1"
+SAMPLE_RATE = float(os.getenv("PROFILING_SAMPLE_RATE", "0"))
+SLOW_REQUEST_MS = float(os.getenv("PROFILING_SLOW_MS", "500"))
+DUMP_DIR = os.getenv("PROFILING_DUMP_DIR", "profiles")
+PROFILER = os.getenv("PROFILING_PROFILER", "cprofile")
+
+# Upper bounds (ms) of the latency histogram buckets; the last bucket is open
+BUCKETS_MS = (1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+_current: ContextVar[Optional["RequestProfile"]] = ContextVar("request_profile", default=None)
+
+
+class RequestProfile:
+    """Timings collected for one request"""
+
+    def __init__(self, sampler=None):
+        self.started = time.perf_counter()
+        self.db_queries = 0
+        self.db_ms = 0.0
+        self.spans: Dict[str, float] = {}
+        self.sampler = sampler
+        self.endpoint_done: Optional[float] = None  # perf_counter when the endpoint returned
+        self._lock = threading.Lock()
+
+    def add_span(self, name: str, elapsed_ms: float):
+        with self._lock:
+            self.spans[name] = self.spans.get(name, 0.0) + elapsed_ms
+
+    def add_query(self, elapsed_ms: float):
+        with self._lock:
+            self.db_queries += 1
+            self.db_ms += elapsed_ms
+
+    def elapsed_ms(self) -> float:
+        return (time.perf_counter() - self.started) * 1000
+
+    def server_timing(self, total_ms: float) -> str:
+        parts = [f"app;dur={total_ms:.2f}", f'db;dur={self.db_ms:.2f};desc="{self.db_queries} queries"']
+        parts.extend(f"{name};dur={ms:.2f}" for name, ms in self.spans.items())
+        return ", ".join(parts)
+
+
+@contextmanager
+def span(name: str):
+    """Time a block of work against the current request, if it is being profiled"""
+    profile = _current.get()
+    if profile is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile.add_span(name, (time.perf_counter() - started) * 1000)
+
+
+class RouteStats:
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.db_queries = 0
+        self.db_ms = 0.0
+        self.spans: Dict[str, float] = {}
+        self.buckets = [0] * (len(BUCKETS_MS) + 1)
+
+    def as_dict(self) -> dict:
+        labels = [f"le_{bound}" for bound in BUCKETS_MS] + ["le_inf"]
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "mean_ms": round(self.total_ms / self.count, 3) if self.count else 0.0,
+            "max_ms": round(self.max_ms, 3),
+            "db_queries_per_request": round(self.db_queries / self.count, 2) if self.count else 0.0,
+            "db_ms_per_request": round(self.db_ms / self.count, 3) if self.count else 0.0,
+            "spans_ms_per_request": {
+                name: round(total / self.count, 3) for name, total in self.spans.items()
+            },
+            "histogram_ms": dict(zip(labels, self.buckets)),
+        }
+
+
+class MetricsRegistry:
+    """Per-route aggregates behind /debug/metrics"""
+
+    def __init__(self):
+        self._routes: Dict[str, RouteStats] = {}
+        self._lock = threading.Lock()
+
+    def record(self, route: str, status_code: int, total_ms: float, profile: RequestProfile):
+        with self._lock:
+            stats = self._routes.setdefault(route, RouteStats())
+            stats.count += 1
+            stats.errors += status_code >= 500
+            stats.total_ms += total_ms
+            stats.max_ms = max(stats.max_ms, total_ms)
+            stats.db_queries += profile.db_queries
+            stats.db_ms += profile.db_ms
+            for name, ms in profile.spans.items():
+                stats.spans[name] = stats.spans.get(name, 0.0) + ms
+            stats.buckets[bisect_left(BUCKETS_MS, total_ms)] += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {route: stats.as_dict() for route, stats in sorted(self._routes.items())}
+
+    def reset(self):
+        with self._lock:
+            self._routes.clear()
+
+
+metrics = MetricsRegistry()
+
+
+class _CProfileSampler:
+    def __init__(self):
+        import cProfile
+        self.profiler = cProfile.Profile()
+
+    def run_sync(self, function, /, **kwargs):
+        try:
+            self.profiler.enable()
+        except ValueError:
+            # Another sampled request already profiles (one profiler per process on 3.12+)
+            return function(**kwargs)
+        try:
+            return function(**kwargs)
+        finally:
+            self.profiler.disable()
+
+    async def run_async(self, function, /, **kwargs):
+        try:
+            self.profiler.enable()
+        except ValueError:
+            # Another sampled coroutine already owns the profiler on this thread
+            return await function(**kwargs)
+        try:
+            return await function(**kwargs)
+        finally:
+            self.profiler.disable()
+
+    def dump(self, path: str) -> str:
+        self.profiler.dump_stats(path + ".prof")
+        return path + ".prof"
+
+
+class _PyinstrumentSampler:
+    def __init__(self):
+        from pyinstrument import Profiler
+        self._profiler_class = Profiler
+        self.profiler = None
+
+    def run_sync(self, function, /, **kwargs):
+        self.profiler = self._profiler_class(async_mode="disabled")
+        self.profiler.start()
+        try:
+            return function(**kwargs)
+        finally:
+            self.profiler.stop()
+
+    async def run_async(self, function, /, **kwargs):
+        self.profiler = self._profiler_class(async_mode="enabled")
+        self.profiler.start()
+        try:
+            return await function(**kwargs)
+        finally:
+            self.profiler.stop()
+
+    def dump(self, path: str) -> Optional[str]:
+        if self.profiler is None:
+            return None
+        with open(path + ".html", "w") as f:
+            f.write(self.profiler.output_html())
+        return path + ".html"
+
+
+def _new_sampler():
+    if SAMPLE_RATE <= 0 or random.random() >= SAMPLE_RATE:
+        return None
+    if PROFILER == "pyinstrument":
+        try:
+            return _PyinstrumentSampler()
+        except ImportError:
+            pass
+    return _CProfileSampler()
+
+
+def _dump_profile(profile: RequestProfile, method: str, route: str, total_ms: float):
+    os.makedirs(DUMP_DIR, exist_ok=True)
+    slug = re.sub(r"[^A-Za-z0-9]+", "_", route).strip("_") or "root"
+    stamp = datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+    return profile.sampler.dump(os.path.join(DUMP_DIR, f"{stamp}-{method}-{slug}-{int(total_ms)}ms"))
+
+
+class ProfilingMiddleware:
+    """Pure ASGI middleware; adds Server-Timing and feeds the metrics registry"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        profile = RequestProfile(_new_sampler())
+        token = _current.set(profile)
+        status_code = 500
+
+        async def send_with_timing(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", profile.server_timing(profile.elapsed_ms()).encode()))
+                # Lets the (cross-origin) frontend read Server-Timing in devtools / JS
+                headers.append((b"timing-allow-origin", b"*"))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current.reset(token)
+            total_ms = profile.elapsed_ms()
+            route = getattr(scope.get("route"), "path", None) or "<unmatched>"
+            metrics.record(f"{scope['method']} {route}", status_code, total_ms, profile)
+            if profile.sampler is not None and total_ms >= SLOW_REQUEST_MS:
+                _dump_profile(profile, scope["method"], route, total_ms)
+
+
+def _instrument_engine(engine):
+    from sqlalchemy import event
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("profiling_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info["profiling_started"].pop()
+        profile = _current.get()
+        if profile is not None:
+            profile.add_query((time.perf_counter() - started) * 1000)
+
+
+def _profiled_endpoint(endpoint):
+    """Wrap an endpoint to note when it returned and to run it under the request's sampler.
+
+    functools.wraps keeps the signature FastAPI reads the parameters from. Sync
+    endpoints still run on a worker thread, so the profiler starts there.
+    """
+    if inspect.iscoroutinefunction(endpoint):
+        @functools.wraps(endpoint)
+        async def profiled(**kwargs):
+            profile = _current.get()
+            try:
+                if profile is None or profile.sampler is None:
+                    return await endpoint(**kwargs)
+                return await profile.sampler.run_async(endpoint, **kwargs)
+            finally:
+                if profile is not None:
+                    profile.endpoint_done = time.perf_counter()
+    else:
+        @functools.wraps(endpoint)
+        def profiled(**kwargs):
+            profile = _current.get()
+            try:
+                if profile is None or profile.sampler is None:
+                    return endpoint(**kwargs)
+                return profile.sampler.run_sync(endpoint, **kwargs)
+            finally:
+                if profile is not None:
+                    profile.endpoint_done = time.perf_counter()
+    return profiled
+
+
+@functools.lru_cache(maxsize=None)
+def profiling_route_class():
+    """ProfilingRoute, built on first use: importing this module (for ``span``) must not import FastAPI"""
+    from fastapi.routing import APIRoute
+
+    class ProfilingRoute(APIRoute):
+        """Route that samples its endpoint and times response serialization.
+
+        Whatever the route handler does after the endpoint returned is turning
+        its result into a response, and is recorded as the ``serialize`` span.
+        """
+
+        def __init__(self, path: str, endpoint, **kwargs):
+            super().__init__(path, _profiled_endpoint(endpoint), **kwargs)
+
+        def get_route_handler(self):
+            handler = super().get_route_handler()
+
+            async def timed_handler(request):
+                response = await handler(request)
+                profile = _current.get()
+                if profile is not None and profile.endpoint_done is not None:
+                    profile.add_span("serialize", (time.perf_counter() - profile.endpoint_done) * 1000)
+                return response
+            return timed_handler
+
+    return ProfilingRoute
+
+
+def install(app, engine):
+    """Attach the middleware, SQL timing and the /debug/metrics endpoint to an app.
+
+    Call it before the routes are declared: only those get the ProfilingRoute class.
+    """
+    _instrument_engine(engine)
+    app.router.route_class = profiling_route_class()
+    app.add_middleware(ProfilingMiddleware)
+
+    @app.get("/debug/metrics", include_in_schema=False)
+    def debug_metrics(reset: bool = False):
+        """Per-route latency histograms and DB/serialization/hashing breakdown"""
+        snapshot = metrics.snapshot()
+        if reset:
+            metrics.reset()
+        return {"buckets_ms": list(BUCKETS_MS), "routes": snapshot}
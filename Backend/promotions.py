@@ -0,0 +1,205 @@
+"""Promotion redemption service.
+
+Promo codes are resolved through an in-memory index so a flash sale does not
+hit the promotions table for every lookup. The only database work on the
+redemption path is one conditional UPDATE (see ``Promotion.consume_usage``),
+which is what keeps concurrent redemptions from overselling a promotion.
+
+ORM writes to a promotion drop its code from every index once they commit,
+so an extended, re-priced or re-limited promotion is served fresh. Writes
+that bypass the ORM are picked up when the index expires (``ttl``).
+
+Unknown codes are remembered for ``miss_ttl`` seconds, so a stream of bogus
+codes costs one query per code rather than one per request. Creating a
+promotion through the ORM forgets the miss for its code at once.
+"""
+import threading
+import time
+import weakref
+from dataclasses import dataclass
+from datetime import datetime
+from itertools import chain
+from typing import Dict, Optional
+
+from sqlalchemy import event, inspect, select
+from sqlalchemy.orm import Session
+
+from models import Promotion, Special_promotion
+
+DEFAULT_TTL = 300  # seconds
+DEFAULT_MISS_TTL = 30  # seconds an unknown code is answered from memory
+MAX_MISSES = 10_000  # oldest misses are dropped beyond this
+
+# Every live index, so committed promotion writes reach them all
+_indexes = weakref.WeakSet()
+
+
+@dataclass(frozen=True)
+class PromotionEntry:
+    """Read-only snapshot of the promotion fields needed to redeem a code"""
+    promo_id: str
+    promo_code: str
+    discount_percentage: float
+    max_discount: Optional[float]
+    min_purchase: Optional[float]
+    start_date: datetime
+    end_date: datetime
+
+    def is_active(self, now: datetime) -> bool:
+        return self.start_date <= now <= self.end_date
+
+    def discounted_price(self, original_price: float) -> float:
+        return Promotion.calculate_discounted_price(
+            original_price, self.discount_percentage, self.max_discount
+        )
+
+
+def _promotion_query():
+    promotions = Promotion.__table__
+    special = Special_promotion.__table__
+    return select(
+        promotions.c.promo_id,
+        promotions.c.promo_code,
+        promotions.c.discount_percentage,
+        promotions.c.max_discount,
+        promotions.c.min_purchase,
+        promotions.c.start_date,
+        promotions.c.end_date,
+        special.c.extra_bonus,
+    ).select_from(
+        promotions.outerjoin(special, special.c.promo_id == promotions.c.promo_id)
+    )
+
+
+def _entry_from_row(row) -> PromotionEntry:
+    return PromotionEntry(
+        promo_id=row.promo_id,
+        promo_code=row.promo_code,
+        # Special promotions stack their extra bonus on top of the base discount
+        discount_percentage=(row.discount_percentage or 0.0) + (row.extra_bonus or 0.0),
+        max_discount=row.max_discount,
+        min_purchase=row.min_purchase,
+        start_date=row.start_date,
+        end_date=row.end_date,
+    )
+
+
+class PromotionIndex:
+    """Thread-safe promo_code -> PromotionEntry cache shared by all requests"""
+
+    def __init__(self, ttl: float = DEFAULT_TTL, miss_ttl: float = DEFAULT_MISS_TTL):
+        self.ttl = ttl
+        self.miss_ttl = miss_ttl
+        self._entries: Dict[str, PromotionEntry] = {}
+        # Unknown code -> when it was looked up, oldest first
+        self._misses: Dict[str, float] = {}
+        # Codes whose usage_limit was hit; rejected without touching the database
+        self._exhausted = set()
+        self._loaded = False
+        self._loaded_at = 0.0
+        self._lock = threading.Lock()
+        _indexes.add(self)
+
+    def load(self, session):
+        """(Re)build the whole index with a single query"""
+        entries = {
+            row.promo_code: _entry_from_row(row)
+            for row in session.execute(_promotion_query())
+            if row.promo_code
+        }
+        with self._lock:
+            self._entries = entries
+            self._exhausted.clear()
+            self._misses.clear()
+            self._loaded = True
+            self._loaded_at = time.monotonic()
+
+    def invalidate(self, promo_code: str = None):
+        """Drop one code (or everything) after a promotion is created or edited"""
+        with self._lock:
+            if promo_code is None:
+                self._entries.clear()
+                self._exhausted.clear()
+                self._misses.clear()
+                self._loaded = False
+            else:
+                self._entries.pop(promo_code, None)
+                self._exhausted.discard(promo_code)
+                self._misses.pop(promo_code, None)
+
+    def get(self, session, promo_code: str) -> Optional[PromotionEntry]:
+        if not self._loaded or time.monotonic() - self._loaded_at > self.ttl:
+            self.load(session)
+        entry = self._entries.get(promo_code)
+        if entry is None:
+            missed_at = self._misses.get(promo_code)
+            if missed_at is not None and time.monotonic() - missed_at <= self.miss_ttl:
+                return None
+            # Codes created after the index was built are picked up on first use
+            row = session.execute(
+                _promotion_query().where(Promotion.__table__.c.promo_code == promo_code)
+            ).first()
+            if row is None:
+                with self._lock:
+                    self._misses.pop(promo_code, None)
+                    self._misses[promo_code] = time.monotonic()
+                    while len(self._misses) > MAX_MISSES:
+                        del self._misses[next(iter(self._misses))]
+                return None
+            entry = _entry_from_row(row)
+            with self._lock:
+                self._entries[promo_code] = entry
+                self._misses.pop(promo_code, None)
+        return entry
+
+    def redeem(self, session, promo_code: str, original_price: float,
+               now: datetime = None, commit: bool = True) -> float:
+        """Consume one use of ``promo_code`` and return the discounted price.
+
+        Raises ValueError when the code is unknown, inactive, below its minimum
+        purchase or used up. Pass ``commit=False`` to make the redemption part
+        of the caller's transaction.
+        """
+        now = now or datetime.now()
+        entry = self.get(session, promo_code)
+        if entry is None:
+            raise ValueError(f"No promotion found with code: {promo_code}")
+        if promo_code in self._exhausted or not entry.is_active(now):
+            raise ValueError(f"Promotion {promo_code} is not valid or has expired.")
+        if entry.min_purchase and original_price < entry.min_purchase:
+            raise ValueError(f"Promotion {promo_code} requires a minimum purchase of {entry.min_purchase}.")
+
+        if not Promotion.consume_usage(session, entry.promo_id, now):
+            if commit:
+                session.rollback()
+            with self._lock:
+                self._exhausted.add(promo_code)
+            raise ValueError(f"Promotion {promo_code} is not valid or has expired.")
+        if commit:
+            session.commit()
+        return entry.discounted_price(original_price)
+
+
+promotion_index = PromotionIndex()
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_promotion_writes(session, flush_context):
+    codes = session.info.setdefault("promotion_codes_written", set())
+    for obj in chain(session.new, session.dirty, session.deleted):
+        if isinstance(obj, Promotion):
+            # The old code too, if the code itself was changed
+            codes.update(code for code in (obj.promo_code, *inspect(obj).attrs.promo_code.history.deleted) if code)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_committed_promotions(session):
+    for code in session.info.pop("promotion_codes_written", ()):
+        for index in list(_indexes):
+            index.invalidate(code)
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_rolled_back_promotions(session):
+    session.info.pop("promotion_codes_written", None)
+
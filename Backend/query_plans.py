@@ -0,0 +1,108 @@
+"""Full-table-scan detection with SQLite's EXPLAIN QUERY PLAN.
+
+``QueryPlanChecker`` listens on every engine while it is active and explains
+each distinct SELECT the application issues, on the same connection and
+transaction, so temporary test databases and uncommitted rows are seen as the
+query saw them. Statements are attributed to the application functions on
+the stack when they ran; statements issued by the tests themselves are not
+checked.
+
+A plan step ``SCAN <table>`` reads the whole table (or a whole index of it).
+That is only reported for statements with a WHERE clause: an unfiltered
+listing reads everything by design. Batch jobs that are meant to read
+everything are listed in ``allow`` by the name of any function they run in.
+
+    with QueryPlanChecker(allow={"rebuild_fare_calendar"}) as checker:
+        run_the_hot_paths()
+    checker.assert_no_full_scans()
+"""
+import os
+import re
+import sys
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from database import Base
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+# Files in APP_DIR whose queries are not application queries
+NOT_APPLICATION = {"tests.py", os.path.basename(__file__)}
+
+_SCAN = re.compile(r"^SCAN (\w+)")
+_WHERE = re.compile(r"\bWHERE\b", re.IGNORECASE)
+
+
+@dataclass
+class PlannedQuery:
+    statement: str
+    callers: Tuple[str, ...]  # "module:function" of the application frames, innermost first
+    plan: List[str]
+
+    @property
+    def origin(self) -> str:
+        return self.callers[0]
+
+    @property
+    def scanned_tables(self) -> List[str]:
+        tables = set(Base.metadata.tables)
+        return [match.group(1) for step in self.plan
+                if (match := _SCAN.match(step)) and match.group(1) in tables]
+
+
+def _callers() -> Optional[Tuple[str, ...]]:
+    """Application frames on the stack, or None when the statement came straight from a test"""
+    callers = []
+    frame = sys._getframe(2)
+    while frame is not None:
+        path = os.path.abspath(frame.f_code.co_filename)
+        if path.startswith(APP_DIR + os.sep) and path.endswith(".py"):
+            if os.path.basename(path) in NOT_APPLICATION:
+                break
+            module = os.path.relpath(path, APP_DIR)[:-3].replace(os.sep, ".")
+            callers.append(f"{module}:{frame.f_code.co_name}")
+        frame = frame.f_back
+    return tuple(callers) or None
+
+
+class QueryPlanChecker:
+    def __init__(self, allow: Iterable[str] = ()):
+        self.allow = set(allow)
+        self.queries: Dict[str, PlannedQuery] = {}
+
+    def __enter__(self):
+        event.listen(Engine, "after_cursor_execute", self._explain)
+        return self
+
+    def __exit__(self, *exc_info):
+        event.remove(Engine, "after_cursor_execute", self._explain)
+
+    def _explain(self, conn, cursor, statement, parameters, context, executemany):
+        if executemany or conn.dialect.name != "sqlite" or statement in self.queries:
+            return
+        if not statement.lstrip().upper().startswith(("SELECT", "WITH")) or not _WHERE.search(statement):
+            return
+        callers = _callers()
+        if callers is None:
+            return
+        rows = cursor.connection.execute(f"EXPLAIN QUERY PLAN {statement}", parameters or ()).fetchall()
+        self.queries[statement] = PlannedQuery(statement, callers, [row[-1] for row in rows])
+
+    def _allowed(self, query: PlannedQuery) -> bool:
+        return any(caller.split(":")[-1] in self.allow for caller in query.callers)
+
+    def full_scans(self) -> List[PlannedQuery]:
+        return [query for query in self.queries.values() if query.scanned_tables and not self._allowed(query)]
+
+    def report(self) -> str:
+        return "\n\n".join(
+            f"{query.origin} scans {', '.join(query.scanned_tables)}:\n  {query.statement}\n  "
+            + "\n  ".join(query.plan)
+            for query in self.full_scans()
+        )
+
+    def assert_no_full_scans(self):
+        if self.full_scans():
+            raise AssertionError(f"Full table scans in hot queries:\n\n{self.report()}")
@@ -0,0 +1,203 @@
+"""Response cache with ETags and conditional GET for read endpoints.
+
+Every write statement bumps a version counter for the table it touches:
+SQLAlchemy ``after_execute`` catches ORM flushes, Core statements (bulk
+bookings, the occupancy counters that move flights.available_seats) and plain
+SQL text alike, and the counters are bumped again when the transaction
+commits, so a reader that recomputed between the statement and the commit
+can't pin the old result under the new version.
+
+Counters and responses live in the cache backend (see cache.py), so with a
+shared backend all workers see the same versions and share rendered
+responses. A response is stored under (route, normalized query string,
+versions of the tables it was built from); a write moves the versions and the
+old entries just age out. Concurrent misses for the same key are computed
+once. The ETag is a hash of the body, so a client holding it gets ``304 Not
+Modified`` whether the body came from the cache or was just recomputed.
+"""
+import hashlib
+import json
+import os
+import re
+from typing import Callable, Iterable, Optional, Set, Tuple
+
+from fastapi import Request, Response
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.sql.dml import UpdateBase
+from sqlalchemy.sql.elements import TextClause
+
+import cache
+
+RESPONSE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "300"))
+NEAR_TTL = float(os.getenv("RESPONSE_CACHE_NEAR_TTL", "30"))
+# Bumped by clear(); part of every snapshot
+ALL_TABLES = "*"
+
+_WRITE_SQL = re.compile(r"^\s*(?:INSERT(?:\s+OR\s+\w+)?\s+INTO|UPDATE(?:\s+OR\s+\w+)?|DELETE\s+FROM|REPLACE\s+INTO)\s+[\"`\[]?(\w+)",
+                        re.IGNORECASE)
+
+
+class TableVersions:
+    """Per-table write counters in the cache backend.
+
+    A bump that fails leaves a cached response looking current after a write,
+    so from then on this process caches nothing until it has bumped the
+    global version (which moves every snapshot) successfully.
+    """
+
+    def __init__(self, backend=None):
+        backend = backend or cache.default_backend()
+        if isinstance(backend, cache.LocalBackend):
+            backend = cache.LocalBackend()  # never let the responses' LRU evict a counter
+        self.counters = cache.Cache("table-versions", backend)
+        self.missed_bump = False
+
+    def _recover(self) -> bool:
+        """Bump the global version if a bump was lost; False while that still fails"""
+        if not self.missed_bump:
+            return True
+        try:
+            self.counters.incr(ALL_TABLES)
+        except cache.CacheError:
+            return False
+        self.missed_bump = False
+        return True
+
+    def bump(self, tables: Iterable[str]):
+        if not self._recover():
+            return
+        for table in tables:
+            try:
+                self.counters.incr(table)
+            except cache.CacheError as e:
+                self.missed_bump = True
+                print(f"Could not bump cache version of {table}, caching paused: {e}")
+                return
+
+    def snapshot(self, tables: Iterable[str]) -> Optional[Tuple[int, ...]]:
+        """Current versions (plus the global one), or None when they can't be trusted or read"""
+        if not self._recover():
+            return None
+        names = [ALL_TABLES] + sorted(tables)
+        try:
+            return tuple(int(value or 0) for value in self.counters.get_many(names))
+        except cache.CacheError:
+            return None
+
+
+table_versions = TableVersions()
+
+
+def written_table(statement) -> Optional[str]:
+    if isinstance(statement, UpdateBase):
+        return getattr(statement.table, "name", None)
+    if isinstance(statement, TextClause):
+        match = _WRITE_SQL.match(statement.text)
+        return match.group(1) if match else None
+    return None
+
+
+@event.listens_for(Engine, "after_execute")
+def _after_execute(conn, clauseelement, multiparams, params, execution_options, result):
+    table = written_table(clauseelement)
+    if table is None:
+        return
+    table_versions.bump([table])
+    if conn.in_transaction():
+        conn.info.setdefault("written_tables", set()).add(table)
+
+
+@event.listens_for(Engine, "commit")
+def _on_commit(conn):
+    tables = conn.info.pop("written_tables", None)
+    if tables:
+        table_versions.bump(tables)
+
+
+@event.listens_for(Engine, "rollback")
+def _on_rollback(conn):
+    conn.info.pop("written_tables", None)
+
+
+class _Uncacheable(Exception):
+    def __init__(self, response: Response):
+        self.response = response
+
+
+def _encode(etag: str, media_type: str, body: bytes) -> bytes:
+    return json.dumps({"etag": etag, "media_type": media_type}).encode() + b"\n" + body
+
+
+def _decode(raw: bytes) -> Tuple[str, str, bytes]:
+    header, _, body = raw.partition(b"\n")
+    meta = json.loads(header)
+    return meta["etag"], meta["media_type"], body
+
+
+class ResponseCache:
+    """Rendered responses keyed by request and table versions"""
+
+    def __init__(self, versions: TableVersions = None, backend=None, ttl: float = RESPONSE_TTL,
+                 near_ttl: float = NEAR_TTL):
+        self.versions = versions or table_versions
+        self.cache = cache.Cache("responses", backend, default_ttl=ttl, near_ttl=near_ttl)
+        self.hits = self.misses = self.not_modified = 0
+
+    @staticmethod
+    def key(request: Request) -> str:
+        """Route plus query parameters, sorted and without empty values"""
+        params = sorted((name, value) for name, value in request.query_params.multi_items() if value != "")
+        return request.url.path + "?" + "&".join(f"{name}={value}" for name, value in params)
+
+    def clear(self):
+        """Invalidate every cached response, in all workers"""
+        self.versions.bump([ALL_TABLES])
+
+    @staticmethod
+    def _render(compute: Callable[[], Response]) -> bytes:
+        response = compute()
+        if response.status_code != 200:
+            raise _Uncacheable(response)
+        body = bytes(response.body)
+        etag = f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+        return _encode(etag, response.media_type or "application/json", body)
+
+    def respond(self, request: Request, tables: Set[str], compute: Callable[[], Response],
+                cache_control: str = "no-cache") -> Response:
+        """Serve ``compute()``'s response from the cache while ``tables`` are unchanged, with 304s for matching ETags"""
+        versions = self.versions.snapshot(tables)
+        if versions is None:  # cache backend down: no caching, but still ETags
+            computed = True
+            try:
+                raw = self._render(compute)
+            except _Uncacheable as e:
+                return e.response
+        else:
+            computed = []
+            key = f"{self.key(request)}#{'.'.join(map(str, versions))}"
+            try:
+                raw = self.cache.get_or_compute(key, lambda: computed.append(True) or self._render(compute))
+            except _Uncacheable as e:
+                return e.response
+        if computed:
+            self.misses += 1
+        else:
+            self.hits += 1
+
+        etag, media_type, body = _decode(raw)
+        headers = {"ETag": etag, "Cache-Control": cache_control}
+        client_tags = _parse_if_none_match(request.headers.get("if-none-match"))
+        if etag in client_tags or "*" in client_tags:
+            self.not_modified += 1
+            return Response(status_code=304, headers=headers)
+        return Response(body, media_type=media_type, headers=headers)
+
+
+def _parse_if_none_match(header: Optional[str]) -> Set[str]:
+    if not header:
+        return set()
+    return {tag.strip().removeprefix("W/") for tag in header.split(",")}
+
+
+response_cache = ResponseCache()
@@ -0,0 +1,365 @@
+"""Bulk flight schedule import.
+
+A schedule file holds recurring flight patterns (one flight number flying on
+some weekdays between two dates). The importer streams the file, expands each
+pattern's ``days_of_operation`` into dated flight instances, validates them
+against airport/airline reference data held in memory and bulk-inserts flights
+(and optionally their seats) in large transactions.
+
+Supported formats are CSV (header row) and JSON: either a JSON array or one
+object per line (NDJSON). Recognised fields per pattern:
+
+    flight_number, departure_code, destination_code,
+    departure_time / arrival_time    "HH:MM" local times,
+    arrival_day_offset               optional, days added to arrival (default:
+                                     1 if arrival is earlier than departure),
+    effective_from / effective_to    "YYYY-MM-DD", both inclusive,
+    days_of_operation                bitmask (Monday = 1 ... Sunday = 64) in JSON,
+                                     IATA day digits such as "1357" in CSV,
+    airline_id or airline_code       airline id or IATA code,
+    total_seats, gate, terminal, business_seats (optional)
+
+Usage:
+    python schedule_import.py summer.csv --with-seats
+"""
+import argparse
+import csv
+import io
+import json
+import sys
+from dataclasses import dataclass, field
+from datetime import date, datetime, time, timedelta
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+from sqlalchemy import insert, select
+
+from models import Airline, Airport, Flight, Seat
+from models.fares import refresh_fare_calendar
+
+ALL_DAYS = 0b1111111
+SEAT_LETTERS = "ABCDEF"
+SEAT_TYPES = {"A": "window", "B": "middle", "C": "aisle", "D": "aisle", "E": "middle", "F": "window"}
+
+
+@dataclass
+class ImportResult:
+    patterns: int = 0
+    flights_created: int = 0
+    flights_skipped: int = 0
+    seats_created: int = 0
+    errors: List[str] = field(default_factory=list)
+
+
+def parse_days_of_operation(value) -> int:
+    """Return a weekday bitmask.
+
+    Integers are taken as a mask already; strings use IATA day digits
+    (Monday = 1), e.g. "1357", "1.3.5.7" or "1234567".
+    """
+    if value is None or value == "":
+        return ALL_DAYS
+    if isinstance(value, str):
+        mask = 0
+        for char in value.strip():
+            if char in ".-x ":
+                continue
+            if char not in "1234567":
+                raise ValueError(f"Invalid days_of_operation: {value!r}")
+            mask |= 1 << (int(char) - 1)
+    else:
+        mask = int(value)
+    if not 0 < mask <= ALL_DAYS:
+        raise ValueError(f"Invalid days_of_operation: {value!r}")
+    return mask
+
+
+def operating_dates(start: date, end: date, days_mask: int) -> Iterator[date]:
+    """Yield every date between start and end (inclusive) whose weekday is in the mask"""
+    current = start
+    while current <= end:
+        if days_mask & (1 << current.weekday()):
+            yield current
+        current += timedelta(days=1)
+
+
+def build_seat_map(total_seats: int, business_seats: int = 0) -> List[Tuple[str, str, str]]:
+    """(seat_number, class_type, seat_type) for a single-aisle 3-3 cabin"""
+    seats = []
+    for index in range(total_seats):
+        row, letter = divmod(index, len(SEAT_LETTERS))
+        seat_letter = SEAT_LETTERS[letter]
+        class_type = "business" if index < business_seats else "economy"
+        seats.append((f"{row + 1}{seat_letter}", class_type, SEAT_TYPES[seat_letter]))
+    return seats
+
+
+@dataclass
+class InvalidPattern:
+    """Stands in for a pattern that could not be decoded, so the import reports it and goes on"""
+    message: str
+
+
+def _decoded(text: str):
+    try:
+        value = json.loads(text)
+    except json.JSONDecodeError as e:
+        return InvalidPattern(f"Invalid JSON: {e}")
+    return value
+
+
+def _checked(pattern):
+    if isinstance(pattern, (dict, InvalidPattern)):
+        return pattern
+    return InvalidPattern(f"Expected a JSON object, got {type(pattern).__name__}")
+
+
+def read_patterns(stream, file_format: str) -> Iterator[Union[dict, InvalidPattern]]:
+    """Stream schedule patterns from a text file object; undecodable ones come as InvalidPattern"""
+    if file_format == "csv":
+        yield from csv.DictReader(stream)
+        return
+    if file_format != "json":
+        raise ValueError(f"Unsupported schedule format: {file_format}")
+
+    first_line = stream.readline()
+    if first_line.lstrip().startswith("["):
+        # A JSON array can't be parsed incrementally with the stdlib; pattern
+        # files are small compared to the instances they expand into
+        patterns = _decoded(first_line + stream.read())
+        if isinstance(patterns, list):
+            yield from map(_checked, patterns)
+        else:
+            yield _checked(patterns)
+        return
+    if first_line.strip():
+        yield _checked(_decoded(first_line))
+    for line in stream:
+        if line.strip():
+            yield _checked(_decoded(line))
+
+
+class ReferenceData:
+    """Airport codes and airline ids loaded once so validation never hits the database"""
+
+    def __init__(self, session):
+        self.airport_codes = set(session.execute(select(Airport.code)).scalars())
+        self.airline_ids: Dict[str, int] = {}
+        for airline_id, iata_code in session.execute(select(Airline.id, Airline.iata_code)):
+            self.airline_ids[str(airline_id)] = airline_id
+            if iata_code:
+                self.airline_ids[iata_code.upper()] = airline_id
+
+    def airline_id(self, pattern: dict) -> Optional[int]:
+        key = pattern.get("airline_id") or pattern.get("airline_code")
+        if key in (None, ""):
+            return None
+        airline_id = self.airline_ids.get(str(key).upper())
+        if airline_id is None:
+            raise ValueError(f"Unknown airline: {key}")
+        return airline_id
+
+
+def _parse_time(value) -> time:
+    return datetime.strptime(str(value).strip(), "%H:%M").time()
+
+
+def _parse_date(value) -> date:
+    return datetime.strptime(str(value).strip(), "%Y-%m-%d").date()
+
+
+def expand_pattern(pattern: dict, reference: ReferenceData, user_id: int = None) -> Iterator[dict]:
+    """Validate one pattern and yield a flights-table row per operating date"""
+    flight_number = str(pattern.get("flight_number", "")).strip()
+    departure_code = str(pattern.get("departure_code", "")).strip().upper()
+    destination_code = str(pattern.get("destination_code", "")).strip().upper()
+    if not flight_number:
+        raise ValueError("Missing flight_number")
+    for code in (departure_code, destination_code):
+        if code not in reference.airport_codes:
+            raise ValueError(f"Unknown airport: {code or '<empty>'}")
+    if departure_code == destination_code:
+        raise ValueError("Departure and destination must differ")
+
+    departure_clock = _parse_time(pattern["departure_time"])
+    arrival_clock = _parse_time(pattern["arrival_time"])
+    day_offset = pattern.get("arrival_day_offset")
+    if day_offset in (None, ""):
+        day_offset = 1 if arrival_clock <= departure_clock else 0
+    arrival_delta = timedelta(days=int(day_offset))
+
+    start = _parse_date(pattern["effective_from"])
+    end = _parse_date(pattern["effective_to"])
+    if end < start:
+        raise ValueError("effective_to is before effective_from")
+
+    total_seats = int(pattern.get("total_seats") or 0)
+    if total_seats <= 0:
+        raise ValueError("total_seats must be positive")
+    days_mask = parse_days_of_operation(pattern.get("days_of_operation"))
+    airline_id = reference.airline_id(pattern)
+
+    for flight_date in operating_dates(start, end, days_mask):
+        yield {
+            "flight_number": flight_number,
+            "departure_code": departure_code,
+            "destination_code": destination_code,
+            "departure_time": datetime.combine(flight_date, departure_clock),
+            "arrival_time": datetime.combine(flight_date + arrival_delta, arrival_clock),
+            "total_seats": total_seats,
+            "available_seats": total_seats,
+            "gate": pattern.get("gate") or None,
+            "terminal": pattern.get("terminal") or None,
+            "airline_id": airline_id,
+            "days_of_operation": days_mask,
+            "user_id": user_id,
+        }
+
+
+def import_schedule(session, patterns: Iterable[dict], with_seats: bool = False,
+                    batch_size: int = 10000, user_id: int = None,
+                    progress: Callable[[ImportResult], None] = None) -> ImportResult:
+    """Expand and insert a stream of schedule patterns.
+
+    Each batch of ``batch_size`` flight instances (plus their seats) is one
+    transaction. Instances that already exist (same flight number and
+    departure time) are skipped, so re-running an import is safe. Invalid
+    patterns are reported in ``ImportResult.errors`` and do not stop the run.
+    """
+    reference = ReferenceData(session)
+    result = ImportResult()
+    seat_maps: Dict[Tuple[int, int], List[Tuple[str, str, str]]] = {}
+    batch: List[Tuple[dict, int]] = []
+
+    def flush():
+        if not batch:
+            return
+        _insert_batch(session, batch, with_seats, seat_maps, result)
+        session.commit()
+        batch.clear()
+        if progress:
+            progress(result)
+
+    for line_number, pattern in enumerate(patterns, start=1):
+        result.patterns += 1
+        try:
+            if isinstance(pattern, InvalidPattern):
+                raise ValueError(pattern.message)
+            rows = list(expand_pattern(pattern, reference, user_id))
+            business_seats = int(pattern.get("business_seats") or 0)
+        except (KeyError, ValueError, TypeError) as e:
+            message = f"Missing field {e}" if isinstance(e, KeyError) else str(e)
+            result.errors.append(f"Pattern {line_number}: {message}")
+            continue
+        for row in rows:
+            batch.append((row, business_seats))
+            if len(batch) >= batch_size:
+                flush()
+    flush()
+    return result
+
+
+def _insert_batch(session, batch, with_seats, seat_maps, result):
+    flights = Flight.__table__
+
+    # Drop instances that are already scheduled, including duplicates within the batch
+    flight_numbers = {row["flight_number"] for row, _ in batch}
+    departures = [row["departure_time"] for row, _ in batch]
+    existing = set(
+        session.execute(
+            select(flights.c.flight_number, flights.c.departure_time).where(
+                flights.c.flight_number.in_(flight_numbers),
+                flights.c.departure_time.between(min(departures), max(departures))
+            )
+        ).all()
+    )
+    pending = []
+    for row, business_seats in batch:
+        key = (row["flight_number"], row["departure_time"])
+        if key in existing:
+            result.flights_skipped += 1
+            continue
+        existing.add(key)
+        pending.append((row, business_seats))
+    if not pending:
+        return
+    rows = [row for row, _ in pending]
+
+    if not with_seats:
+        session.execute(insert(flights), rows)
+        result.flights_created += len(rows)
+        return
+
+    flight_ids = session.execute(
+        insert(flights).returning(flights.c.id, sort_by_parameter_order=True), rows
+    ).scalars().all()
+
+    seat_rows = []
+    for flight_id, (row, business_seats) in zip(flight_ids, pending):
+        layout_key = (row["total_seats"], business_seats)
+        if layout_key not in seat_maps:
+            seat_maps[layout_key] = build_seat_map(*layout_key)
+        for seat_number, class_type, seat_type in seat_maps[layout_key]:
+            seat_rows.append({
+                "seat_number": seat_number,
+                "class_type": class_type,
+                "is_available": True,
+                "seat_type": seat_type,
+                "flight_id": flight_id,
+            })
+    if seat_rows:
+        session.execute(insert(Seat.__table__), seat_rows)
+        refresh_fare_calendar(session.connection(), flight_ids)
+    result.flights_created += len(rows)
+    result.seats_created += len(seat_rows)
+
+
+def detect_format(filename: str) -> str:
+    lowered = (filename or "").lower()
+    if lowered.endswith(".csv"):
+        return "csv"
+    if lowered.endswith((".json", ".ndjson", ".jsonl")):
+        return "json"
+    raise ValueError(f"Cannot tell the schedule format of {filename!r}; use .csv or .json")
+
+
+def import_schedule_file(session, stream, file_format: str, **kwargs) -> ImportResult:
+    """Import from a text or binary file object"""
+    if isinstance(stream, (io.BufferedIOBase, io.RawIOBase)) or "b" in getattr(stream, "mode", ""):
+        stream = io.TextIOWrapper(stream, encoding="utf-8", newline="")
+    return import_schedule(session, read_patterns(stream, file_format), **kwargs)
+
+
+def main(argv=None):
+    from database import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Import a recurring flight schedule")
+    parser.add_argument("path", help="CSV or JSON schedule file")
+    parser.add_argument("--format", choices=["csv", "json"], help="Defaults to the file extension")
+    parser.add_argument("--with-seats", action="store_true", help="Also create a seat map per flight")
+    parser.add_argument("--batch-size", type=int, default=10000, help="Flight instances per transaction")
+    args = parser.parse_args(argv)
+
+    file_format = args.format or detect_format(args.path)
+
+    def report(result: ImportResult):
+        print(f"  {result.flights_created} flights, {result.seats_created} seats inserted "
+              f"({result.flights_skipped} skipped)", flush=True)
+
+    session = SessionLocal()
+    try:
+        with open(args.path, newline="", encoding="utf-8") as stream:
+            result = import_schedule(
+                session, read_patterns(stream, file_format), with_seats=args.with_seats,
+                batch_size=args.batch_size, progress=report
+            )
+    finally:
+        session.close()
+
+    for error in result.errors:
+        print(f"❌ {error}", file=sys.stderr)
+    print(f"✅ Imported {result.flights_created} flights from {result.patterns} patterns")
+    return 1 if result.errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
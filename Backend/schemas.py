@@ -1,14 +1,15 @@
-from datetime import datetime
+from datetime import date, datetime
 from typing import Optional, List
 from pydantic import BaseModel, EmailStr, Field, field_validator, ConfigDict
 from pydantic.types import Decimal
 import re
 
-# Base Config
-model_config = ConfigDict(from_attributes=True)
+# Base Config: every schema can be built from ORM objects
+class Schema(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
 
 # User Schemas
-class UserBase(BaseModel):
+class UserBase(Schema):
     username: str = Field(..., min_length=3, max_length=50)
     email: EmailStr
 
@@ -33,7 +34,7 @@ class UserPublic(UserBase):
     is_active: bool
 
 # Flight Schemas
-class FlightBase(BaseModel):
+class FlightBase(Schema):
     flight_number: str = Field(..., min_length=2, max_length=10, pattern=r'^[A-Za-z0-9]+$')
     departure_code: str = Field(..., min_length=3, max_length=3, pattern=r'^[A-Z]{3}$')
     destination_code: str = Field(..., min_length=3, max_length=3, pattern=r'^[A-Z]{3}$')
@@ -62,8 +63,48 @@ class FlightPublic(FlightBase):
     id: int
     user_id: int
 
+class ScheduleImportResult(Schema):
+    patterns: int
+    flights_created: int
+    flights_skipped: int
+    seats_created: int
+    errors: List[str] = []
+
+class FlightLoadFactor(Schema):
+    flight_id: int
+    flight_number: str
+    airline_id: Optional[int] = None
+    departure_code: str
+    destination_code: str
+    departure_time: Optional[datetime] = None
+    total_seats: Optional[int] = None
+    available_seats: Optional[int] = None
+    pending: int
+    confirmed: int
+    load_factor: float
+
+class OccupancyRollupPublic(Schema):
+    dimension: str
+    key: str
+    day: date
+    flights: int
+    seats: int
+    pending: int
+    confirmed: int
+    load_factor: float
+    refreshed_at: datetime
+
+class FareCalendarDayPublic(Schema):
+    day: date
+    cabin: str
+    flights: int
+    seats_left: int
+    base_fare: Optional[float] = None
+    min_fare: Optional[float] = None
+    promo_id: Optional[str] = None
+
 # Passenger Schemas
-class PassengerBase(BaseModel):
+class PassengerBase(Schema):
     name: str = Field(..., min_length=2, max_length=100)
     national_id: str = Field(..., min_length=5, max_length=20)
     email: EmailStr
@@ -84,7 +125,7 @@ class PassengerPublic(PassengerBase):
     is_vip: bool
 
 # Reservation Schemas
-class ReservationBase(BaseModel):
+class ReservationBase(Schema):
     passenger_id: int
     flight_id: int
     seat_number: str = Field(..., pattern=r'^[0-9]+[A-Z]$')
@@ -92,6 +133,17 @@ class ReservationBase(BaseModel):
 class ReservationCreate(ReservationBase):
     status: str = "Pending"
     booking_agent_id: Optional[str] = None
+    hold_id: Optional[str] = None  # book a seat held with POST /flights/{id}/holds
+
+class ReservationBatchCreate(Schema):
+    reservations: List[ReservationBase] = Field(..., min_length=1, max_length=500)
+    status: str = "Pending"
+    booking_agent_id: Optional[str] = None
+
+class ReservationSummary(ReservationBase):
+    id: int
+    status: str
+    created_at: datetime
 
 class ReservationPublic(ReservationBase):
     id: int
@@ -101,7 +153,7 @@ class ReservationPublic(ReservationBase):
     passenger: PassengerPublic
 
 # Ticket Schemas
-class TicketBase(BaseModel):
+class TicketBase(Schema):
     passenger_id: int
     flight_id: int
     seat_number: str
@@ -122,7 +174,7 @@ class TicketPublic(TicketBase):
     final_price: Decimal = Field(..., gt=0)
 
 # Payment Schemas
-class PaymentBase(BaseModel):
+class PaymentBase(Schema):
     amount: Decimal = Field(..., gt=0)
     method: str = Field(..., pattern=r'^(credit card|debit card|bank transfer|cash)$')
     reservation_id: int
@@ -133,13 +185,23 @@ class PaymentCreate(PaymentBase):
     transaction_id: Optional[str] = None
 
 class PaymentPublic(PaymentBase):
-    id: str
+    payment_id: str
     status: str
-    payment_date: datetime
-    is_refundable: bool
+    payment_date: Optional[datetime] = None
+    is_refundable: Optional[bool] = None
+    transaction_id: Optional[str] = None
+
+class PaymentStatus(Schema):
+    payment_id: str
+    status: str
+    transaction_id: Optional[str] = None
+    payment_date: Optional[datetime] = None
+    job_state: Optional[str] = None
+    attempts: int = 0
+    last_error: Optional[str] = None
 
 # Airport Schemas
-class AirportBase(BaseModel):
+class AirportBase(Schema):
     code: str = Field(..., min_length=3, max_length=3, pattern=r'^[A-Z]{3}$')
     name: str
     country_code: str = Field(..., min_length=2, max_length=2)
@@ -149,7 +211,7 @@ class AirportPublic(AirportBase):
     location: Optional[str] = None
 
 # Airline Schemas
-class AirlineBase(BaseModel):
+class AirlineBase(Schema):
     name: str
     iata_code: str = Field(..., min_length=2, max_length=2)
     icao_code: str = Field(..., min_length=3, max_length=3)
@@ -161,19 +223,89 @@ class AirlinePublic(AirlineBase):
     year_founded: Optional[int] = None
 
 # Seat Schemas
-class SeatBase(BaseModel):
+class SeatBase(Schema):
     seat_number: str
     class_type: str
     is_available: bool
     flight_id: int
 
 class SeatPublic(SeatBase):
-    id: int
+    seat_id: int
     seat_type: str
     additional_features: List[str]
 
+# Seat Hold Schemas
+class SeatHoldCreate(Schema):
+    seat_numbers: List[str] = Field(..., min_length=1, max_length=50)
+    ttl_seconds: Optional[int] = Field(None, gt=0)
+
+class SeatHoldExtend(Schema):
+    ttl_seconds: Optional[int] = Field(None, gt=0)
+
+class SeatHoldPublic(Schema):
+    hold_id: str
+    flight_id: int
+    seat_numbers: List[str]
+    expires_at: datetime
+
+# Outbox Event Schemas
+class OutboxEventPublic(Schema):
+    id: int
+    topic: str
+    event_type: str
+    aggregate_id: str
+    payload: dict
+    created_at: datetime
+
+class OutboxEventPage(Schema):
+    events: List[OutboxEventPublic]
+    next_offset: int
+
+# Loyalty Schemas
+class LoyaltyAccrualRun(Schema):
+    entries: int
+    points: int
+    programs: int
+    upgrades: int
+
+# Luggage Schemas
+class LuggageCheckIn(Schema):
+    luggage_id: str
+    weight: float = Field(..., ge=0)
+    is_fragile: Optional[bool] = None
+
+class LuggageBatchCheckIn(Schema):
+    bags: List[LuggageCheckIn] = Field(..., min_length=1, max_length=2000)
+
+class LuggageCharge(Schema):
+    luggage_id: str
+    weight: float
+    allowance: float
+    weight_status: str
+    luggage_fee: float
+    fine: float
+    status: str
+    is_fragile: bool
+
+class LuggageScan(Schema):
+    luggage_id: str
+    status: str
+    airport_code: Optional[str] = Field(None, min_length=3, max_length=3)
+    scanner_id: Optional[str] = None
+    scanned_at: Optional[datetime] = None
+
+class LuggageScanBatch(Schema):
+    scans: List[LuggageScan] = Field(..., min_length=1, max_length=5000)
+
+class LuggageEventPublic(Schema):
+    luggage_id: str
+    status: str
+    airport_code: Optional[str] = None
+    scanner_id: Optional[str] = None
+    scanned_at: datetime
+
 # Promotion Schemas
-class PromotionBase(BaseModel):
+class PromotionBase(Schema):
     description: str
     discount_percentage: Decimal = Field(..., ge=0, le=100)
     start_date: datetime
@@ -198,4 +330,55 @@ class PassengerWithReservations(PassengerPublic):
     reservations: List[ReservationPublic] = []
 
 class ReservationWithTickets(ReservationPublic):
-    tickets: List[TicketPublic] = []
\ No newline at end of file
+    tickets: List[TicketPublic] = []
+
+# Itinerary: stored rows as they are, so a trip never fails the create-time validation of today's schemas
+class ItineraryPassenger(Schema):
+    id: int
+    name: Optional[str] = None
+    national_id: Optional[str] = None
+    email: Optional[str] = None
+    phone_number: Optional[str] = None
+    nationality: Optional[str] = None
+    passport_number: Optional[str] = None
+    is_vip: Optional[bool] = None
+
+class ItineraryFlight(Schema):
+    id: int
+    flight_number: str
+    departure_code: str
+    destination_code: str
+    departure_time: Optional[datetime] = None
+    arrival_time: Optional[datetime] = None
+    airline_id: Optional[int] = None
+
+class ItineraryTicket(Schema):
+    ticket_number: int
+    ticket_class: Optional[str] = None
+    seat_number: Optional[str] = None
+    status: Optional[str] = None
+    issue_date: Optional[datetime] = None
+    final_price: Optional[float] = None
+
+class ItineraryPayment(Schema):
+    payment_id: str
+    amount: Optional[float] = None
+    currency: Optional[str] = None
+    method: Optional[str] = None
+    status: Optional[str] = None
+    payment_date: Optional[datetime] = None
+
+class ItineraryReservation(Schema):
+    id: int
+    seat_number: Optional[str] = None
+    status: Optional[str] = None
+    final_price: Optional[float] = None
+    created_at: Optional[datetime] = None
+    flight: Optional[ItineraryFlight] = None
+    tickets: List[ItineraryTicket] = []
+    payments: List[ItineraryPayment] = []
+
+class PassengerItinerary(Schema):
+    passenger: ItineraryPassenger
+    reservations: List[ItineraryReservation]
+    next_cursor: Optional[str] = None  # pass as ?cursor= for the next page; None on the last page
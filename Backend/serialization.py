@@ -0,0 +1,136 @@
+"""Fast JSON responses for large listings.
+
+The default path for ``response_model=List[X]`` endpoints loads ORM
+objects, validates each through the Pydantic model (``from_attributes``), runs
+``jsonable_encoder`` over the result and encodes it with ``json``. For pages
+of thousands of rows that is most of the request's CPU.
+
+``RowEncoder`` works out once, at import time, which model columns a response
+schema needs. Endpoints select just those columns with Core and return
+``encoder.response(rows)``: every row becomes a dict keyed by the schema's
+field names, and orjson encodes the list in one call. The endpoints keep
+their ``response_model`` so OpenAPI is unchanged; FastAPI does not re-validate
+a returned Response.
+
+Benchmark against the default path (1,000-row flight listing):
+    python serialization.py --rows 1000 --repeat 20
+"""
+import argparse
+import json
+import time
+from decimal import Decimal
+from typing import Any, Dict, Iterable, List, Type
+
+import orjson
+from fastapi.responses import Response
+from pydantic import BaseModel
+from sqlalchemy import select
+
+import models
+import schemas
+
+ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+
+def _default(value: Any):
+    """Types orjson does not handle natively"""
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, BaseModel):
+        return value.model_dump(mode="json")
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+
+def dumps(content: Any) -> bytes:
+    """orjson encoding; dicts, lists, dataclasses, datetimes and enums go through natively"""
+    return orjson.dumps(content, default=_default, option=ORJSON_OPTIONS)
+
+
+class ORJSONResponse(Response):
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+class RowEncoder:
+    """Response rows for a schema, straight from the database columns it names"""
+
+    def __init__(self, schema: Type[BaseModel], model, **columns):
+        self.schema = schema
+        self.keys = tuple(schema.model_fields)
+        # Fields the model does not have as a same-named column are passed in explicitly
+        self.columns = [columns[key] if key in columns else getattr(model, key) for key in self.keys]
+
+    def select(self):
+        return select(*self.columns)
+
+    def rows(self, rows: Iterable) -> List[Dict]:
+        keys = self.keys
+        return [dict(zip(keys, row)) for row in rows]
+
+    def response(self, rows: Iterable, status_code: int = 200) -> ORJSONResponse:
+        return ORJSONResponse(self.rows(rows), status_code=status_code)
+
+
+FLIGHTS = RowEncoder(schemas.FlightPublic, models.Flight)
+PASSENGERS = RowEncoder(schemas.PassengerPublic, models.Passenger)
+AIRPORTS = RowEncoder(schemas.AirportPublic, models.Airport)
+FARE_CALENDAR = RowEncoder(schemas.FareCalendarDayPublic, models.FareCalendarDay)
+
+
+def compare_flight_listing(session, rows: int = 1000, repeat: int = 20) -> Dict[str, float]:
+    """Median milliseconds per listing: ORM + Pydantic + jsonable_encoder vs. Core rows + orjson"""
+    from fastapi.encoders import jsonable_encoder
+    from pydantic import TypeAdapter
+
+    adapter = TypeAdapter(List[schemas.FlightPublic])
+
+    def default_path() -> bytes:
+        flights = session.query(models.Flight).limit(rows).all()
+        validated = adapter.validate_python(flights, from_attributes=True)
+        return json.dumps(jsonable_encoder(validated), ensure_ascii=False, separators=(",", ":")).encode()
+
+    def fast_path() -> bytes:
+        return FLIGHTS.response(session.execute(FLIGHTS.select().limit(rows))).body
+
+    timings = {}
+    for name, path in (("default", default_path), ("orjson", fast_path)):
+        samples = []
+        for _ in range(repeat):
+            session.expunge_all()
+            started = time.perf_counter()
+            body = path()
+            samples.append((time.perf_counter() - started) * 1000)
+        samples.sort()
+        timings[f"{name}_ms"] = round(samples[len(samples) // 2], 3)
+        timings[f"{name}_bytes"] = len(body)
+    timings["rows"] = len(json.loads(body))
+    timings["speedup"] = round(timings["default_ms"] / timings["orjson_ms"], 2) if timings["orjson_ms"] else None
+    return timings
+
+
+def main(argv=None):
+    from database import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Benchmark flight listing serialization")
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args(argv)
+
+    session = SessionLocal()
+    try:
+        available = session.query(models.Flight).count()
+        if available < args.rows:
+            print(f"Only {available} flights in the database; generate more with data_generator.py")
+        result = compare_flight_listing(session, args.rows, args.repeat)
+    finally:
+        session.close()
+    print(f"{result['rows']} flights: default {result['default_ms']} ms, orjson {result['orjson_ms']} ms "
+          f"({result['speedup']}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""Startup-time budget for the API worker.
+
+Imports ``main`` in fresh interpreters under ``python -X importtime`` and
+fails when the median import time goes over budget, or when a module that
+must stay off the startup path (GUI toolkits, numeric stacks, profilers) gets
+imported eagerly again. Workers are autoscaled, so cold start time is paid
+on every scale-up.
+
+Usage:
+    python startup_check.py                  # 5 runs, default budget
+    python startup_check.py --budget-ms 600 --runs 9 --top 20
+"""
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List
+
+STARTUP_BUDGET_MS = float(os.getenv("STARTUP_BUDGET_MS", "1000"))
+# Heavy or optional packages that may only be imported on first use
+FORBIDDEN_AT_STARTUP = ("PIL", "tkinter", "pytz", "multipledispatch", "numpy", "pandas", "pyarrow", "cProfile", "pyinstrument")
+
+_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)$")
+
+
+@dataclass
+class StartupSample:
+    main_us: int
+    wall_ms: float
+    self_us: Dict[str, int] = field(default_factory=dict)
+
+
+def measure_once(module: str = "main") -> StartupSample:
+    backend_dir = os.path.dirname(os.path.abspath(__file__))
+    started = time.perf_counter()
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=backend_dir, capture_output=True, text=True, check=True
+    )
+    wall_ms = (time.perf_counter() - started) * 1000
+
+    main_us, self_us = 0, {}
+    for line in completed.stderr.splitlines():
+        match = _LINE.match(line)
+        if not match:
+            continue
+        self_time, cumulative, indent, name = match.groups()
+        self_us[name] = self_us.get(name, 0) + int(self_time)
+        if name == module and not indent:
+            main_us = int(cumulative)
+    return StartupSample(main_us, wall_ms, self_us)
+
+
+def check_startup(runs: int = 5, budget_ms: float = STARTUP_BUDGET_MS, module: str = "main") -> dict:
+    samples: List[StartupSample] = [measure_once(module) for _ in range(runs)]
+    import_ms = statistics.median(sample.main_us for sample in samples) / 1000
+    imported = samples[0].self_us
+    forbidden = sorted(
+        name for name in imported
+        if name.split(".")[0] in FORBIDDEN_AT_STARTUP
+    )
+    slowest = sorted(imported.items(), key=lambda item: item[1], reverse=True)
+    return {
+        "module": module,
+        "runs": runs,
+        "import_ms_median": round(import_ms, 1),
+        "wall_ms_median": round(statistics.median(sample.wall_ms for sample in samples), 1),
+        "budget_ms": budget_ms,
+        "over_budget": import_ms > budget_ms,
+        "forbidden_imports": forbidden,
+        "slowest_modules_ms": [(name, round(us / 1000, 2)) for name, us in slowest],
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check API worker import time against a budget")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=STARTUP_BUDGET_MS)
+    parser.add_argument("--top", type=int, default=15, help="How many of the slowest modules to list")
+    args = parser.parse_args(argv)
+
+    report = check_startup(args.runs, args.budget_ms)
+    print(f"import main: {report['import_ms_median']} ms median over {args.runs} runs "
+          f"(budget {report['budget_ms']} ms, process wall {report['wall_ms_median']} ms)")
+    print("Slowest modules (self time):")
+    for name, ms in report["slowest_modules_ms"][:args.top]:
+        print(f"  {ms:>8.2f} ms  {name}")
+
+    failed = False
+    if report["forbidden_imports"]:
+        print(f"❌ Imported at startup but should be lazy: {', '.join(report['forbidden_imports'])}")
+        failed = True
+    if report["over_budget"]:
+        print("❌ Startup import time is over budget")
+        failed = True
+    if not failed:
+        print("✅ Startup within budget")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,8 +1,24 @@
 import hashlib
 import secrets
 import binascii
-from models import User, Base
+import io
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+from models import User, Base, Promotion, Special_promotion, Country, Airport, Airline, Flight, Seat, Passenger, Reservation, \
+    FlightOccupancy, Administrator
 from database import engine, SessionLocal
+from promotions import PromotionIndex
+import schedule_import
+from data_generator import DatasetConfig, DatasetGenerator, DEFAULT_PASSWORD
+import exports
 
 def setup_database():
     """Create all tables before tests"""
@@ -12,6 +28,49 @@ def teardown_database():
     """Clean up after tests"""
     Base.metadata.drop_all(bind=engine)
 
+def make_isolated_sessionmaker():
+    """Session factory bound to a throwaway SQLite file, for tests that need
+    their own tables or real concurrent connections"""
+    fd, path = tempfile.mkstemp(suffix=".db")
+    os.close(fd)
+    test_engine = create_engine(
+        f"sqlite:///{path}",
+        connect_args={"check_same_thread": False, "timeout": 30}
+    )
+    Base.metadata.create_all(bind=test_engine)
+    _isolated_databases.append((test_engine, path))
+    return sessionmaker(bind=test_engine, autoflush=False)
+
+_isolated_databases = []  # (engine, file) of every make_isolated_sessionmaker, removed in teardown_module
+
+@contextmanager
+def isolated_client(TestSession, user=None):
+    """TestClient for the app with requests on TestSession and ``user`` as the current user"""
+    import main
+    from fastapi.testclient import TestClient
+
+    def override_get_db():
+        session = TestSession()
+        try:
+            yield session
+        finally:
+            session.close()
+
+    main.app.dependency_overrides[main.get_db] = override_get_db
+    main.app.dependency_overrides[main.get_current_user] = lambda: user
+    try:
+        yield TestClient(main.app)
+    finally:
+        main.app.dependency_overrides.clear()
+
+def teardown_module():
+    """Dispose the isolated engines and delete their database files"""
+    while _isolated_databases:
+        test_engine, path = _isolated_databases.pop()
+        test_engine.dispose()
+        if os.path.exists(path):
+            os.remove(path)
+
 def test_user_creation():
     """Test user creation and password hashing"""
     db = SessionLocal()
@@ -100,12 +159,1393 @@ def test_existing_user():
     finally:
         db.close()
 
+def test_promotion_redemption_never_oversells():
+    """Concurrent redemptions stop exactly at usage_limit"""
+    TestSession = make_isolated_sessionmaker()
+    db = TestSession()
+    now = datetime.now()
+    db.add(Promotion(
+        promo_id="FLASH", description="Flash sale", discount_percentage=20.0,
+        start_date=now - timedelta(days=1), end_date=now + timedelta(days=1),
+        promo_code="FLASH20", min_purchase=0.0, max_discount=500.0, usage_limit=25
+    ))
+    db.commit()
+    db.close()
+
+    index = PromotionIndex()
+    results = []
+
+    def redeem():
+        session = TestSession()
+        try:
+            results.append(index.redeem(session, "FLASH20", 1000.0))
+        except ValueError:
+            results.append(None)
+        finally:
+            session.close()
+
+    threads = [threading.Thread(target=redeem) for _ in range(60)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    db = TestSession()
+    try:
+        assert len([r for r in results if r is not None]) == 25
+        assert all(r == 800.0 for r in results if r is not None)
+        assert db.get(Promotion, "FLASH").usage_count == 25
+
+        # Committed edits reach the index: a raised limit, then an extension past the end date
+        db.get(Promotion, "FLASH").usage_limit = 26
+        db.commit()
+        assert index.redeem(db, "FLASH20", 1000.0) == 800.0
+        db.get(Promotion, "FLASH").usage_limit = 30
+        db.get(Promotion, "FLASH").end_date = now - timedelta(hours=1)
+        db.commit()
+        try:
+            index.redeem(db, "FLASH20", 1000.0)
+            assert False, "Should have rejected the ended promotion"
+        except ValueError:
+            pass
+        Promotion.extend_promotion(db, "FLASH", now + timedelta(days=2))
+        assert index.redeem(db, "FLASH20", 1000.0) == 800.0
+
+        # Both redemption paths stack a special promotion's extra bonus
+        db.add(Special_promotion("BONUS", "Bonus sale", 10.0, now - timedelta(days=1), now + timedelta(days=1),
+                                 "BONUS15", 0.0, 500.0, 10, 5.0))
+        db.commit()
+        assert index.redeem(db, "BONUS15", 1000.0) == Promotion.apply_discount(db, "BONUS", 1000.0) == 850.0
+
+        # Unknown codes are answered from memory until a promotion with that code is committed
+        from sqlalchemy import event
+        statements = []
+        test_engine = TestSession.kw["bind"]
+
+        def record(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        event.listen(test_engine, "before_cursor_execute", record)
+        try:
+            for _ in range(3):
+                try:
+                    index.redeem(db, "LATER10", 1000.0)
+                    assert False, "LATER10 does not exist yet"
+                except ValueError:
+                    pass
+            assert len([s for s in statements if "promo_code" in s]) == 1
+        finally:
+            event.remove(test_engine, "before_cursor_execute", record)
+        db.add(Promotion(promo_id="LATER", description="Later", discount_percentage=10.0,
+                         start_date=now - timedelta(days=1), end_date=now + timedelta(days=1),
+                         promo_code="LATER10", min_purchase=0.0, max_discount=500.0, usage_limit=5))
+        db.commit()
+        assert index.redeem(db, "LATER10", 1000.0) == 900.0
+    finally:
+        db.close()
+    print("✅ Promotion redemption passed")
+
+def add_reference_data(db):
+    """Minimal country/airports/airline for flight tests"""
+    db.add(Country(name="Egypt", code="EG", continent="Africa", official_language="Arabic", is_schengen_zone_member=False))
+    db.add(Airport(name="Cairo International", code="CAI", location="Cairo", country_code="EG", number_of_terminals=3))
+    db.add(Airport(name="Borg El Arab", code="HBE", location="Alexandria", country_code="EG", number_of_terminals=1))
+    db.add(Airline(name="EgyptAir", iata_code="MS", icao_code="MSR", headquarters="Cairo", year_founded=1932, base_airport_code="CAI"))
+    db.commit()
+
+def test_schedule_import_expands_days_of_operation():
+    """Weekly patterns become dated flights with seats; re-imports skip existing flights"""
+    db = make_isolated_sessionmaker()()
+    try:
+        add_reference_data(db)
+        schedule = io.StringIO(
+            "flight_number,airline_code,departure_code,destination_code,departure_time,arrival_time,"
+            "effective_from,effective_to,days_of_operation,total_seats,business_seats\n"
+            # 2026-10-19 is a Monday: Mon/Wed/Fri over two weeks is 6 flights
+            "MS701,MS,CAI,HBE,23:30,00:40,2026-10-19,2026-11-01,135,12,6\n"
+            "MS999,XX,CAI,HBE,08:00,09:00,2026-10-19,2026-11-01,1234567,12,0\n"
+        )
+        result = schedule_import.import_schedule_file(db, schedule, "csv", with_seats=True, batch_size=4)
+        assert result.flights_created == 6
+        assert result.seats_created == 6 * 12
+        assert len(result.errors) == 1 and "Unknown airline" in result.errors[0]
+
+        flights = db.query(Flight).order_by(Flight.departure_time).all()
+        assert [f.departure_time.weekday() for f in flights] == [0, 2, 4, 0, 2, 4]
+        assert flights[0].arrival_time == datetime(2026, 10, 20, 0, 40)
+        assert db.query(Seat).filter_by(flight_id=flights[0].id, class_type="business").count() == 6
+
+        schedule.seek(0)
+        rerun = schedule_import.import_schedule_file(db, schedule, "csv")
+        assert rerun.flights_created == 0 and rerun.flights_skipped == 6
+
+        # A malformed NDJSON line is reported like any invalid pattern; the rest still import
+        ndjson = io.StringIO(
+            '{"flight_number": "MS703", "airline_code": "MS", "departure_code": "CAI", "destination_code": "HBE", '
+            '"departure_time": "10:00", "arrival_time": "11:00", "effective_from": "2026-10-19", '
+            '"effective_to": "2026-10-19", "days_of_operation": 1, "total_seats": 12}\n'
+            '{"flight_number": "MS704", \n'
+            '[1, 2]\n'
+        )
+        result = schedule_import.import_schedule_file(db, ndjson, "json")
+        assert result.flights_created == 1 and result.patterns == 3
+        assert "Invalid JSON" in result.errors[0] and "Expected a JSON object" in result.errors[1]
+        broken = schedule_import.import_schedule_file(db, io.StringIO('[{"flight_number": '), "json")
+        assert broken.flights_created == 0 and "Invalid JSON" in broken.errors[0]
+    finally:
+        db.close()
+
+    # Imports write to the shared schedule: administrators only
+    import main
+
+    TestSession = make_isolated_sessionmaker()
+    db = TestSession()
+    add_reference_data(db)
+    db.add(Administrator("ADM1", "Ops", "operations", "ops@example.com", True))
+    db.commit()
+    db.close()
+    upload = {"file": ("schedule.csv", schedule.getvalue().encode(), "text/csv")}
+    with isolated_client(TestSession, User("someone", "user@example.com", "Secret123")) as client:
+        assert client.post("/flights/import", files=upload).status_code == 403
+        main.app.dependency_overrides[main.get_current_user] = lambda: User("ops", "ops@example.com", "Secret123")
+        response = client.post("/flights/import", files=upload)
+        assert response.status_code == 200 and response.json()["flights_created"] == 6, response.text
+    print("✅ Schedule import passed")
+
+def test_data_generator_is_deterministic():
+    """Same seed, same rows; generated users can log in"""
+    config = DatasetConfig(seed=7, countries=3, airports=6, airlines=2, routes=4, days=7,
+                           seats_per_flight=12, business_seats=2, passengers=40, users=3)
+    snapshots = []
+    for _ in range(2):
+        db = make_isolated_sessionmaker()()
+        try:
+            counts = DatasetGenerator(db, config, verbose=False).generate()
+            snapshots.append((
+                counts,
+                [tuple(row) for row in db.execute(text("SELECT * FROM reservations ORDER BY id"))],
+                [tuple(row) for row in db.execute(text("SELECT * FROM users ORDER BY id"))],
+            ))
+            user = db.query(User).filter_by(username="loaduser0").first()
+            assert user.verify_password(DEFAULT_PASSWORD)
+        finally:
+            db.close()
+
+    assert snapshots[0] == snapshots[1]
+    # A second run into the same database would collide on the generated codes
+    db = make_isolated_sessionmaker()()
+    try:
+        DatasetGenerator(db, config, verbose=False).generate()
+        try:
+            DatasetGenerator(db, config, verbose=False).generate()
+            assert False, "generated into a non-empty database"
+        except ValueError as e:
+            assert "already has data" in str(e)
+        # Payments follow the refund rule of the API: first class only
+        assert db.execute(text("SELECT COUNT(*) FROM payments p JOIN tickets t ON t.reservation_id = p.reservation_id "
+                               "WHERE p.is_refundable AND t.ticket_class != 'first'")).scalar() == 0
+        assert db.execute(text("SELECT COUNT(*) FROM payments WHERE status = 'refunded' AND NOT is_refundable")).scalar() == 0
+    finally:
+        db.close()
+    counts = snapshots[0][0]
+    assert counts["seats"] == counts["flights"] * 12
+    assert counts["reservations"] == counts["tickets"] > 0
+    print("✅ Data generator passed")
+
+def test_benchmark_reports_latency_and_queries():
+    """In-process benchmark run produces percentiles and per-scenario query counts"""
+    import asyncio
+    import main
+    from benchmark import run_benchmark
+
+    TestSession = make_isolated_sessionmaker()
+    db = TestSession()
+    DatasetGenerator(db, DatasetConfig(seed=3, countries=2, airports=4, airlines=1, routes=3, days=3,
+                                       seats_per_flight=6, passengers=20, users=2), verbose=False).generate()
+    db.close()
+
+    with isolated_client(TestSession):
+        report = asyncio.run(run_benchmark(
+            ["search", "login"], requests=20, concurrency=4, app=main.app,
+            session_factory=TestSession, engine=TestSession.kw["bind"]
+        ))
+
+    search = report["scenarios"]["search"]
+    assert search["requests"] == 20 and search["errors"] == 0
+    assert search["latency_ms"]["p50"] <= search["latency_ms"]["p95"] <= search["latency_ms"]["p99"]
+    assert search["db_queries"] > 0  # repeated searches are answered from the response cache
+    assert report["scenarios"]["login"]["status_codes"].get("200", 0) > 0
+    print("✅ Benchmark passed")
+
+def test_profiling_middleware_server_timing_and_metrics():
+    """Profiled requests carry Server-Timing and show up in /debug/metrics"""
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+    import shutil
+    import profiling
+
+    TestSession = make_isolated_sessionmaker()
+    app = FastAPI()
+    profiling.install(app, TestSession.kw["bind"])
+    profiling.metrics.reset()
+
+    @app.get("/users/{username}")
+    def read_user(username: str):
+        db = TestSession()
+        try:
+            db.query(User).filter(User.username == username).first()
+            User.hash_password("Secret123")
+            return {"username": username}
+        finally:
+            db.close()
+
+    client = TestClient(app)
+    for name in ("alice", "bob"):
+        response = client.get(f"/users/{name}")
+        assert response.status_code == 200
+    timing = response.headers["server-timing"]
+    assert 'db;dur=' in timing and '"1 queries"' in timing and "hash;dur=" in timing and "serialize;dur=" in timing
+
+    routes = client.get("/debug/metrics").json()["routes"]
+    stats = routes["GET /users/{username}"]
+    assert stats["count"] == 2 and stats["db_queries_per_request"] == 1
+    assert sum(stats["histogram_ms"].values()) == 2
+
+    # A sampled request runs the endpoint under the profiler and dumps it when slow
+    settings = profiling.SAMPLE_RATE, profiling.SLOW_REQUEST_MS, profiling.DUMP_DIR
+    profiling.SAMPLE_RATE, profiling.SLOW_REQUEST_MS, profiling.DUMP_DIR = 1.0, 0, tempfile.mkdtemp()
+    try:
+        assert client.get("/users/carol").json() == {"username": "carol"}
+        assert [name.endswith(".prof") for name in os.listdir(profiling.DUMP_DIR)] == [True]
+    finally:
+        shutil.rmtree(profiling.DUMP_DIR)
+        profiling.SAMPLE_RATE, profiling.SLOW_REQUEST_MS, profiling.DUMP_DIR = settings
+    print("✅ Profiling middleware passed")
+
+def test_startup_imports_stay_light():
+    """Importing the API must not pull in optional heavy packages"""
+    from startup_check import STARTUP_BUDGET_MS, check_startup
+
+    # Headroom for a loaded test machine; a regression that pulls in a heavy package still fails
+    report = check_startup(runs=3, budget_ms=STARTUP_BUDGET_MS * 1.5)
+    assert report["import_ms_median"] > 0
+    assert not report["over_budget"], (report["import_ms_median"], report["slowest_modules_ms"][:10])
+    assert report["forbidden_imports"] == [], report["forbidden_imports"]
+    # The models (and profiling.span they use) stay usable without the web stack, e.g. from cron scripts
+    import subprocess
+    import sys
+    check = "import sys, models; print('fastapi' in sys.modules)"
+    assert subprocess.run([sys.executable, "-c", check], cwd=os.path.dirname(os.path.abspath(__file__)),
+                          capture_output=True, text=True, check=True).stdout.strip() == "False"
+    print("✅ Startup import check passed")
+
+def test_exports_stream_joined_rows():
+    """Every format streams every reservation, in small batches, with joined columns"""
+    import csv
+    import json
+
+    TestSession = make_isolated_sessionmaker()
+    config = DatasetConfig(seed=3, countries=2, airports=4, airlines=2, routes=3, days=3,
+                           seats_per_flight=12, business_seats=2, passengers=20, users=1)
+    db = TestSession()
+    try:
+        DatasetGenerator(db, config, verbose=False).generate()
+        total = db.execute(text("SELECT COUNT(*) FROM reservations")).scalar()
+        flight_total = db.execute(text("SELECT COUNT(*) FROM flights")).scalar()
+    finally:
+        db.close()
+
+    query = exports.reservation_export_query()
+    chunks = list(exports.stream_export(TestSession, query, "ndjson", batch_size=5))
+    rows = [json.loads(line) for chunk in chunks for line in chunk.decode().splitlines()]
+    assert len(rows) == total and len(chunks) >= total // 5
+    assert rows[0]["passenger_name"] and rows[0]["flight_number"]
+
+    body = b"".join(exports.stream_export(TestSession, query, "csv", batch_size=5)).decode()
+    assert len(list(csv.DictReader(io.StringIO(body)))) == total
+
+    batches = [json.loads(line) for chunk in exports.stream_export(TestSession, query, "columnar", batch_size=5)
+               for line in chunk.decode().splitlines()]
+    assert sum(batch["rows"] for batch in batches) == total
+
+    try:
+        import pyarrow.parquet as pq
+    except ImportError:
+        pq = None
+    if pq is not None:
+        data = b"".join(exports.stream_export(TestSession, exports.flight_export_query(), "parquet", batch_size=5))
+        table = pq.read_table(io.BytesIO(data))
+        assert table.num_rows == flight_total
+        assert "airline_name" in table.column_names
+
+    # Exports carry passenger PII: administrators with management access only
+    import main
+
+    db = TestSession()
+    db.add(Administrator("ADM1", "Ops", "operations", "ops@example.com", True))
+    db.add(Administrator("ADM2", "Viewer", "support", "support@example.com", False))
+    db.commit()
+    db.close()
+    with isolated_client(TestSession) as client:
+        for email, expected in (("ops@example.com", 200), ("support@example.com", 403), ("user@example.com", 403)):
+            main.app.dependency_overrides[main.get_current_user] = lambda email=email: User("someone", email, "Secret123")
+            response = client.get("/admin/exports/flights", params={"format": "csv"})
+            assert response.status_code == expected, (email, response.status_code)
+            assert client.get("/admin/exports/reservations").status_code == expected
+    print("✅ Streaming exports passed")
+
+def add_bookable_flight(db, passengers=1):
+    """Reference data plus one 4-seat flight (seats 1A-1D) and some passengers; returns the flight id"""
+    add_reference_data(db)
+    flight = Flight("MS701", "CAI", "HBE", datetime(2026, 10, 19, 8), datetime(2026, 10, 19, 9), 4, "A1", "1", 1, 1)
+    flight.user_id = 1
+    db.add(flight)
+    for i in range(passengers):
+        db.add(Passenger(f"Passenger {i}", f"NID1234{i}", f"passenger{i}@example.com", "+201000000", "Egypt", False,
+                         None, datetime(1990, 1, 1), f"P123456{i}", "Female", None))
+    db.commit()
+    db.add_all([Seat(f"1{letter}", "economy", True, "window", flight.id) for letter in "ABCD"])
+    db.commit()
+    return flight.id
+
+def test_occupancy_counters_follow_reservations():
+    """Booking, confirming and canceling keep counters and available_seats in step"""
+    TestSession = make_isolated_sessionmaker()
+    db = TestSession()
+    flight_id = add_bookable_flight(db)
+    db.close()
+
+    with isolated_client(TestSession) as client:
+        for seat in ("1A", "1B", "1C"):
+            response = client.post("/reservations/", json={"passenger_id": 1, "flight_id": flight_id, "seat_number": seat})
+            assert response.status_code == 200, response.text
+
+        db = TestSession()
+        reservations = db.query(Reservation).order_by(Reservation.id).all()
+        reservations[0].confirm()
+        db.commit()
+        Administrator.cancel_reservation(db, reservations[1].id)
+        occupancy = db.get(FlightOccupancy, flight_id)
+        assert (occupancy.pending, occupancy.confirmed, occupancy.canceled) == (1, 1, 1)
+        assert db.get(Flight, flight_id).available_seats == 2
+        # The canceled seat is on sale again
+        assert db.query(Seat).filter_by(flight_id=flight_id, seat_number="1B").one().is_available
+        db.close()
+        response = client.post("/reservations/", json={"passenger_id": 1, "flight_id": flight_id, "seat_number": "1B"})
+        assert response.status_code == 200, response.text
+        db = TestSession()
+        Administrator.cancel_reservation(db, response.json()["id"])
+        db.close()
+
+        loads = client.get("/analytics/occupancy/flights", params={"min_load_factor": 0.5}).json()
+        assert [(row["flight_id"], row["load_factor"]) for row in loads] == [(flight_id, 0.5)]
+        routes = client.get("/analytics/occupancy/route").json()
+        assert routes[0]["key"] == "CAI-HBE" and routes[0]["day"] == "2026-10-19" and routes[0]["load_factor"] == 0.5
+        assert client.get("/analytics/occupancy/galaxy").status_code == 404
+    print("✅ Occupancy counters passed")
+
+def test_batch_reservations_are_all_or_nothing():
+    """A group booking either claims every seat or leaves the flight untouched"""
+    TestSession = make_isolated_sessionmaker()
+    db = TestSession()
+    flight_id = add_bookable_flight(db, passengers=3)
+    db.close()
+
+    def group(*bookings):
+        return {"reservations": [{"passenger_id": p, "flight_id": flight_id, "seat_number": s} for p, s in bookings]}
+
+    with isolated_client(TestSession) as client:
+        response = client.post("/reservations/batch", json=group((1, "1A"), (2, "1B")))
+        assert response.status_code == 200, response.text
+        assert [r["seat_number"] for r in response.json()] == ["1A", "1B"]
+
+        # 1B is taken, so 1C must not be booked either
+        assert client.post("/reservations/batch", json=group((3, "1C"), (3, "1B"))).status_code == 400
+        assert client.post("/reservations/batch", json=group((9, "1C"))).status_code == 404
+        assert client.post("/reservations/batch", json=group((3, "9Z"))).status_code == 404
+        assert client.post("/reservations/batch", json=group((3, "1C"), (2, "1C"))).status_code == 400
+
+        db = TestSession()
+        assert db.query(Reservation).count() == 2
+        assert db.query(Seat).filter_by(flight_id=flight_id, is_available=True).count() == 2
+        assert db.get(FlightOccupancy, flight_id).pending == 2
+        assert db.get(Flight, flight_id).available_seats == 2
+        db.close()
+    print("✅ Batch reservations passed")
+
+def test_seat_holds_expire_and_can_be_booked():
+    """Holds block seats until released, extended holds survive, expired ones are reaped"""
+    import main
+    from types import SimpleNamespace
+    from holds import SeatHoldService
+
+    TestSession = make_isolated_sessionmaker()
+    db = TestSession()
+    flight_id = add_bookable_flight(db)
+    clock = [datetime(2026, 10, 19, 12, 0)]
+    service = SeatHoldService(TestSession, clock=lambda: clock[0])
+
+    service.hold(db, flight_id, ["1A", "1B"], ttl_seconds=60)
+    second = service.hold(db, flight_id, ["1C"], user_id=1, ttl_seconds=60)
+    try:
+        service.hold(db, flight_id, ["1B", "1D"])
+        assert False, "1B is already held"
+    except ValueError:
+        pass
+    assert db.query(Seat).filter_by(flight_id=flight_id, is_available=True).count() == 1
+
+    clock[0] += timedelta(seconds=45)
+    service.extend(db, second["hold_id"], ttl_seconds=60)
+    clock[0] += timedelta(seconds=30)
+    assert service.reap() == 2  # first hold expired, the extended one is still live
+    db.expire_all()
+    assert [seat.seat_number for seat in db.query(Seat).filter_by(flight_id=flight_id, is_available=True)
+            .order_by(Seat.seat_number)] == ["1A", "1B", "1D"]
+    db.close()
+
+    with isolated_client(TestSession, SimpleNamespace(id=1)) as client:
+        original_clock, main.hold_service.clock = main.hold_service.clock, lambda: clock[0]
+        try:
+            booking = {"passenger_id": 1, "flight_id": flight_id, "seat_number": "1C"}
+            assert client.post("/reservations/", json=booking).status_code == 400  # held, not for sale
+            assert client.post("/reservations/", json={**booking, "hold_id": second["hold_id"]}).status_code == 200
+            hold = client.post(f"/flights/{flight_id}/holds", json={"seat_numbers": ["1D"], "ttl_seconds": 30}).json()
+            # Another user can't extend, release or book it
+            main.app.dependency_overrides[main.get_current_user] = lambda: SimpleNamespace(id=2)
+            assert client.post(f"/holds/{hold['hold_id']}/extend", json={"ttl_seconds": 60}).status_code == 404
+            assert client.delete(f"/holds/{hold['hold_id']}").status_code == 404
+            stolen = {**booking, "seat_number": "1D", "hold_id": hold["hold_id"]}
+            assert client.post("/reservations/", json=stolen).status_code == 400
+            main.app.dependency_overrides[main.get_current_user] = lambda: SimpleNamespace(id=1)
+            assert client.post(f"/holds/{hold['hold_id']}/extend", json={"ttl_seconds": 60}).status_code == 200
+            assert client.delete(f"/holds/{hold['hold_id']}").json() == {"released": 1}
+            assert client.delete(f"/holds/{hold['hold_id']}").status_code == 404
+        finally:
+            main.hold_service.clock = original_clock
+    clock[0] += timedelta(hours=1)
+    assert service.sweep() == 0  # the booked seat left the hold, nothing else is held
+    print("✅ Seat holds passed")
+
+def test_idempotency_key_replays_instead_of_rebooking():
+    """Retries with the same key get the first response; concurrent duplicates book once"""
+    import main
+    from fastapi.testclient import TestClient
+
+    TestSession = make_isolated_sessionmaker()
+    db = TestSession()
+    flight_id = add_bookable_flight(db)
+    db.close()
+
+    with isolated_client(TestSession) as client:
+        original_factory, main.idempotency_store.session_factory = main.idempotency_store.session_factory, TestSession
+        try:
+            booking = {"passenger_id": 1, "flight_id": flight_id, "seat_number": "1A"}
+            first = client.post("/reservations/", json=booking, headers={"Idempotency-Key": "retry-1"})
+            retry = client.post("/reservations/", json=booking,
+                                headers={"Idempotency-Key": "retry-1", "Origin": "http://localhost:3000"})
+            assert first.status_code == retry.status_code == 200
+            assert retry.json() == first.json() and retry.headers["idempotent-replayed"] == "true"
+            # CORS wraps the middleware, so the browser can read replays and key errors
+            assert retry.headers["access-control-allow-origin"]
+            too_long = client.post("/reservations/", json=booking,
+                                   headers={"Idempotency-Key": "k" * 1000, "Origin": "http://localhost:3000"})
+            assert too_long.status_code == 400 and too_long.headers["access-control-allow-origin"]
+            other = client.post("/reservations/", json={**booking, "seat_number": "1B"}, headers={"Idempotency-Key": "retry-1"})
+            assert other.status_code == 422
+
+            results = []
+            barrier = threading.Barrier(4)
+
+            def send():
+                barrier.wait()
+                response = TestClient(main.app).post("/reservations/", json={**booking, "seat_number": "1C"},
+                                                     headers={"Idempotency-Key": "storm"})
+                results.append((response.status_code, response.json().get("id")))
+
+            threads = [threading.Thread(target=send) for _ in range(4)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            assert len(set(results)) == 1 and results[0][0] == 200, results
+
+            db = TestSession()
+            assert db.query(Reservation).count() == 2
+            db.close()
+        finally:
+            main.idempotency_store.session_factory = original_factory
+
+    # A worker that dies mid-request leaves its claim behind; retries take it over once the lease lapses
+    from idempotency import IdempotencyStore
+
+    clock = [datetime(2026, 10, 19, 12, 0)]
+    store = IdempotencyStore(TestSession, clock=lambda: clock[0], lease=timedelta(seconds=30))
+    assert store.claim("crash", "body") == ("new", None)
+    assert store.claim("crash", "body") == ("in_progress", None) and store.is_claimed("crash")
+    clock[0] += timedelta(seconds=31)
+    assert not store.is_claimed("crash")
+    assert store.claim("crash", "other body") == ("mismatch", None)
+    assert store.claim("crash", "body") == ("new", None)
+    assert store.claim("crash", "body") == ("in_progress", None)  # under the new lease
+    store.complete("crash", 200, "application/json", b"{}")
+    clock[0] += timedelta(hours=1)
+    assert store.claim("crash", "body")[0] == "done"
+    print("✅ Idempotency keys passed")
+
+def test_payments_are_queued_and_processed_in_batches():
+    """Payments return at once as pending; the worker pool settles them, retrying transient errors"""
+    from models import Payment
+    from payment_queue import FakeGateway, GatewayResult, PaymentWorkerPool
+
+    TestSession = make_isolated_sessionmaker()
+    db = TestSession()
+    flight_id = add_bookable_flight(db)
+    db.close()
+
+    class FlakyGateway(FakeGateway):
+        """Times out on the first charge, then behaves"""
+        def charge(self, payment_id, amount, currency, method):
+            if self.calls == 0:
+                self.calls += 1
+                return GatewayResult(False, error="Gateway timeout", retryable=True)
+            return super().charge(payment_id, amount, currency, method)
+
+    with isolated_client(TestSession) as client:
+        client.post("/reservations/", json={"passenger_id": 1, "flight_id": flight_id, "seat_number": "1A"})
+        client.post("/reservations/", json={"passenger_id": 1, "flight_id": flight_id, "seat_number": "1B"})
+        # Reservation 1 holds a refundable (first class) ticket, reservation 2 none
+        db = TestSession()
+        db.execute(text("INSERT INTO tickets (passenger_id, flight_id, reservation_id, seat_number, ticket_class, "
+                        "status, base_price, final_price) "
+                        "VALUES (1, :flight, 1, '1A', 'first', 'active', 6000, 6000)"), {"flight": flight_id})
+        db.commit()
+        db.close()
+        payment = {"amount": 1000, "method": "credit card", "reservation_id": 1, "currency": "EGP"}
+        created = [client.post("/payments/", json=payment) for _ in range(3)]
+        assert all(response.status_code == 202 for response in created)
+        assert client.post("/payments/", json={**payment, "reservation_id": 99}).status_code == 404
+        payment_ids = [response.json()["payment_id"] for response in created]
+        assert client.get(f"/payments/{payment_ids[0]}").json()["job_state"] == "queued"
+
+        clock = [datetime.now()]
+        pool = PaymentWorkerPool(TestSession, FlakyGateway(), workers=2, batch_size=10, clock=lambda: clock[0])
+        assert pool.drain() == 3  # one batch; the timed-out job waits for its backoff
+        statuses = [client.get(f"/payments/{payment_id}").json() for payment_id in payment_ids]
+        assert sorted(s["status"] for s in statuses) == ["completed", "completed", "pending"]
+        clock[0] += timedelta(minutes=1)
+        assert pool.drain() == 1
+        statuses = [client.get(f"/payments/{payment_id}").json() for payment_id in payment_ids]
+        assert all(s["status"] == "completed" and s["transaction_id"] for s in statuses)
+
+        assert client.post(f"/payments/{payment_ids[0]}/refund").json()["status"] == "refund_pending"
+        assert client.post(f"/payments/{payment_ids[0]}/refund").status_code == 400
+        pool.drain()
+        refunded = client.get(f"/payments/{payment_ids[0]}").json()
+        assert refunded["status"] == "refunded" and refunded["payment_date"] == statuses[0]["payment_date"]
+
+        # Canceling the reservation queues refunds of its other payments the same way
+        db = TestSession()
+        assert db.get(Reservation, 1).cancel()
+        db.commit()
+        assert {db.get(Payment, payment_id).status for payment_id in payment_ids[1:]} == {"refund_pending"}
+        db.close()
+        assert pool.drain() == 2
+        assert all(client.get(f"/payments/{payment_id}").json()["status"] == "refunded" for payment_id in payment_ids)
+
+        # Non-refundable payments can't be refunded; declined charges get no payment date
+        other = client.post("/payments/", json={**payment, "reservation_id": 2}).json()["payment_id"]
+        pool.drain()
+        assert client.post(f"/payments/{other}/refund").json()["detail"] == "Payment is not refundable"
+        declined = client.post("/payments/", json={**payment, "reservation_id": 2}).json()["payment_id"]
+        PaymentWorkerPool(TestSession, FakeGateway(decline_rate=1.0), clock=lambda: clock[0]).drain()
+        assert client.get(f"/payments/{declined}").json()["status"] == "failed"
+        assert client.get(f"/payments/{declined}").json()["payment_date"] is None
+    print("✅ Payment queue passed")
+
+def test_outbox_delivers_reservation_changes_at_least_once():
+    """State changes land in the outbox in their own transaction; offsets resume and survive failures"""
+    from outbox import OutboxDispatcher
+
+    TestSession = make_isolated_sessionmaker()
+    db = TestSession()
+    flight_id = add_bookable_flight(db, passengers=2)
+    db.close()
+
+    with isolated_client(TestSession) as client:
+        client.post("/reservations/", json={"passenger_id": 1, "flight_id": flight_id, "seat_number": "1A"})
+        client.post("/reservations/batch", json={"reservations": [
+            {"passenger_id": 2, "flight_id": flight_id, "seat_number": "1B"},
+            {"passenger_id": 2, "flight_id": flight_id, "seat_number": "1C"},
+        ]})
+        db = TestSession()
+        Administrator.approve_reservation(db, 1)
+        Administrator.cancel_reservation(db, 2)
+        db.close()
+
+        page = client.get("/events/reservation", params={"limit": 3}).json()
+        assert [e["event_type"] for e in page["events"]] == ["reservation.created"] * 3
+        rest = client.get("/events/reservation", params={"after": page["next_offset"]}).json()
+        assert [e["event_type"] for e in rest["events"]] == ["reservation.confirmed", "reservation.canceled"]
+        assert rest["events"][1]["payload"]["previous_status"] == "Pending"
+
+    received, calls = [], []
+
+    def flaky_consumer(events):
+        calls.append(len(events))
+        if len(calls) == 1:
+            raise RuntimeError("consumer down")
+        received.extend(event.id for event in events)
+
+    dispatcher = OutboxDispatcher(TestSession, batch_size=2)
+    dispatcher.subscribe("loyalty", flaky_consumer)
+    dispatcher.dispatch_once()  # fails: the offset stays put
+    assert received == [] and dispatcher.subscriptions["loyalty"].last_error
+    dispatcher.dispatch_once()
+    assert received == [1, 2]
+
+    restarted = OutboxDispatcher(TestSession, batch_size=2)  # a new process resumes from the stored offset
+    restarted.subscribe("loyalty", lambda events: received.extend(event.id for event in events))
+    assert restarted.drain() == 3
+    assert received == [1, 2, 3, 4, 5]
+
+    # Pruning runs at most once per interval and only deletes events past the retention
+    now = datetime.now()
+    assert restarted.prune_if_due(now) == 0
+    assert restarted.prune_if_due(now + timedelta(days=30)) == 5
+    assert restarted.prune_if_due(now + timedelta(days=30, minutes=1)) == 0  # not due again yet
+    print("✅ Outbox passed")
+
+def test_loyalty_accrual_credits_departed_flights_once():
+    """One batch credits every departed confirmed reservation, upgrades tiers, and is a no-op when re-run"""
+    import loyalty
+    from sqlalchemy import insert
+    from models import Loyalty_program, LoyaltyLedgerEntry, Ticket
+
+    TestSession = make_isolated_sessionmaker()
+    db = TestSession()
+    flight_id = add_bookable_flight(db, passengers=3)
+    flight = db.get(Flight, flight_id)
+    passengers = db.query(Passenger).order_by(Passenger.id).all()
+    db.add_all([
+        Loyalty_program("SkyMiles", passengers[0], 24000, [], datetime(2020, 1, 1), "Blue", 25000),
+        Loyalty_program("SkyMiles", passengers[1], 0, [], datetime(2020, 1, 1), "Blue", 25000),
+    ])
+    reservations = [Reservation(passenger, flight, seat, "Confirmed") for passenger, seat in zip(passengers, "ABC")]
+    reservations[0].final_price, reservations[1].final_price, reservations[2].final_price = 1000.0, 800.0, 500.0
+    db.add_all(reservations)
+    db.commit()
+    db.execute(insert(Ticket.__table__).values(reservation_id=reservations[0].id, ticket_class="business"))
+    db.commit()
+
+    assert loyalty.accrue_departed_flights(db, until=datetime(2026, 10, 18))["entries"] == 0  # not flown yet
+    result = loyalty.accrue_departed_flights(db, until=datetime(2026, 10, 20))
+    # Passenger 3 has no program; business earns 1.5x
+    assert result == {"entries": 2, "points": 2300, "programs": 2, "upgrades": 1}, result
+    assert loyalty.accrue_departed_flights(db, until=datetime(2026, 10, 21))["entries"] == 0
+
+    db.expire_all()
+    frequent, plain = db.query(Loyalty_program).order_by(Loyalty_program.id).all()
+    assert (frequent.points, frequent.tier_level, frequent.required_points_for_next_tier) == (25500, "Silver", 50000)
+    assert (plain.points, plain.tier_level) == (800, "Blue")
+
+    plain.redeem_points(300, "Lounge pass")
+    db.commit()
+    ledger = db.query(LoyaltyLedgerEntry).filter_by(program_id=plain.id).order_by(LoyaltyLedgerEntry.id).all()
+    assert [(entry.entry_type, entry.points) for entry in ledger] == [("accrual", 800), ("redemption", -300)]
+    assert sum(entry.points for entry in ledger) == plain.points
+    db.add(Administrator("ADM1", "Ops", "operations", "ops@example.com", True))
+    db.commit()
+    db.close()
+
+    # The network-wide batch is an admin operation
+    import main
+
+    with isolated_client(TestSession) as client:
+        main.app.dependency_overrides[main.get_current_user] = lambda: User("someone", "user@example.com", "Secret123")
+        assert client.post("/loyalty/accruals/run").status_code == 403
+        main.app.dependency_overrides[main.get_current_user] = lambda: User("ops", "ops@example.com", "Secret123")
+        response = client.post("/loyalty/accruals/run")
+        assert response.status_code == 200 and response.json()["entries"] == 0, response.text
+    print("✅ Loyalty accrual passed")
+
+def test_seat_features_are_filtered_in_sql():
+    """Features live in their own indexed table; old JSON values are migrated and accessors still work"""
+    from sqlalchemy import select, text
+    import migrations
+    from models import Loyalty_program
+    from models.flights import migrate_seat_features
+    from models.passengers import migrate_loyalty_rewards
+
+    TestSession = make_isolated_sessionmaker()
+    db = TestSession()
+    flight_id = add_bookable_flight(db)
+    seats = {seat.seat_number: seat for seat in db.query(Seat).filter_by(flight_id=flight_id)}
+    seats["1A"].additional_features = ["Extra Legroom", "power_outlet"]
+    seats["1B"].additional_features = ["extra legroom"]
+    seats["1B"].seat_type = "aisle"
+    seats["1D"].additional_features = ["power outlet"]
+    db.add(Loyalty_program("SkyMiles", db.query(Passenger).first(), 0, ["lounge", "upgrade"], datetime(2020, 1, 1),
+                           "Blue", 25000))
+    db.commit()
+
+    # A database from before the change still has the JSON column
+    db.execute(text("ALTER TABLE seats ADD COLUMN additional_features TEXT"))
+    db.execute(text("UPDATE seats SET additional_features = '[\"Extra legroom\", \"bassinet\"]' WHERE seat_number = '1C'"))
+    db.execute(text("UPDATE seats SET additional_features = '[\"power' WHERE seat_number = '1D'"))
+    assert migrate_seat_features(db.connection(), migrations.rejecter(db.connection(), 1, "seats", "additional_features")) == 2
+    # Loyalty_program.__init__ used to store json.dumps(None) as 'null'
+    db.execute(text("ALTER TABLE loyalty_programs ADD COLUMN available_rewards TEXT"))
+    db.execute(text("UPDATE loyalty_programs SET available_rewards = 'null'"))
+    assert migrate_loyalty_rewards(db.connection()) == 0
+    # A malformed value is set aside instead of failing the migration
+    db.execute(text("UPDATE loyalty_programs SET available_rewards = '{broken'"))
+    reject = migrations.rejecter(db.connection(), 1, "loyalty_programs", "available_rewards")
+    assert migrate_loyalty_rewards(db.connection(), reject) == 0
+    rejected = db.execute(select(migrations.rejected_values.c.table_name, migrations.rejected_values.c.value)).all()
+    assert rejected == [("seats", '["power'), ("loyalty_programs", "{broken")]
+    assert db.execute(text("SELECT count(*) FROM seats WHERE additional_features IS NOT NULL")).scalar() == 0
+    db.commit()
+    db.expire_all()
+    assert db.query(Seat).filter_by(flight_id=flight_id, seat_number="1C").one().get_additional_features() == \
+        ["bassinet", "extra legroom"]
+    assert Loyalty_program.with_reward(db, "lounge")[0].get_available_rewards() == ["lounge", "upgrade"]
+    db.close()
+
+    with isolated_client(TestSession) as client:
+        response = client.get(f"/flights/{flight_id}/seats", params={"seat_type": "window", "feature": "extra legroom"})
+        assert response.status_code == 200, response.text
+        assert [seat["seat_number"] for seat in response.json()] == ["1A", "1C"]
+        response = client.get(f"/flights/{flight_id}/seats", params={"feature": ["extra legroom", "Power Outlet"]})
+        assert [seat["seat_number"] for seat in response.json()] == ["1A"]
+        assert response.json()[0]["additional_features"] == ["extra legroom", "power outlet"]
+        assert client.get("/flights/999/seats").status_code == 404
+    print("✅ Seat feature search passed")
+
+def test_luggage_batch_check_in_matches_single_bag_rules():
+    """A whole flight's bags are charged in one pass, with the same results as one bag at a time"""
+    from sqlalchemy import insert
+    from models import Luggage, Ticket
+
+    TestSession = make_isolated_sessionmaker()
+    db = TestSession()
+    flight_id = add_bookable_flight(db)
+    classes = ["economy", "economy", "Business", "first", "premium economy", "economy"]
+    weights = [18.0, 26.5, 35.0, 41.0, 22.0, 55.0]
+    tickets = db.execute(insert(Ticket.__table__).returning(Ticket.__table__.c.ticket_number, sort_by_parameter_order=True),
+                         [{"flight_id": flight_id, "ticket_class": ticket_class} for ticket_class in classes]).scalars().all()
+    db.execute(insert(Luggage.__table__), [
+        {"luggage_id": f"BAG{i}", "ticket_id": ticket, "weight": 0.0, "status": "Pending", "is_fragile": i == 2}
+        for i, ticket in enumerate(tickets)
+    ])
+    db.commit()
+    db.close()
+
+    with isolated_client(TestSession) as client:
+        bags = [{"luggage_id": f"BAG{i}", "weight": weight} for i, weight in enumerate(weights)]
+        response = client.post(f"/flights/{flight_id}/luggage/batch", json={"bags": bags})
+        assert response.status_code == 200, response.text
+        charged = response.json()
+        assert client.post("/flights/999/luggage/batch", json={"bags": bags[:1]}).status_code == 404
+
+    for bag, ticket_class, weight in zip(charged, classes, weights):
+        single = Luggage(bag["luggage_id"], None, None, weight, ticket_class, 0, is_fragile=bag["is_fragile"])
+        single.update_luggage_status()
+        assert (bag["weight_status"], bag["luggage_fee"], bag["fine"], bag["status"]) == \
+            (single.weight_status, single.luggage_fee, single.fine, single.status), (bag, single.luggage_fee)
+    assert [bag["allowance"] for bag in charged] == [20, 20, 30, 40, 20, 20]
+    assert [bag["luggage_fee"] for bag in charged] == [0, 65, 50, 10, 20, 100]
+
+    db = TestSession()
+    stored = db.get(Luggage, "BAG5")
+    assert (stored.is_checked_in, stored.luggage_fee, stored.fine, stored.status) == (True, 100, 100, "Overweight")
+    db.close()
+    print("✅ Luggage batch check-in passed")
+
+def test_luggage_scans_build_a_queryable_journey():
+    """Scans are appended in batches and answer "where has this bag been" and "what is on this belt\""""
+    from sqlalchemy import insert
+    from models import Luggage
+
+    TestSession = make_isolated_sessionmaker()
+    db = TestSession()
+    add_reference_data(db)
+    db.execute(insert(Luggage.__table__), [{"luggage_id": f"BAG{i}", "weight": 20.0, "status": "Pending"} for i in range(3)])
+    db.commit()
+    bag = db.get(Luggage, "BAG0")
+    bag.status = "Approved - Fragile item so handle with care."
+    bag.track_luggage_status("CAI")
+    db.commit()
+    db.close()
+
+    with isolated_client(TestSession) as client:
+        start = datetime.now()  # after the check-in tracked above
+        scans = [
+            {"luggage_id": "BAG0", "status": "loaded", "airport_code": "CAI", "scanned_at": str(start + timedelta(minutes=30))},
+            {"luggage_id": "BAG1", "status": "loaded", "airport_code": "CAI", "scanned_at": str(start + timedelta(minutes=31))},
+            {"luggage_id": "BAG2", "status": "on belt", "airport_code": "hbe", "scanned_at": str(start + timedelta(hours=2))},
+            {"luggage_id": "BAG0", "status": "ON_BELT", "airport_code": "HBE", "scanned_at": str(start + timedelta(hours=2))},
+        ]
+        response = client.post("/luggage/events", json={"scans": scans})
+        assert response.status_code == 201, response.text
+        assert response.json() == {"recorded": 4}
+        bad = client.post("/luggage/events", json={"scans": [{"luggage_id": "NOPE", "status": "loaded"}]})
+        assert bad.status_code == 404
+        assert client.post("/luggage/events", json={"scans": [{"luggage_id": "BAG1", "status": "teleported"}]}).status_code == 400
+
+        journey = client.get("/luggage/BAG0/events").json()
+        assert [(e["status"], e["airport_code"]) for e in journey[1:]] == [("loaded", "CAI"), ("on_belt", "HBE")]
+        on_belt = client.get("/airports/HBE/luggage", params={"status": "on belt"}).json()
+        assert sorted(e["luggage_id"] for e in on_belt) == ["BAG0", "BAG2"]
+        # BAG0 has moved on from CAI, so only BAG1 is still loaded there
+        assert [e["luggage_id"] for e in client.get("/airports/CAI/luggage", params={"status": "loaded"}).json()] == ["BAG1"]
+
+    db = TestSession()
+    history = db.get(Luggage, "BAG0").tracking_history
+    assert len(history) == 3 and history[0].endswith("approved") and history[-1].endswith("on_belt")
+    db.close()
+    print("✅ Luggage event log passed")
+
+def test_orjson_listings_match_the_pydantic_output():
+    """Row-based orjson listings produce the same JSON as validating ORM objects through the schemas"""
+    import serialization
+    from typing import List
+    from pydantic import TypeAdapter
+    import schemas
+
+    TestSession = make_isolated_sessionmaker()
+    db = TestSession()
+    add_bookable_flight(db, passengers=2)
+    for hour in (10, 12, 14):
+        flight = Flight(f"MS7{hour}", "CAI", "HBE", datetime(2026, 10, 20, hour), datetime(2026, 10, 20, hour + 1),
+                        120, "B2", "2", 1, 1)
+        flight.user_id = 1
+        db.add(flight)
+    db.commit()
+    expected_flights = TypeAdapter(List[schemas.FlightPublic]).dump_python(
+        db.query(Flight).order_by(Flight.id).all(), mode="json")
+    expected_passengers = TypeAdapter(List[schemas.PassengerPublic]).dump_python(
+        db.query(Passenger).order_by(Passenger.id).all(), mode="json")
+    timings = serialization.compare_flight_listing(db, rows=1000, repeat=3)
+    assert timings["rows"] == 4 and timings["default_bytes"] == timings["orjson_bytes"]
+    db.close()
+
+    with isolated_client(TestSession) as client:
+        response = client.get("/flights/")
+        assert response.headers["content-type"] == "application/json"
+        assert response.json() == expected_flights
+        assert client.get("/flights/", params={"departure_date": "2026-10-20T11:00:00"}).json() == expected_flights[2:]
+        assert client.get("/passengers/").json() == expected_passengers
+        assert "FlightPublic" in client.get("/openapi.json").text
+    print("✅ orjson serialization passed")
+
+def test_read_endpoints_answer_conditional_gets():
+    """Unchanged listings come from the cache and 304 on a matching ETag; a booking invalidates flights"""
+    from response_cache import response_cache
+
+    TestSession = make_isolated_sessionmaker()
+    db = TestSession()
+    flight_id = add_bookable_flight(db)
+    db.close()
+    response_cache.clear()
+
+    with isolated_client(TestSession) as client:
+        params = {"departure_code": "CAI", "destination_code": "HBE"}
+        first = client.get("/flights/", params=params)
+        etag = first.headers["etag"]
+        assert first.headers["cache-control"] == "public, max-age=5, must-revalidate"
+        hits = response_cache.hits
+        # Same search, parameters in another order
+        second = client.get("/flights/?destination_code=HBE&departure_code=CAI")
+        assert second.content == first.content and response_cache.hits == hits + 1
+        not_modified = client.get("/flights/", params=params, headers={"If-None-Match": etag})
+        assert not_modified.status_code == 304 and not_modified.content == b"" and not_modified.headers["etag"] == etag
+
+        assert client.post("/reservations/", json={"passenger_id": 1, "flight_id": flight_id, "seat_number": "1A"}).status_code == 200
+        changed = client.get("/flights/", params=params, headers={"If-None-Match": etag})
+        assert changed.status_code == 200 and changed.headers["etag"] != etag
+        assert changed.json()[0]["available_seats"] == first.json()[0]["available_seats"] - 1
+
+        airports = client.get("/airports/")
+        assert airports.headers["cache-control"] == "public, max-age=3600"
+        assert client.get("/airports/", headers={"If-None-Match": f'W/{airports.headers["etag"]}'}).status_code == 304
+    print("✅ Conditional GET passed")
+
+def test_cache_backends_share_values_and_invalidations():
+    """Local LRU+TTL and a Redis-protocol server behave alike; misses are computed once across workers"""
+    import subprocess
+    import sys
+    import cache
+
+    clock = [0.0]
+    local = cache.LocalBackend(max_entries=2, clock=lambda: clock[0])
+    local.set("a", b"1", ttl=10)
+    local.set("b", b"2")
+    local.get("a")
+    local.set("c", b"3")  # evicts b, the least recently used
+    assert (local.get("a"), local.get("b"), local.get("c")) == (b"1", None, b"3")
+    clock[0] = 11
+    assert local.get("a") is None and local.incr("hits") == 1 and local.incr("hits") == 2
+
+    # A compute that outlives its lock must not release the lock another worker took meanwhile
+    slow = cache.Cache("test-slow", cache.LocalBackend(), lock_ttl=0.05)
+
+    def outlive_lock():
+        time.sleep(0.1)
+        assert slow.backend.add(slow.key("fare:lock"), b"other-worker", 10)
+        return b"100"
+
+    try:
+        assert slow.get_or_compute("fare", outlive_lock) == b"100"
+        assert slow.backend.get(slow.key("fare:lock")) == b"other-worker"
+    finally:
+        cache.registry.pop("test-slow", None)
+
+    server = subprocess.Popen([sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache_server.py"),
+                               "--port", "0"], stdout=subprocess.PIPE, text=True)
+    try:
+        port = int(server.stdout.readline().rsplit(":", 1)[1])
+        # Two "workers", each with its own backend connection and near copy
+        backends = [cache.RedisBackend(f"redis://127.0.0.1:{port}") for _ in range(2)]
+        first, second = (cache.Cache("test-fares", backend, near_ttl=60) for backend in backends)
+        backends[0].set("lock", b"mine", ttl=10)
+        assert not backends[1].delete_if_equal("lock", b"theirs") and backends[1].delete_if_equal("lock", b"mine")
+        assert backends[0].get("lock") is None
+        first.set("CAI-HBE", b"100")
+        assert second.get("CAI-HBE") == b"100" and second.get("CAI-HBE") == b"100"
+        assert second.metrics.near_hits == 1
+        first.set("CAI-HBE", b"120")
+        assert second.get("CAI-HBE") == b"100"  # still the near copy...
+        first.invalidate("CAI-HBE")
+        deadline = time.time() + 5
+        while second.near.get("CAI-HBE") is not None and time.time() < deadline:
+            time.sleep(0.01)
+        assert second.get("CAI-HBE") is None  # ...until the invalidation arrives
+
+        calls = []
+
+        def slow_fare():
+            calls.append(1)
+            time.sleep(0.2)
+            return b"150"
+
+        threads = [threading.Thread(target=lambda c=c: results.append(c.get_or_compute("CAI-LXR", slow_fare)))
+                   for c in (first, second) * 5]
+        results = []
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert results == [b"150"] * 10 and len(calls) == 1
+        assert first.stats()["backend"] == "RedisBackend"
+        assert first.metrics.computes + second.metrics.computes == 1
+        for backend in backends:
+            backend.close()
+    finally:
+        server.terminate()
+        server.wait(5)
+        server.stdout.close()
+        cache.registry.pop("test-fares", None)
+
+    # Backend down: values are computed, never an error, and commands fail fast until the backoff ends
+    down = cache.RedisBackend(f"redis://127.0.0.1:{port}", backoff=60)
+    try:
+        unreachable = cache.Cache("test-down", down)
+        assert unreachable.get_or_compute("x", lambda: b"fresh") == b"fresh"
+        assert unreachable.metrics.errors >= 1
+        assert down._failures == 1  # only the first command tried to connect
+    finally:
+        down.close()
+        cache.registry.pop("test-down", None)
+
+    # A lost version bump pauses caching until the global version has been bumped
+    from response_cache import TableVersions
+
+    class FlakyBackend:
+        def __init__(self):
+            self.inner, self.down = cache.LocalBackend(), False
+
+        def __getattr__(self, name):
+            method = getattr(self.inner, name)
+
+            def call(*args, **kwargs):
+                if self.down:
+                    raise cache.CacheError("backend down")
+                return method(*args, **kwargs)
+            return call
+
+    flaky = FlakyBackend()
+    versions = TableVersions(flaky)
+    before = versions.snapshot({"flights"})
+    flaky.down = True
+    versions.bump(["flights"])
+    flaky.down = False
+    assert versions.missed_bump
+    after = versions.snapshot({"flights"})
+    assert after is not None and after != before and not versions.missed_bump
+    print("✅ Cache backends passed")
+
+def test_identical_concurrent_requests_are_coalesced():
+    """Concurrent identical requests share one run, sync and async alike; errors fan out, waits are bounded"""
+    import asyncio
+    from fastapi import FastAPI, HTTPException, Request
+    from fastapi.testclient import TestClient
+    from coalescing import Coalescer, coalesce
+
+    coalescer = Coalescer(max_wait=5)
+    runs = {"sync": 0, "async": 0}
+    app = FastAPI()
+
+    @app.get("/sync")
+    @coalesce(using=coalescer)
+    def sync_search(request: Request, route: str):
+        runs["sync"] += 1
+        time.sleep(0.3)
+        if route == "boom":
+            raise HTTPException(status_code=503, detail="search backend down")
+        return {"route": route, "run": runs["sync"]}
+
+    @app.get("/async")
+    @coalesce(using=coalescer)
+    async def async_search(request: Request, route: str):
+        runs["async"] += 1
+        await asyncio.sleep(0.3)
+        return {"route": route, "run": runs["async"]}
+
+    def burst(client, url, count=8):
+        results = [None] * count
+        def call(i):
+            response = client.get(url)
+            results[i] = (response.status_code, response.json())
+        threads = [threading.Thread(target=call, args=(i,)) for i in range(count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+
+    with TestClient(app) as client:
+        for style in ("sync", "async"):
+            results = burst(client, f"/{style}?route=CAI-HBE")
+            assert runs[style] == 1
+            assert all(result == (200, {"route": "CAI-HBE", "run": 1}) for result in results)
+
+        assert coalescer.metrics.followers == 14
+
+        errors = burst(client, "/sync?route=boom", count=4)
+        assert runs["sync"] == 2
+        assert all(result == (503, {"detail": "search backend down"}) for result in errors)
+
+    # A follower stops waiting after max_wait and runs the call itself
+    impatient = Coalescer(max_wait=0.05)
+    calls = []
+    def slow():
+        calls.append(1)
+        time.sleep(0.3)
+        return len(calls)
+    threads = [threading.Thread(target=impatient.run, args=("key", slow)) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(calls) == 3 and impatient.metrics.timeouts == 2
+    assert impatient.in_flight() == 0
+    print("✅ Request coalescing passed")
+
+def test_fare_calendar_follows_seats_flights_and_promotions():
+    """Calendar cells move with ORM and Core writes and match a full rebuild; a month is one index range scan"""
+    from holds import hold_service
+    from models.fares import FareCalendarDay, rebuild_fare_calendar
+
+    TestSession = make_isolated_sessionmaker()
+    db = TestSession()
+    flight_id = add_bookable_flight(db)
+    late = Flight("MS703", "CAI", "HBE", datetime(2026, 10, 21, 18), datetime(2026, 10, 21, 19), 2, "A2", "1", 1, 1)
+    late.user_id = 1
+    db.add(late)
+    db.commit()
+    db.add_all([Seat(f"2{letter}", "Business", True, "aisle", late.id) for letter in "AB"])
+    db.commit()
+
+    with isolated_client(TestSession) as client:
+        def month(**params):
+            response = client.get("/routes/CAI/HBE/calendar", params={"month": "2026-10", **params})
+            assert response.status_code == 200, response.text
+            return {(row["day"], row["cabin"]): row for row in response.json()}
+
+        cells = month()
+        assert set(cells) == {("2026-10-19", "economy"), ("2026-10-21", "business")}
+        assert cells["2026-10-19", "economy"]["seats_left"] == 4
+        assert cells["2026-10-19", "economy"]["min_fare"] == 1000.0
+        assert cells["2026-10-21", "business"]["min_fare"] == 3000.0
+        assert set(month(cabin="Business")) == {("2026-10-21", "business")}
+
+        # ORM seat change, then a Core hold and its release
+        db.query(Seat).filter_by(flight_id=flight_id, seat_number="1A").one().is_available = False
+        db.commit()
+        assert month()["2026-10-19", "economy"]["seats_left"] == 3
+        hold = hold_service.hold(db, flight_id, ["1B", "1C", "1D"])
+        sold_out = month()["2026-10-19", "economy"]
+        assert sold_out["seats_left"] == 0 and sold_out["min_fare"] is None
+        hold_service.release(db, hold["hold_id"])
+        assert month()["2026-10-19", "economy"]["seats_left"] == 3
+
+        # A promotion lowers the fares of the days it covers, capped by max_discount
+        db.add(Promotion("FALL", "Fall sale", 20.0, datetime(2026, 10, 20), datetime(2026, 10, 31),
+                         "FALL20", None, 500.0, 100))
+        db.commit()
+        cells = month()
+        assert cells["2026-10-19", "economy"]["min_fare"] == 1000.0
+        assert cells["2026-10-21", "business"]["min_fare"] == 2500.0
+        assert cells["2026-10-21", "business"]["promo_id"] == "FALL"
+
+        # Moving a flight moves its cell
+        db.get(Flight, late.id).departure_time = datetime(2026, 11, 2, 18)
+        db.commit()
+        assert set(month()) == {("2026-10-19", "economy")}
+
+        incremental = sorted(tuple(row)[:-1] for row in db.execute(FareCalendarDay.__table__.select()))
+        rebuild_fare_calendar(db.connection())
+        rebuilt = sorted(tuple(row)[:-1] for row in db.execute(FareCalendarDay.__table__.select()))
+        assert incremental == rebuilt
+
+        plan = " ".join(str(row[-1]) for row in db.execute(text(
+            "EXPLAIN QUERY PLAN SELECT * FROM fare_calendar WHERE departure_code = 'CAI' "
+            "AND destination_code = 'HBE' AND day >= '2026-10-01' AND day < '2026-11-01' ORDER BY day, cabin")))
+        assert "USING INDEX" in plan and "TEMP B-TREE" not in plan, plan
+
+        assert client.get("/routes/CAI/HBE/calendar", params={"month": "October"}).status_code == 400
+        print("✅ Fare calendar passed")
+        db.close()
+
+def test_migrations_bring_an_old_database_up_to_date():
+    """An old schema gets the new constraint, columns and indexes once, with its rows kept"""
+    import migrations
+    from sqlalchemy import inspect as inspect_schema
+
+    fd, path = tempfile.mkstemp(suffix=".db")
+    os.close(fd)
+    old_engine = create_engine(f"sqlite:///{path}")
+    with old_engine.begin() as connection:
+        # flights as first shipped: one row per flight number, no indexes
+        connection.execute(text(
+            "CREATE TABLE flights (id INTEGER NOT NULL PRIMARY KEY, flight_number VARCHAR NOT NULL UNIQUE, "
+            "departure_code VARCHAR NOT NULL, destination_code VARCHAR NOT NULL, departure_time DATETIME, "
+            "arrival_time DATETIME, total_seats INTEGER, available_seats INTEGER, gate VARCHAR, terminal VARCHAR, "
+            "airline_id INTEGER, days_of_operation INTEGER, user_id INTEGER, legacy_note VARCHAR)"))
+        connection.execute(text(
+            "CREATE TABLE seats (seat_id INTEGER NOT NULL PRIMARY KEY, seat_number VARCHAR NOT NULL, "
+            "class_type VARCHAR NOT NULL, is_available BOOLEAN, seat_type VARCHAR NOT NULL, "
+            "reservation_time DATETIME, flight_id INTEGER REFERENCES flights (id))"))
+        connection.execute(text(
+            "INSERT INTO flights (id, flight_number, departure_code, destination_code, departure_time, total_seats, "
+            "available_seats) VALUES (7, 'MS701', 'CAI', 'HBE', '2026-10-19 08:00:00.000000', 2, 2)"))
+        connection.execute(text(
+            "INSERT INTO seats (seat_number, class_type, is_available, seat_type, flight_id) "
+            "VALUES ('1A', 'economy', 1, 'window', 7), ('1B', 'economy', 0, 'aisle', 7)"))
+
+    Base.metadata.create_all(bind=old_engine)
+    with old_engine.begin() as connection:
+        applied = migrations.upgrade(connection)
+        assert [m.version for m in applied] == [m.version for m in migrations.MIGRATIONS]
+    with old_engine.begin() as connection:
+        assert migrations.upgrade(connection) == []
+
+    schema = inspect_schema(old_engine)
+    assert ("flight_number", "departure_time") in migrations.unique_column_sets(old_engine.connect(), "flights")
+    assert ("flight_number",) not in migrations.unique_column_sets(old_engine.connect(), "flights")
+    assert "legacy_note" not in {column["name"] for column in schema.get_columns("flights")}
+    assert {"ix_flights_route_departure", "ix_flights_departure_time"} <= {i["name"] for i in schema.get_indexes("flights")}
+    assert "ix_seats_flight_type" in {i["name"] for i in schema.get_indexes("seats")}
+    assert schema.get_foreign_keys("seats")[0]["referred_table"] == "flights"
+
+    session = sessionmaker(bind=old_engine)()
+    try:
+        assert session.get(Flight, 7).flight_number == "MS701"
+        # A second departure of the same flight number is allowed now
+        session.add(Flight("MS701", "CAI", "HBE", datetime(2026, 10, 20, 8), datetime(2026, 10, 20, 9), 2, "A1", "1", 1, 1))
+        session.commit()
+        from models import FareCalendarDay
+        assert session.query(FareCalendarDay).one().seats_left == 1
+    finally:
+        session.close()
+        old_engine.dispose()
+        os.remove(path)
+    print("✅ Migrations passed")
+
+# Tests that exercise the request and worker paths whose queries must be index lookups
+HOT_PATH_TESTS = (
+    "test_occupancy_counters_follow_reservations",
+    "test_batch_reservations_are_all_or_nothing",
+    "test_seat_holds_expire_and_can_be_booked",
+    "test_idempotency_key_replays_instead_of_rebooking",
+    "test_payments_are_queued_and_processed_in_batches",
+    "test_outbox_delivers_reservation_changes_at_least_once",
+    "test_loyalty_accrual_credits_departed_flights_once",
+    "test_seat_features_are_filtered_in_sql",
+    "test_luggage_batch_check_in_matches_single_bag_rules",
+    "test_luggage_scans_build_a_queryable_journey",
+    "test_read_endpoints_answer_conditional_gets",
+    "test_fare_calendar_follows_seats_flights_and_promotions",
+    "test_passenger_itinerary_pages_in_constant_queries",
+)
+
+def test_hot_queries_do_not_scan_whole_tables():
+    """EXPLAIN QUERY PLAN of every filtered query the hot paths run: no full table scans"""
+    from query_plans import QueryPlanChecker
+
+    # Admin reports and one-off data migrations read everything on purpose
+    with QueryPlanChecker(allow={"flight_load_factors", "migrate_loyalty_rewards", "migrate_seat_features",
+                                 "rebuild_fare_calendar", "rebuild_occupancy", "stream_export"}) as checker:
+        for name in HOT_PATH_TESTS:
+            globals()[name]()
+    assert len(checker.queries) > 30
+    checker.assert_no_full_scans()
+    print("✅ Query plans passed")
+
+def test_text_foreign_keys_become_integers():
+    """Migration 4 converts the text keys, and the history/payment joins switch from scans to index lookups"""
+    import join_benchmark
+    from sqlalchemy import select
+    from models import Payment, Reservation
+
+    result = join_benchmark.compare(passengers=300, repeat=3)
+    before, after = result["before"], result["after"]
+    assert "SCAN reservations" in before["history_plan"] and "SCAN payments" in before["payments_plan"]
+    assert any("ix_reservations_passenger_id" in step for step in after["history_plan"])
+    assert any("ix_payments_reservation_id" in step for step in after["payments_plan"])
+    assert not any(step.startswith("SCAN") for step in after["history_plan"] + after["payments_plan"])
+    assert before["history_rows"] == after["history_rows"] > 0
+    assert before["payments_rows"] == after["payments_rows"] > 0
+
+    fd, path = tempfile.mkstemp(suffix=".db")
+    os.close(fd)
+    legacy = create_engine(f"sqlite:///{path}")
+    try:
+        join_benchmark.create_legacy_schema(legacy)
+        with legacy.begin() as connection:
+            connection.execute(text("INSERT INTO reservations (id, passenger_id, status) VALUES (1, '12', 'Pending')"))
+            connection.execute(text("INSERT INTO payments (payment_id, reservation_id) VALUES ('P1', '1'), ('P2', 'R-1')"))
+            assert connection.execute(text("SELECT typeof(passenger_id) FROM reservations")).scalar() == "text"
+            import migrations
+            assert [m.version for m in migrations.upgrade(connection)] == [4]
+        session = sessionmaker(bind=legacy)()
+        try:
+            assert session.get(Reservation, 1).passenger_id == 12
+            assert session.get(Payment, "P1").reservation_id == 1
+            assert session.get(Payment, "P2").reservation_id is None
+        finally:
+            session.close()
+        with legacy.connect() as connection:
+            assert connection.execute(text("SELECT typeof(passenger_id) FROM reservations")).scalar() == "integer"
+            # The cleared key is kept aside, not lost
+            assert connection.execute(select(
+                migrations.rejected_values.c.table_name, migrations.rejected_values.c.row_key,
+                migrations.rejected_values.c.column_name, migrations.rejected_values.c.value
+            )).all() == [("payments", "P2", "reservation_id", "R-1")]
+    finally:
+        legacy.dispose()
+        os.remove(path)
+    print(f"✅ Integer foreign keys passed ({result['speedup']})")
+
+def test_passenger_itinerary_pages_in_constant_queries():
+    """A frequent flyer's history pages by cursor with no gaps, in the same few queries for any page size"""
+    from sqlalchemy import event, insert
+    from models import Payment, Ticket
+
+    TestSession = make_isolated_sessionmaker()
+    db = TestSession()
+    flight_id = add_bookable_flight(db, passengers=2)
+    trips = 45
+    db.execute(insert(Reservation), [
+        {"id": number, "passenger_id": 1 if number % 9 else 2, "flight_id": flight_id, "seat_number": "1A",
+         "status": "Confirmed", "created_at": datetime(2026, 1, 1) + timedelta(days=number)}
+        for number in range(1, trips + 1)
+    ])
+    db.execute(insert(Ticket), [
+        {"passenger_id": 1, "flight_id": flight_id, "reservation_id": number, "seat_number": "1A",
+         "ticket_class": "economy", "status": "active", "base_price": 1000.0, "final_price": 1000.0}
+        for number in range(1, trips + 1)
+    ])
+    db.execute(insert(Payment), [
+        {"payment_id": f"PAY{number}-{part}", "reservation_id": number, "amount": 500.0, "currency": "EGP",
+         "method": "credit card", "status": "completed"}
+        for number in range(1, trips + 1) for part in (1, 2)
+    ])
+    # The model allows these to be NULL, unlike PassengerCreate
+    db.execute(text("UPDATE passengers SET phone_number = NULL, nationality = NULL, passport_number = NULL "
+                    "WHERE id = 2"))
+    db.commit()
+    db.close()
+    expected = [number for number in range(trips, 0, -1) if number % 9]
+
+    statements = []
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+    test_engine = TestSession.kw["bind"]
+    event.listen(test_engine, "before_cursor_execute", count)
+    with isolated_client(TestSession) as client:
+        for limit in (7, 50):
+            seen, cursor, queries = [], None, []
+            while True:
+                statements.clear()
+                response = client.get("/passengers/1/itinerary", params={"limit": limit, "cursor": cursor})
+                assert response.status_code == 200, response.text
+                queries.append(len([s for s in statements if s.lstrip().upper().startswith("SELECT")]))
+                page = response.json()
+                assert page["passenger"]["id"] == 1 and len(page["reservations"]) <= limit
+                for trip in page["reservations"]:
+                    assert trip["flight"]["flight_number"] == "MS701"
+                    assert len(trip["tickets"]) == 1 and len(trip["payments"]) == 2
+                seen += [trip["id"] for trip in page["reservations"]]
+                cursor = page["next_cursor"]
+                if cursor is None:
+                    break
+            assert seen == expected
+            # passenger, reservations, then one IN query each for flights, tickets and payments
+            assert set(queries) == {5}, queries
+
+        assert client.get("/passengers/1/itinerary", params={"cursor": "not-a-cursor"}).status_code == 400
+        assert client.get("/passengers/1/itinerary", params={"limit": 0}).status_code == 422
+        assert client.get("/passengers/99/itinerary").status_code == 404
+        response = client.get("/passengers/2/itinerary")
+        assert response.status_code == 200, response.text
+        assert response.json()["reservations"][0]["id"] == 45 and response.json()["passenger"]["nationality"] is None
+        event.remove(test_engine, "before_cursor_execute", count)
+    print("✅ Passenger itinerary passed")
+
 if __name__ == "__main__":
     try:
         setup_database()
         test_user_creation()
         test_password_hashing()
         test_existing_user()
+        test_promotion_redemption_never_oversells()
+        test_schedule_import_expands_days_of_operation()
+        test_data_generator_is_deterministic()
+        test_benchmark_reports_latency_and_queries()
+        test_profiling_middleware_server_timing_and_metrics()
+        test_startup_imports_stay_light()
+        test_exports_stream_joined_rows()
+        test_occupancy_counters_follow_reservations()
+        test_batch_reservations_are_all_or_nothing()
+        test_seat_holds_expire_and_can_be_booked()
+        test_idempotency_key_replays_instead_of_rebooking()
+        test_payments_are_queued_and_processed_in_batches()
+        test_outbox_delivers_reservation_changes_at_least_once()
+        test_loyalty_accrual_credits_departed_flights_once()
+        test_seat_features_are_filtered_in_sql()
+        test_luggage_batch_check_in_matches_single_bag_rules()
+        test_luggage_scans_build_a_queryable_journey()
+        test_orjson_listings_match_the_pydantic_output()
+        test_read_endpoints_answer_conditional_gets()
+        test_cache_backends_share_values_and_invalidations()
+        test_identical_concurrent_requests_are_coalesced()
+        test_fare_calendar_follows_seats_flights_and_promotions()
+        test_migrations_bring_an_old_database_up_to_date()
+        test_hot_queries_do_not_scan_whole_tables()
+        test_text_foreign_keys_become_integers()
+        test_passenger_itinerary_pages_in_constant_queries()
     finally:
         teardown_database()
+        teardown_module()
     print("All tests completed successfully!")
\ No newline at end of file
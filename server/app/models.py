@@ -4,6 +4,7 @@ import os
 # Get absolute path to database
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))  # This gets 'server/app'
 DB_PATH = os.path.abspath(os.path.join(BASE_DIR, "../app/database.db"))  # This ensures correct path
+DB_PATH = os.getenv("TRACKING_DB_PATH", DB_PATH)  # Benchmarks point this at a scratch file
 
 def init_db():
     conn = sqlite3.connect(DB_PATH)